@@ -1,23 +1,46 @@
 import os
-from flask import Flask, render_template, send_from_directory, request, jsonify
+import click
+from flask import Flask, send_from_directory, request, jsonify
 from backend.routes import api_bp
 from backend.config import Config
-from backend.extensions import db, jwt, cors, mail
+from backend.db_engine import engine_options
+from backend.extensions import db, jwt, cors, mail, cache
 from backend.create_initial_data import create_admin_user, create_sample_data
+from backend.migrations import run_migrations
+from backend.heartbeats import heartbeats
+from backend.routing import init_read_routing
+from backend.perf import profiler
+from backend.metrics import init_metrics
+from backend.serializers import init_json
+from backend.assets import assets
+from backend.compression import init_compression
 
+# The frontend is served by backend.assets, not Flask's static route
 app = Flask(__name__, 
-    static_folder='frontend',
-    static_url_path='',
+    static_folder=None,
     template_folder='frontend')
 
 # Configure the app
 app.config.from_object(Config)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(Config)
+if Config.REPLICA_DATABASE_URL:
+    app.config['SQLALCHEMY_BINDS'] = {
+        'replica': {"url": Config.REPLICA_DATABASE_URL, **engine_options(Config, Config.REPLICA_DATABASE_URL)}
+    }
 
 # Initialize extensions
 db.init_app(app)
 jwt.init_app(app)
 cors.init_app(app)
 mail.init_app(app)
+cache.init_app(app)
+heartbeats.init_app(app)
+profiler.init_app(app)
+init_metrics(app)
+init_compression(app)
+init_read_routing(app)
+init_json(app)
+assets.init_app(app)
 
 # Register API blueprint
 app.register_blueprint(api_bp, url_prefix='/api')
@@ -25,19 +48,87 @@ app.register_blueprint(api_bp, url_prefix='/api')
 # Create database tables
 with app.app_context():
     db.create_all()
+    # Bring databases created by older versions up to date (columns, indexes, search index)
+    run_migrations()
     # Create admin user if it doesn't exist
     create_admin_user()
     # Create sample data for testing
     if app.debug:
         create_sample_data()
 
+@app.cli.command('migrate-images')
+def migrate_images_command():
+    """Move inline base64 question images into the blob store"""
+    from backend.blob_store import migrate_inline_images
+    updated = migrate_inline_images()
+    print(f"Converted images of {updated} questions")
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Recompute the denormalized chapter, quiz and question counters"""
+    from backend.counters import rebuild_counters
+    print(rebuild_counters())
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the source tables"""
+    from backend.search import rebuild_search_index
+    print(f"Indexed {rebuild_search_index()} documents")
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema and data migrations"""
+    applied = run_migrations()
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN the hot queries and fail if one does not use its index"""
+    from backend.query_plans import check_query_plans
+    failed = 0
+    for name, index, ok, plan in check_query_plans():
+        print(f"{'OK  ' if ok else 'FAIL'} {name} (expects {index})")
+        for line in plan:
+            print(f"       {line}")
+        failed += not ok
+    if failed:
+        raise SystemExit(f"{failed} hot queries do not use their index")
+
+@app.cli.command('generate-data')
+@click.option('--users', default=1000, show_default=True)
+@click.option('--quizzes', default=50, show_default=True)
+@click.option('--questions', default=2000, show_default=True)
+@click.option('--scores', default=20000, show_default=True)
+@click.option('--subjects', type=int, default=None, help='Defaults to quizzes / 100')
+@click.option('--chapters', type=int, default=None, help='Defaults to quizzes / 10')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Day the dataset is dated relative to (defaults to today)')
+@click.option('--batch-size', default=10000, show_default=True)
+def generate_data_command(users, quizzes, questions, scores, subjects, chapters, seed, anchor, batch_size):
+    """Bulk-insert a seeded synthetic dataset (e.g. --users 100000 --scores 10000000)"""
+    from backend.synthetic_data import generate_synthetic_data
+    counts = generate_synthetic_data(
+        users=users, quizzes=quizzes, questions=questions, scores=scores,
+        subjects=subjects, chapters=chapters, seed=seed,
+        anchor=anchor.date() if anchor else None, batch_size=batch_size
+    )
+    print(counts)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress the frontend into ASSETS_DIR (restart the servers afterwards)"""
+    from backend.assets import build_assets
+    manifest = build_assets(assets.source_dir, app.config['ASSETS_DIR'])
+    print(f"Built {len(manifest)} assets into {app.config['ASSETS_DIR']}")
+
 # Serve index.html for the frontend
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    # For all paths that don't start with api/, serve index.html
+    # For all paths that don't start with api/, serve the asset or index.html
     if not path.startswith('api/'):
-        return render_template('index.html')
+        return assets.serve(path)
     
     # Let the blueprint handle API routes
     return api_bp.handle(path)
@@ -0,0 +1,83 @@
+from backend.extensions import db, cache
+from backend.models import Quiz, Question
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Answer keys change only when an admin edits questions, so keep them for a day
+ANSWER_KEY_TTL = 86400
+
+def _cache_key(quiz_id):
+    return f"quiz:{quiz_id}:answer_key"
+
+def build_answer_key(quiz_id):
+    """
+    Compile the answer key for a quiz from the database
+
+    Args:
+        quiz_id (int): ID of the quiz
+
+    Returns:
+        dict: {"question_ids": [...], "correct_options": "1423..."} where the
+        n-th character is the correct option of the n-th question, or None
+        if the quiz does not exist
+    """
+    rows = db.session.query(Question.id, Question.correct_option) \
+        .filter(Question.quiz_id == quiz_id) \
+        .order_by(Question.id) \
+        .all()
+
+    # An empty key is valid, but only for a quiz that exists
+    if not rows and not db.session.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+        return None
+
+    return {
+        "question_ids": [row.id for row in rows],
+        "correct_options": "".join(str(row.correct_option) for row in rows)
+    }
+
+def get_answer_key(quiz_id):
+    """
+    Get the compiled answer key for a quiz, building and caching it on a miss
+
+    Args:
+        quiz_id (int): ID of the quiz
+
+    Returns:
+        dict: The compiled key (see build_answer_key), or None if the quiz does not exist
+    """
+    quiz_id = int(quiz_id)
+    return cache.get_or_set_json(
+        _cache_key(quiz_id),
+        lambda: build_answer_key(quiz_id),
+        ttl=ANSWER_KEY_TTL,
+        tags=[f"quiz:{quiz_id}"],
+        consistent=True
+    )
+
+def invalidate_answer_key(quiz_id):
+    """Drop the cached answer key of a quiz after its questions change"""
+    cache.delete(_cache_key(int(quiz_id)))
+
+def grade(answer_key, answers):
+    """
+    Grade submitted answers against a compiled answer key
+
+    Args:
+        answer_key (dict): Key returned by get_answer_key
+        answers (dict): Mapping of question ID (as string) to selected option
+
+    Returns:
+        tuple: (total_questions, total_correct)
+
+    Raises:
+        ValueError: If a selected option is not a number
+    """
+    total_correct = 0
+
+    for question_id, correct_option in zip(answer_key["question_ids"], answer_key["correct_options"]):
+        selected_option = answers.get(str(question_id))
+        if selected_option is not None and int(selected_option) == int(correct_option):
+            total_correct += 1
+
+    return len(answer_key["question_ids"]), total_correct
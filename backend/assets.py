@@ -0,0 +1,231 @@
+from flask import request, Response, render_template, abort
+from backend.compression import ENCODINGS, SUFFIXES, compress, negotiate
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+# Smaller files gain nothing from compression
+MIN_COMPRESS_BYTES = 256
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Local src/href references in index.html
+_REFERENCE = re.compile(r'((?:src|href)=")/([^":?#]+)(")')
+
+def _mimetype(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+def _compressible(path, size):
+    return size >= MIN_COMPRESS_BYTES and _mimetype(path).startswith(COMPRESSIBLE_TYPES)
+
+def _fingerprint(path, body):
+    """components/QuizCard.js -> components/QuizCard.<content hash>.js"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(body).hexdigest()[:12]}{ext}"
+
+def _write(output_dir, path, body):
+    """Write a file and its compressed variants, keeping only those that are smaller"""
+    full_path = os.path.join(output_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'wb') as f:
+        f.write(body)
+
+    if not _compressible(path, len(body)):
+        return
+    for encoding in ENCODINGS:
+        compressed = compress(body, encoding)
+        if len(compressed) < len(body):
+            with open(full_path + SUFFIXES[encoding], 'wb') as f:
+                f.write(compressed)
+
+def build_assets(source_dir, output_dir):
+    """
+    Build the frontend for production into output_dir
+
+    Every file but index.html is copied under a name carrying a hash of its
+    content, so it can be cached forever. index.html is rendered once and
+    its references rewritten to the fingerprinted names. Compressible files
+    get .gz and (with brotli installed) .br variants next to them, and
+    manifest.json maps source paths to fingerprinted ones.
+
+    The build goes to a temporary directory that replaces output_dir at the
+    end. Servers load the build at startup, so restart them afterwards.
+
+    Returns:
+        dict: The manifest
+    """
+    staging_dir = output_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    manifest = {}
+    for root, _, files in os.walk(source_dir):
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            path = os.path.relpath(full_path, source_dir).replace(os.sep, '/')
+            if path == 'index.html':
+                continue
+            with open(full_path, 'rb') as f:
+                body = f.read()
+            manifest[path] = _fingerprint(path, body)
+            _write(staging_dir, manifest[path], body)
+
+    def rewrite(match):
+        path = match.group(2)
+        return f"{match.group(1)}/{manifest.get(path, path)}{match.group(3)}"
+
+    html = _REFERENCE.sub(rewrite, render_template('index.html'))
+    _write(staging_dir, 'index.html', html.encode())
+
+    with open(os.path.join(staging_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+    logger.info(f"Built {len(manifest)} frontend assets into {output_dir}")
+    return manifest
+
+class StaticFile:
+    """
+    One frontend file held in memory with its compressed variants
+
+    Attributes:
+        bodies (dict): Content coding (None for identity) -> body
+        etag (str): Content hash; each coding's validator is etag-<coding>
+        mimetype (str): Content type
+        cache_control (str): Cache-Control header value
+    """
+
+    __slots__ = ('bodies', 'etag', 'mimetype', 'cache_control')
+
+    def __init__(self, path, body, cache_control, variants=None):
+        self.mimetype = _mimetype(path)
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = cache_control
+        self.bodies = {None: body}
+
+        if variants is None:
+            variants = {}
+            if _compressible(path, len(body)):
+                for encoding in ENCODINGS:
+                    variants[encoding] = compress(body, encoding)
+        self.bodies.update(
+            (encoding, compressed) for encoding, compressed in variants.items()
+            if len(compressed) < len(body)
+        )
+
+    def response(self):
+        """Send the variant the client prefers, or 304 if it has it already"""
+        encoding = negotiate(request.accept_encodings, self.bodies)
+        etag = f"{self.etag}-{encoding}" if encoding else self.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[encoding], mimetype=self.mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control
+        response.vary.add('Accept-Encoding')
+        return response
+
+class AssetServer:
+    """
+    Serves the frontend and the pre-rendered index.html
+
+    With a build in ASSETS_DIR (see build_assets) every file is loaded into
+    memory with its precompressed variants at startup. Fingerprinted names
+    are cached by browsers for a year; index.html and the unfingerprinted
+    names are revalidated with their ETag. Without a build, files come from
+    the frontend directory and index.html is rendered once and kept (on
+    every request in debug mode, so edits show up).
+    """
+
+    def __init__(self):
+        self.source_dir = None
+        self.files = {}
+        self.index = None
+        self.built = False
+        self.debug = False
+
+    def init_app(self, app):
+        app.extensions['assets'] = self
+        self.source_dir = os.path.join(app.root_path, app.template_folder)
+        self.debug = app.debug
+
+        assets_dir = app.config.get('ASSETS_DIR')
+        if assets_dir and os.path.exists(os.path.join(assets_dir, MANIFEST)):
+            try:
+                self._load_build(assets_dir)
+                self.built = True
+            except Exception as e:
+                logger.error(f"Could not load the frontend build in {assets_dir}: {str(e)}")
+                self.files = {}
+                self.index = None
+
+    def _load_build(self, assets_dir):
+        with open(os.path.join(assets_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+
+        def load(path, cache_control):
+            full_path = os.path.join(assets_dir, path)
+            with open(full_path, 'rb') as f:
+                body = f.read()
+            variants = {}
+            for encoding in ENCODINGS:
+                if os.path.exists(full_path + SUFFIXES[encoding]):
+                    with open(full_path + SUFFIXES[encoding], 'rb') as f:
+                        variants[encoding] = f.read()
+            return StaticFile(path, body, cache_control, variants)
+
+        for source_path, built_path in manifest.items():
+            static_file = load(built_path, IMMUTABLE)
+            self.files[built_path] = static_file
+            # Pages loaded before a deploy still ask for the plain names
+            self.files[source_path] = StaticFile(source_path, static_file.bodies[None], REVALIDATE, {
+                encoding: body for encoding, body in static_file.bodies.items() if encoding
+            })
+
+        self.index = load('index.html', REVALIDATE)
+        logger.info(f"Loaded {len(manifest)} frontend assets from {assets_dir}")
+
+    def _source_file(self, path):
+        """A file of the unbuilt frontend, or None"""
+        full_path = os.path.realpath(os.path.join(self.source_dir, path))
+        if not full_path.startswith(os.path.realpath(self.source_dir) + os.sep) or not os.path.isfile(full_path):
+            return None
+        with open(full_path, 'rb') as f:
+            return StaticFile(path, f.read(), REVALIDATE, variants={})
+
+    def _index(self):
+        if self.index is None or self.debug:
+            self.index = StaticFile('index.html', render_template('index.html').encode(), REVALIDATE)
+        return self.index
+
+    def serve(self, path):
+        """Respond to a non-API path with its asset, or with index.html for app routes"""
+        static_file = self.files.get(path)
+        if static_file is None and not self.built and path not in ('', 'index.html'):
+            static_file = self._source_file(path)
+        if static_file is not None:
+            return static_file.response()
+
+        # Paths with an extension are files; anything else is a route of the app
+        if os.path.splitext(path)[1] and path != 'index.html':
+            abort(404)
+        return self._index().response()
+
+assets = AssetServer()
@@ -0,0 +1,88 @@
+from flask import jsonify, g
+from flask_jwt_extended import create_access_token, verify_jwt_in_request, get_jwt, get_jwt_identity
+from backend.extensions import db, cache
+from backend.models import User
+from backend.config import Config
+from functools import wraps
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _principal_key(user_id):
+    return f"principal:{user_id}"
+
+def create_user_token(user):
+    """
+    Create an access token carrying the user's role as a signed claim
+
+    Args:
+        user (User): The authenticated user
+
+    Returns:
+        str: Encoded JWT
+    """
+    return create_access_token(identity=str(user.id), additional_claims={"is_admin": bool(user.is_admin)})
+
+def load_principal(user_id):
+    """
+    Get the current role of a user from the principal cache, loading it on a miss
+
+    Returns:
+        dict: {"id": ..., "is_admin": ...}, or None if the user does not exist
+    """
+    def load():
+        row = db.session.query(User.id, User.is_admin).filter(User.id == user_id).first()
+        return {"id": row.id, "is_admin": bool(row.is_admin)} if row else None
+
+    return cache.get_or_set_json(_principal_key(user_id), load, ttl=Config.PRINCIPAL_CACHE_TTL, consistent=True)
+
+def get_principal():
+    """
+    Resolve the caller of the current request
+
+    A role change recorded by set_principal_role wins over the token's
+    claims. Without one, a non-admin claim is used as it is, without a
+    database lookup. An admin claim is only trusted as far as
+    load_principal agrees, so a revoked role stays revoked when the
+    recorded change is evicted or never reached this process. Tokens
+    issued before roles were carried as claims also use load_principal.
+
+    Returns:
+        dict: {"id": ..., "is_admin": ...}, or None if the user does not exist
+    """
+    if 'principal' in g:
+        return g.principal
+
+    user_id = int(get_jwt_identity())
+    claims = get_jwt()
+
+    principal = cache.get_json(_principal_key(user_id), consistent=True)
+    if principal is None:
+        if 'is_admin' in claims and not claims['is_admin']:
+            principal = {"id": user_id, "is_admin": False}
+        else:
+            principal = load_principal(user_id)
+
+    g.principal = principal
+    return principal
+
+def set_principal_role(user_id, is_admin):
+    """
+    Record a role change so tokens issued before it stop granting the old role
+
+    The entry outlives every token that could still carry the old claim.
+    """
+    ttl = int(Config.JWT_ACCESS_TOKEN_EXPIRES.total_seconds())
+    cache.set_json(_principal_key(user_id), {"id": int(user_id), "is_admin": bool(is_admin)}, ttl=ttl, consistent=True)
+
+def admin_required(fn):
+    """Require a valid access token whose principal is an admin"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        verify_jwt_in_request()
+        principal = get_principal()
+        if not principal or not principal["is_admin"]:
+            return jsonify({"error": "Admin privileges required"}), 403
+        return fn(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,185 @@
+from backend.extensions import db
+from backend.models import Question
+from backend.config import Config
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Question columns that may hold an image (URL, blob reference or inline base64)
+IMAGE_FIELDS = ['question_image', 'option1_image', 'option2_image', 'option3_image', 'option4_image']
+
+# URL prefix under which stored blobs are served
+BLOB_URL_PREFIX = '/api/images/'
+
+# The only types stored and served; anything a browser could run (HTML, SVG) is
+# refused, since blobs are served without authentication from the app's origin
+IMAGE_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+_IMAGE_EXTENSIONS = {ext: mime_type for mime_type, ext in IMAGE_TYPES.items()}
+
+_DATA_URI_RE = re.compile(r'^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?P<params>(;[^;,]*)*?);base64,(?P<data>.*)$', re.DOTALL)
+_BLOB_NAME_RE = re.compile(r'^(?P<digest>[0-9a-f]{64})(?P<ext>\.[a-z0-9]+)?$')
+
+class BlobError(ValueError):
+    """Raised when an inline image cannot be decoded, is too large or is not a supported image type"""
+
+def blob_path(digest, ext=''):
+    """Filesystem path of a blob; blobs are fanned out by the first two hex digits"""
+    return os.path.join(Config.BLOB_STORE_DIR, digest[:2], digest + ext)
+
+def store_blob(data, mime_type=None):
+    """
+    Store bytes in the content-addressed store
+
+    Args:
+        data (bytes): Blob content
+        mime_type (str): One of IMAGE_TYPES, which chooses the file extension
+
+    Returns:
+        str: Blob name (<sha256><ext>), identical for identical content
+
+    Raises:
+        BlobError: If mime_type is not one of IMAGE_TYPES
+    """
+    if mime_type not in IMAGE_TYPES:
+        raise BlobError("Unsupported image type. Use PNG, JPEG, GIF or WebP")
+
+    digest = hashlib.sha256(data).hexdigest()
+    ext = IMAGE_TYPES[mime_type]
+    path = blob_path(digest, ext)
+
+    # Identical content is stored once
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return digest + ext
+
+def resolve_blob(name):
+    """
+    Map a blob name back to its file
+
+    Args:
+        name (str): Blob name as returned by store_blob
+
+    Returns:
+        tuple: (path, digest, mime_type), or None if the name is invalid,
+        not an image of IMAGE_TYPES or missing
+    """
+    match = _BLOB_NAME_RE.match(name)
+    if not match or match.group('ext') not in _IMAGE_EXTENSIONS:
+        return None
+
+    digest, ext = match.group('digest'), match.group('ext')
+    path = blob_path(digest, ext)
+    if not os.path.isfile(path):
+        return None
+
+    return path, digest, _IMAGE_EXTENSIONS[ext]
+
+def externalize_image(value):
+    """
+    Move an inline base64 image into the blob store
+
+    Args:
+        value (str): Column value; data: URIs are stored, anything else
+            (URLs, existing references, None) is returned unchanged
+
+    Returns:
+        str: The value to keep in the database
+
+    Raises:
+        BlobError: If the data URI is malformed, exceeds MAX_IMAGE_BYTES or
+            is not one of IMAGE_TYPES
+    """
+    if not value or not isinstance(value, str) or not value.startswith('data:'):
+        return value
+
+    match = _DATA_URI_RE.match(value)
+    if not match:
+        raise BlobError("Invalid image data")
+
+    mime_type = (match.group('mime') or '').lower()
+    if mime_type not in IMAGE_TYPES:
+        raise BlobError("Unsupported image type. Use PNG, JPEG, GIF or WebP")
+
+    # Reject oversized payloads before decoding them
+    if len(match.group('data')) * 3 // 4 > Config.MAX_IMAGE_BYTES:
+        raise BlobError("Image is too large")
+
+    try:
+        data = base64.b64decode(re.sub(r'\s+', '', match.group('data')), validate=True)
+    except (binascii.Error, ValueError):
+        raise BlobError("Invalid image data")
+
+    if not data:
+        raise BlobError("Invalid image data")
+
+    return BLOB_URL_PREFIX + store_blob(data, mime_type)
+
+def migrate_inline_images(batch_size=200):
+    """
+    Convert inline base64 images already in the questions table into blob references
+
+    Questions are processed in id order, batch_size rows per transaction,
+    loading only the image columns.
+
+    Returns:
+        int: Number of questions updated
+    """
+    columns = [getattr(Question, field) for field in IMAGE_FIELDS]
+    inline = db.or_(*[column.like('data:%') for column in columns])
+
+    last_id = 0
+    updated = 0
+
+    while True:
+        rows = db.session.query(Question.id, *columns) \
+            .filter(Question.id > last_id, inline) \
+            .order_by(Question.id) \
+            .limit(batch_size) \
+            .all()
+
+        if not rows:
+            break
+
+        for row in rows:
+            values = {}
+            for field in IMAGE_FIELDS:
+                value = getattr(row, field)
+                try:
+                    new_value = externalize_image(value)
+                except BlobError as e:
+                    logger.warning(f"Skipping {field} of question {row.id}: {str(e)}")
+                    continue
+                if new_value != value:
+                    values[field] = new_value
+
+            if values:
+                db.session.query(Question).filter(Question.id == row.id) \
+                    .update(values, synchronize_session=False)
+                updated += 1
+
+        db.session.commit()
+        last_id = rows[-1].id
+        logger.info(f"Migrated inline images up to question {last_id}")
+
+    return updated
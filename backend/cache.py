@@ -0,0 +1,461 @@
+from collections import OrderedDict, defaultdict
+import logging
+import threading
+import time
+
+from backend.serializers import dumps, loads
+from backend.compression import EncodedBody
+
+logger = logging.getLogger(__name__)
+
+def key_family(key):
+    """Family of a cache key for statistics: the part before the first ':'"""
+    return key.split(':', 1)[0]
+
+class LocalLRU:
+    """
+    Size-bounded, TTL-bounded, thread-safe LRU map
+
+    Entries remember their tags so tag invalidation can drop them locally.
+    """
+
+    def __init__(self, max_entries=1024, ttl=5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, tags=()):
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_tagged(self, tags):
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, (_, _, entry_tags) in self._entries.items() if entry_tags & tags]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class MemoryStore:
+    """
+    In-process stand-in for the Redis tier
+
+    Implements the few operations Cache needs, so the application runs
+    unchanged without Redis (development, tests, a single worker). Writes
+    and invalidations only reach this process (see Cache.shared). Expired
+    entries are swept on writes and the oldest ones are evicted past
+    max_entries; both leave the tag index with them.
+    """
+
+    SWEEP_INTERVAL = 60  # Seconds between sweeps of expired entries
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._values = OrderedDict()
+        self._tags = defaultdict(set)
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + self.SWEEP_INTERVAL
+
+    def _drop(self, key):
+        """Remove an entry and its key from the tag index"""
+        entry = self._values.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _alive(self, key):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.time():
+            self._drop(key)
+            return None
+        return value
+
+    def _sweep(self, now):
+        expired = [key for key, (_, expires_at, _) in self._values.items()
+                   if expires_at is not None and expires_at <= now]
+        for key in expired:
+            self._drop(key)
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+    def _store(self, key, value, ttl, tags=()):
+        now = time.time()
+        self._drop(key)
+        self._values[key] = (value, now + ttl if ttl else None, frozenset(tags))
+        for tag in tags:
+            self._tags[tag].add(key)
+
+        if now >= self._next_sweep:
+            self._sweep(now)
+        while len(self._values) > self.max_entries:
+            self._drop(next(iter(self._values)))
+
+    def get(self, key):
+        with self._lock:
+            return self._alive(key)
+
+    def set(self, key, value, ttl=None, tags=()):
+        with self._lock:
+            self._store(key, value, ttl, tags)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+
+    def invalidate_tags(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.pop(tag, ())):
+                    self._drop(key)
+
+    def acquire_lock(self, key, ttl):
+        with self._lock:
+            if self._alive(key) is not None:
+                return False
+            self._store(key, b'1', ttl)
+            return True
+
+    def release_lock(self, key):
+        self.delete(key)
+
+    def __len__(self):
+        return len(self._values)
+
+class RedisStore:
+    """Redis tier backed by a connection pool; tags are Redis sets of keys"""
+
+    TAG_PREFIX = 'tag:'
+
+    def __init__(self, url, max_connections=50, socket_timeout=1.0):
+        import redis
+        self.pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout
+        )
+        self.client = redis.Redis(connection_pool=self.pool)
+
+    def ping(self):
+        return self.client.ping()
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None, tags=()):
+        pipe = self.client.pipeline(transaction=False)
+        if ttl:
+            pipe.setex(key, ttl, value)
+        else:
+            pipe.set(key, value)
+        for tag in tags:
+            pipe.sadd(self.TAG_PREFIX + tag, key)
+            # Tag sets must outlive the keys they point to, but not forever
+            pipe.expire(self.TAG_PREFIX + tag, max(ttl or 0, 86400))
+        pipe.execute()
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def invalidate_tags(self, *tags):
+        for tag in tags:
+            tag_key = self.TAG_PREFIX + tag
+            keys = self.client.smembers(tag_key)
+            pipe = self.client.pipeline(transaction=False)
+            if keys:
+                pipe.delete(*keys)
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def acquire_lock(self, key, ttl):
+        return bool(self.client.set(key, b'1', nx=True, px=int(ttl * 1000)))
+
+    def release_lock(self, key):
+        self.client.delete(key)
+
+class Cache:
+    """
+    Two-tier cache: a per-process LRU in front of a shared Redis tier
+
+    - Reads check the local LRU first, then Redis, and backfill the LRU
+      with the key's tags (reads that do not know them skip the backfill).
+      The local TTL is short (CACHE_LOCAL_TTL) because other processes'
+      invalidations only reach this process's LRU when it expires.
+    - Keys can carry tags ("chapter:12"); invalidate_tags drops every key
+      carrying any of the tags from both tiers.
+    - get_or_set lets only one caller per key run the loader at a time,
+      within the process and, through a Redis lock, across processes.
+    - Hits and misses are counted per tier and per key family.
+    - Without Redis (unset, unreachable or CACHE_TYPE=memory) the shared
+      tier is an in-process MemoryStore, which other processes do not see.
+    - Entries that must never outlive an invalidation (answer keys, roles)
+      are stored with consistent=True. They skip the local LRU, and are
+      not cached at all unless the tier is shared by every process: Redis,
+      or a MemoryStore with CACHE_SINGLE_PROCESS set.
+    """
+
+    def __init__(self, app=None):
+        self.local = LocalLRU()
+        self.remote = MemoryStore()
+        self.shared = True
+        self.default_ttl = 300
+        self.lock_timeout = 10
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"local_hits": 0, "remote_hits": 0, "misses": 0})
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.configure(app.config)
+        app.extensions['cache'] = self
+
+    def configure(self, config):
+        """Set up both tiers from a mapping of CACHE_* / REDIS_URL settings"""
+        self.local = LocalLRU(
+            max_entries=config.get('CACHE_LOCAL_MAX_ENTRIES', 1024),
+            ttl=config.get('CACHE_LOCAL_TTL', 5)
+        )
+        self.default_ttl = config.get('CACHE_DEFAULT_TTL', 300)
+        self.remote = MemoryStore(max_entries=config.get('CACHE_MEMORY_MAX_ENTRIES', 10000))
+        # The in-memory tier is only shared when this is the only process
+        self.shared = bool(config.get('CACHE_SINGLE_PROCESS', False))
+
+        url = config.get('CACHE_REDIS_URL') or config.get('REDIS_URL')
+        if config.get('CACHE_TYPE', 'redis') == 'redis' and url:
+            try:
+                store = RedisStore(url, max_connections=config.get('CACHE_REDIS_MAX_CONNECTIONS', 50))
+                store.ping()
+                self.remote = store
+                self.shared = True
+                logger.info("Cache connected to Redis")
+            except Exception as e:
+                logger.warning(f"Redis unavailable, using in-memory cache: {str(e)}")
+
+        if not self.shared:
+            logger.warning("In-memory cache without CACHE_SINGLE_PROCESS: answer keys and roles are not cached")
+
+    def _count(self, key, outcome):
+        with self._stats_lock:
+            self._stats[key_family(key)][outcome] += 1
+
+    def get(self, key, consistent=False, tags=None):
+        """
+        Get a raw value
+
+        Args:
+            tags: Tags the key is stored with. A value read from the shared
+                tier is only copied into the local LRU when they are given,
+                so invalidate_tags can drop the copy
+
+        Returns:
+            bytes or str: The cached value, or None on a miss
+        """
+        if consistent and not self.shared:
+            return None
+
+        value = None if consistent else self.local.get(key)
+        if value is not None:
+            self._count(key, "local_hits")
+            return value
+
+        try:
+            value = self.remote.get(key)
+        except Exception as e:
+            logger.warning(f"Cache get error: {str(e)}")
+            value = None
+
+        if value is None:
+            self._count(key, "misses")
+            return None
+
+        self._count(key, "remote_hits")
+        if not consistent and tags is not None:
+            self.local.set(key, value, tags=tags)
+        return value
+
+    def set(self, key, value, ttl=None, tags=(), consistent=False):
+        """Store a raw value in both tiers (only the shared one if consistent)"""
+        if consistent and not self.shared:
+            return
+        ttl = ttl or self.default_ttl
+        if not consistent:
+            self.local.set(key, value, ttl, tags)
+        try:
+            self.remote.set(key, value, ttl, tags)
+        except Exception as e:
+            logger.warning(f"Cache set error: {str(e)}")
+
+    def delete(self, *keys):
+        """Remove keys from both tiers"""
+        self.local.delete(*keys)
+        try:
+            self.remote.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache delete error: {str(e)}")
+
+    def invalidate_tags(self, *tags):
+        """Remove every key carrying any of the tags from both tiers"""
+        self.local.delete_tagged(tags)
+        try:
+            self.remote.invalidate_tags(*tags)
+        except Exception as e:
+            logger.warning(f"Cache tag invalidation error: {str(e)}")
+
+    def get_json(self, key, consistent=False):
+        value = self.get(key, consistent)
+        return loads(value) if value is not None else None
+
+    def set_json(self, key, data, ttl=None, tags=(), consistent=False):
+        self.set(key, dumps(data), ttl, tags, consistent)
+
+    def get_or_set(self, key, loader, ttl=None, tags=(), consistent=False):
+        """
+        Get a raw value, computing it with loader() on a miss
+
+        Concurrent misses on the same key wait for a single loader call
+        instead of stampeding the database. A loader result of None is
+        returned but not cached.
+        """
+        if consistent and not self.shared:
+            return loader()
+
+        value = self.get(key, consistent, tags)
+        if value is not None:
+            return value
+
+        # Single flight within the process
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = threading.Event()
+
+        if not leader:
+            flight.wait(self.lock_timeout)
+            value = self.get(key, consistent, tags)
+            if value is not None:
+                return value
+            return self._load(key, loader, ttl, tags, consistent)
+
+        try:
+            return self._load(key, loader, ttl, tags, consistent)
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.set()
+
+    def _load(self, key, loader, ttl, tags, consistent):
+        """Run the loader, holding the shared lock so other processes wait for it"""
+        lock_key = f"lock:{key}"
+        try:
+            locked = self.remote.acquire_lock(lock_key, self.lock_timeout)
+        except Exception:
+            locked = True
+
+        if not locked:
+            # Another process is loading; wait for its result, then give up and load
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                try:
+                    value = self.remote.get(key)
+                except Exception:
+                    break
+                if value is not None:
+                    if not consistent:
+                        self.local.set(key, value, ttl, tags)
+                    return value
+
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl, tags, consistent)
+            return value
+        finally:
+            if locked:
+                try:
+                    self.remote.release_lock(lock_key)
+                except Exception:
+                    pass
+
+    def get_or_set_json(self, key, loader, ttl=None, tags=(), consistent=False):
+        """get_or_set for JSON-serializable data"""
+        def load():
+            data = loader()
+            return dumps(data) if data is not None else None
+
+        value = self.get_or_set(key, load, ttl, tags, consistent)
+        return loads(value) if value is not None else None
+
+    def get_or_set_encoded(self, key, loader, ttl=None, tags=()):
+        """
+        get_or_set for JSON-serializable data, returning the encoded document
+
+        The document is stored with its compressed variants (EncodedBody),
+        so responses send the cached bytes as they are instead of decoding,
+        re-encoding and compressing them on every hit.
+
+        Returns:
+            EncodedBody: The document, or None if loader() returned None
+        """
+        def load():
+            data = loader()
+            return EncodedBody.build(dumps(data)).pack() if data is not None else None
+
+        value = self.get_or_set(key, load, ttl, tags)
+        return EncodedBody.unpack(value) if value is not None else None
+
+    def stats(self):
+        """
+        Hit/miss counters of this process
+
+        Returns:
+            dict: Key family -> {"local_hits", "remote_hits", "misses"}, plus
+            "local_entries", "backend" and "shared"
+        """
+        with self._stats_lock:
+            families = {family: dict(counts) for family, counts in self._stats.items()}
+        return {
+            "backend": "redis" if isinstance(self.remote, RedisStore) else "memory",
+            "shared": self.shared,
+            "local_entries": len(self.local),
+            "families": families
+        }
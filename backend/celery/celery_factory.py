@@ -1,5 +1,7 @@
 from celery import Celery
+from celery.signals import worker_init, task_prerun, task_postrun
 import os
+import time
 
 def make_celery(app=None):
     """
@@ -39,5 +41,35 @@ def make_celery(app=None):
     
     return celery
 
+@worker_init.connect
+def init_worker_cache(**kwargs):
+    """Connect the shared cache and metrics directory in workers; the web app does this in app.py"""
+    from backend.config import Config
+    from backend.extensions import cache
+    from backend.metrics import registry
+    settings = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    cache.configure(settings)
+    registry.configure(settings)
+
+# Start times of the tasks running in this process, by task id
+_task_started = {}
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    """Time every task and publish this process's metrics right away"""
+    from backend.metrics import registry, TASK_DURATION
+    started = _task_started.pop(task_id, None)
+    if started is None or task is None:
+        return
+    TASK_DURATION.observe(time.perf_counter() - started, task.name.rsplit('.', 1)[-1], state or 'UNKNOWN')
+    try:
+        registry.flush()
+    except Exception:
+        pass
+
 # Create Celery instance
 celery = make_celery()
@@ -1,4 +1,5 @@
 from celery.schedules import crontab
+from backend.config import Config
 from .celery_factory import celery
 
 # Configure periodic tasks
@@ -19,6 +20,32 @@ def setup_periodic_tasks(sender, **kwargs):
         generate_monthly_reports.s(),
         name='generate_monthly_reports'
     )
+    
+    # Nightly repair of the denormalized child counters
+    # Run every day at 3:00 AM
+    sender.add_periodic_task(
+        crontab(hour=3, minute=0),
+        repair_counters.s(),
+        name='repair_counters'
+    )
+    
+    # Hourly reconciliation of the admin dashboard statistics
+    sender.add_periodic_task(
+        crontab(minute=15),
+        reconcile_stats.s(),
+        name='reconcile_stats'
+    )
+    
+    # Pre-encode today's quiz payloads before the exam window opens
+    # Run every day at QUIZ_PREWARM_HOUR:QUIZ_PREWARM_MINUTE (7:45 AM by default)
+    sender.add_periodic_task(
+        crontab(hour=Config.QUIZ_PREWARM_HOUR, minute=Config.QUIZ_PREWARM_MINUTE),
+        warm_quiz_payloads.s(),
+        name='warm_quiz_payloads'
+    )
 
 # Import tasks after defining the celery instance
-from .tasks import send_daily_reminders, generate_monthly_reports
+from .tasks import (
+    send_daily_reminders, generate_monthly_reports, repair_counters,
+    reconcile_stats, warm_quiz_payloads
+)
@@ -4,57 +4,256 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 import os
 import logging
+import threading
+import time
 import requests
 from backend.config import Config
 
 logger = logging.getLogger(__name__)
 
-def send_email(recipient, subject, html_content, attachments=None):
+def build_message(recipient, subject, html_content, attachments=None, sender=None):
     """
-    Send an email with optional attachments
+    Build a MIME message with an HTML body and optional attachments
     
     Args:
         recipient (str): Email address of the recipient
         subject (str): Subject of the email
         html_content (str): HTML content of the email
         attachments (list): List of dict with 'filename' and 'data' keys
+        sender (str): From address, defaults to MAIL_DEFAULT_SENDER
         
     Returns:
-        bool: True if email sent successfully, False otherwise
+        MIMEMultipart: The message
     """
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = Config.MAIL_DEFAULT_SENDER
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        
-        # Attach HTML content
-        msg.attach(MIMEText(html_content, 'html'))
-        
-        # Attach files if any
-        if attachments:
-            for attachment in attachments:
-                part = MIMEApplication(attachment['data'], Name=attachment['filename'])
-                part['Content-Disposition'] = f'attachment; filename="{attachment["filename"]}"'
-                msg.attach(part)
-        
-        # Connect to SMTP server and send email
-        with smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT) as server:
-            if Config.MAIL_USE_TLS:
+    msg = MIMEMultipart()
+    msg['From'] = sender or Config.MAIL_DEFAULT_SENDER
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    
+    # Attach HTML content
+    msg.attach(MIMEText(html_content, 'html'))
+    
+    # Attach files if any
+    if attachments:
+        for attachment in attachments:
+            part = MIMEApplication(attachment['data'], Name=attachment['filename'])
+            part['Content-Disposition'] = f'attachment; filename="{attachment["filename"]}"'
+            msg.attach(part)
+    
+    return msg
+
+class SMTPDelivery:
+    """
+    Deliver mail over a reused, authenticated SMTP connection
+    
+    The connection (and its STARTTLS/login handshake) is opened lazily and
+    reused for up to max_messages_per_connection messages. A dropped
+    connection is reopened and the message retried once. Sends are paced to
+    at most rate_limit messages per second. Instances are safe to share
+    between threads.
+    """
+    
+    def __init__(self, host=None, port=None, use_tls=None, username=None, password=None,
+                 sender=None, rate_limit=None, batch_size=None, max_messages_per_connection=None,
+                 timeout=30):
+        self.host = host or Config.MAIL_SERVER
+        self.port = port or Config.MAIL_PORT
+        self.use_tls = Config.MAIL_USE_TLS if use_tls is None else use_tls
+        self.username = Config.MAIL_USERNAME if username is None else username
+        self.password = Config.MAIL_PASSWORD if password is None else password
+        self.sender = sender or Config.MAIL_DEFAULT_SENDER
+        self.rate_limit = Config.MAIL_RATE_LIMIT if rate_limit is None else rate_limit
+        self.batch_size = batch_size or Config.MAIL_BATCH_SIZE
+        self.max_messages_per_connection = max_messages_per_connection or Config.MAIL_MAX_MESSAGES_PER_CONNECTION
+        self.timeout = timeout
+        
+        self._server = None
+        self._sent_on_connection = 0
+        self._next_send_at = 0.0
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _connect(self):
+        """Open and authenticate a new connection"""
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
                 server.starttls()
             
-            if Config.MAIL_USERNAME and Config.MAIL_PASSWORD:
-                server.login(Config.MAIL_USERNAME, Config.MAIL_PASSWORD)
-            
-            server.sendmail(Config.MAIL_DEFAULT_SENDER, recipient, msg.as_string())
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        
+        self._server = server
+        self._sent_on_connection = 0
+    
+    def _disconnect(self):
+        """Drop the current connection, politely if it is still alive"""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        self._server = None
+    
+    def close(self):
+        """Close the pooled connection"""
+        with self._lock:
+            self._disconnect()
+    
+    def _throttle(self):
+        """Sleep as needed to stay under rate_limit messages per second"""
+        if not self.rate_limit:
+            return
+        now = time.monotonic()
+        if now < self._next_send_at:
+            time.sleep(self._next_send_at - now)
+            now = self._next_send_at
+        self._next_send_at = now + 1.0 / self.rate_limit
+    
+    def _send_message(self, recipient, msg):
+        """Send one message on the pooled connection, reconnecting once on failure"""
+        if self._server is not None and self._sent_on_connection >= self.max_messages_per_connection:
+            self._disconnect()
+        
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.sendmail(self.sender, recipient, msg.as_string())
+                self._sent_on_connection += 1
+                return
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # The server answered; the connection is fine but this message was rejected
+                raise
+            except (smtplib.SMTPServerDisconnected, OSError):
+                # Stale or broken connection; reconnect and retry once
+                self._disconnect()
+                if attempt:
+                    raise
+    
+    def send(self, recipient, subject, html_content, attachments=None):
+        """
+        Send a single email
+        
+        Returns:
+            dict: {"recipient", "ok", "error"}
+        """
+        msg = build_message(recipient, subject, html_content, attachments, sender=self.sender)
+        
+        with self._lock:
+            self._throttle()
+            try:
+                self._send_message(recipient, msg)
+            except smtplib.SMTPRecipientsRefused as e:
+                return {"recipient": recipient, "ok": False, "error": str(e.recipients.get(recipient, e))}
+            except Exception as e:
+                # Leave the next message a fresh connection
+                self._disconnect()
+                return {"recipient": recipient, "ok": False, "error": str(e)}
+        
+        return {"recipient": recipient, "ok": True, "error": None}
+    
+    def send_many(self, messages):
+        """
+        Send many emails over the pooled connection
+        
+        Messages are sent in batches of batch_size; the connection is kept
+        open across batches and recycled after max_messages_per_connection.
+        
+        Args:
+            messages (iterable): Dicts with 'recipient', 'subject', 'html_content'
+                and optional 'attachments'
+        
+        Returns:
+            list: One {"recipient", "ok", "error"} dict per message, in order
+        """
+        results = []
+        batch = []
         
+        for message in messages:
+            batch.append(message)
+            if len(batch) >= self.batch_size:
+                results.extend(self._send_batch(batch))
+                batch = []
+        if batch:
+            results.extend(self._send_batch(batch))
+        
+        return results
+    
+    def _send_batch(self, batch):
+        results = [
+            self.send(message['recipient'], message['subject'], message['html_content'],
+                      message.get('attachments'))
+            for message in batch
+        ]
+        sent = sum(1 for result in results if result['ok'])
+        logger.info(f"Sent batch of {len(batch)} emails ({sent} delivered)")
+        return results
+
+# One pooled delivery per process; Celery prefork workers each get their own
+_delivery = None
+_delivery_lock = threading.Lock()
+
+def get_delivery():
+    """Return the process-wide SMTPDelivery, creating it on first use"""
+    global _delivery
+    with _delivery_lock:
+        if _delivery is None:
+            _delivery = SMTPDelivery()
+        return _delivery
+
+def send_email(recipient, subject, html_content, attachments=None):
+    """
+    Send an email with optional attachments over the pooled connection
+    
+    Args:
+        recipient (str): Email address of the recipient
+        subject (str): Subject of the email
+        html_content (str): HTML content of the email
+        attachments (list): List of dict with 'filename' and 'data' keys
+        
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    result = get_delivery().send(recipient, subject, html_content, attachments)
+    
+    if result['ok']:
         logger.info(f"Email sent successfully to {recipient}")
-        return True
+    else:
+        logger.error(f"Error sending email to {recipient}: {result['error']}")
     
-    except Exception as e:
-        logger.error(f"Error sending email to {recipient}: {str(e)}")
-        return False
+    return result['ok']
+
+def send_bulk_email(messages):
+    """
+    Send many emails over the pooled connection, in rate-limited batches
+    
+    Args:
+        messages (iterable): Dicts with 'recipient', 'subject', 'html_content'
+            and optional 'attachments'
+        
+    Returns:
+        list: One {"recipient", "ok", "error"} dict per message, in order
+    """
+    results = get_delivery().send_many(messages)
+    
+    for result in results:
+        if not result['ok']:
+            logger.error(f"Error sending email to {result['recipient']}: {result['error']}")
+    
+    return results
 
 def send_google_chat_message(webhook_url, message):
     """
@@ -5,46 +5,46 @@ import io
 from backend.extensions import db
 from backend.models import User, Quiz, Score, Subject, Chapter, Question
 from .celery_factory import celery
-from .mail_service import send_email
-import tempfile
-import pandas as pd
+from .mail_service import send_bulk_email
+import gzip
 import logging
-from sqlalchemy import func
+import time
+from html import escape
+import pandas as pd
+from celery import chord, group
+from sqlalchemy import func, exists, true
+from backend.config import Config
+from backend.queries import score_rows_query, filter_score_rows
+from backend.counters import rebuild_counters
+from backend.stats import reconcile_dashboard_stats
+from backend.quiz_payloads import warm_quiz_payload
+from backend.heartbeats import flush_heartbeats
+from backend.db_engine import begin_bulk_read
+from backend.routing import replica_reads
+from backend.metrics import record_task_rows, record_task_emails
 
 logger = logging.getLogger(__name__)
 
 # Make sure user-downloads directory exists
 os.makedirs(os.path.join("backend", "celery", "user-downloads"), exist_ok=True)
 
-@celery.task
-def send_daily_reminders():
+def render_reminder(username, quiz_lines):
     """
-    Send daily reminders to inactive users
+    Render the HTML body of a reminder email
+    
+    Args:
+        username (str): Recipient's username
+        quiz_lines (list): (subject name, chapter name, quiz title) tuples to list
+    
+    Returns:
+        str: HTML document
     """
-    logger.info("Starting daily reminder task")
+    items = "".join(
+        f"<li><strong>{escape(subject_name)}</strong>: {escape(chapter_name)} - {escape(quiz_title)}</li>"
+        for subject_name, chapter_name, quiz_title in quiz_lines
+    )
     
-    try:
-        # Get inactive users (haven't logged in for 7 days)
-        cutoff_date = datetime.utcnow() - timedelta(days=7)
-        inactive_users = User.query.filter(
-            User.is_admin == False,
-            User.last_active < cutoff_date
-        ).all()
-        
-        # Get recent quizzes (created in the last 7 days)
-        recent_cutoff = datetime.utcnow() - timedelta(days=7)
-        recent_quizzes = Quiz.query.filter(Quiz.created_at > recent_cutoff).all()
-        
-        # Send reminders
-        for user in inactive_users:
-            # Skip users who have attempted all recent quizzes
-            user_scores = [score.quiz_id for score in Score.query.filter_by(user_id=user.id).all()]
-            pending_quizzes = [quiz for quiz in recent_quizzes if quiz.id not in user_scores]
-            
-            if pending_quizzes:
-                # Create email content
-                subject = "Quiz Master Pro - New Quizzes Available"
-                html_content = f"""
+    return f"""
                 <html>
                 <head>
                     <style>
@@ -58,19 +58,9 @@ def send_daily_reminders():
                 </head>
                 <body>
                     <div class="container">
-                        <h1>Hello {user.username}!</h1>
+                        <h1>Hello {escape(username)}!</h1>
                         <p>We've noticed you haven't visited Quiz Master Pro lately. We have some new quizzes that might interest you:</p>
-                        <ul>
-                """
-                
-                # Add up to 5 quizzes
-                for quiz in pending_quizzes[:5]:
-                    chapter = Chapter.query.get(quiz.chapter_id)
-                    subject = Subject.query.get(chapter.subject_id)
-                    html_content += f"<li><strong>{subject.name}</strong>: {chapter.name} - {quiz.title}</li>"
-                
-                html_content += f"""
-                        </ul>
+                        <ul>{items}</ul>
                         <p>Log in now to take these quizzes and improve your knowledge!</p>
                         <p><a href="http://localhost:5000/login">Click here to log in</a></p>
                         <div class="footer">
@@ -81,85 +71,164 @@ def send_daily_reminders():
                 </body>
                 </html>
                 """
-                
-                # Send email
-                send_email(user.email, subject, html_content)
-                logger.info(f"Reminder email sent to {user.email}")
+
+# Maximum number of pending quizzes listed in one reminder
+REMINDER_MAX_QUIZZES = 5
+
+@celery.task
+def send_daily_reminders():
+    """
+    Send daily reminders to inactive users
+    
+    The recent quizzes each inactive user has not attempted are found with a
+    single anti-join, quiz names are resolved once, and the recipients are
+    sent out in chunks as parallel subtasks.
+    """
+    logger.info("Starting daily reminder task")
+    
+    try:
+        # Write buffered heartbeats first so recently active users are not reminded
+        flush_heartbeats()
+        
+        # Inactive users haven't been active for USER_INACTIVITY_DAYS;
+        # recent quizzes were created in the same window
+        cutoff_date = datetime.utcnow() - timedelta(days=Config.USER_INACTIVITY_DAYS)
+        recent_cutoff = cutoff_date
+        
+        # Quiz id -> (subject name, chapter name, quiz title), resolved once per run
+        quiz_lines = {
+            row.id: (row.subject_name, row.chapter_name, row.title)
+            for row in db.session.query(Quiz.id, Quiz.title, Chapter.name.label('chapter_name'),
+                                        Subject.name.label('subject_name'))
+            .join(Chapter, Chapter.id == Quiz.chapter_id)
+            .join(Subject, Subject.id == Chapter.subject_id)
+            .filter(Quiz.created_at > recent_cutoff)
+        }
+        
+        if not quiz_lines:
+            return "No recent quizzes, no reminders sent"
+        
+        # (inactive user, recent quiz) pairs with no score, first few quizzes per user
+        pending = db.session.query(
+            User.id.label('user_id'),
+            User.username,
+            User.email,
+            Quiz.id.label('quiz_id'),
+            func.row_number().over(partition_by=User.id, order_by=Quiz.id).label('position')
+        ).select_from(User).join(Quiz, true()).filter(
+            User.is_admin == False,
+            User.last_active < cutoff_date,
+            Quiz.created_at > recent_cutoff,
+            ~exists().where(Score.user_id == User.id, Score.quiz_id == Quiz.id)
+        ).subquery()
+        
+        rows = db.session.query(pending) \
+            .filter(pending.c.position <= REMINDER_MAX_QUIZZES) \
+            .order_by(pending.c.user_id, pending.c.quiz_id)
+        
+        recipients = []
+        for row in rows:
+            if not recipients or recipients[-1]["user_id"] != row.user_id:
+                recipients.append({
+                    "user_id": row.user_id,
+                    "username": row.username,
+                    "email": row.email,
+                    "quizzes": []
+                })
+            recipients[-1]["quizzes"].append(quiz_lines[row.quiz_id])
+        
+        record_task_rows('send_daily_reminders', sum(len(recipient["quizzes"]) for recipient in recipients))
         
-        return f"Sent reminders to {len(inactive_users)} inactive users"
+        # Fan the sending out across workers
+        chunk_size = Config.REMINDER_CHUNK_SIZE
+        chunks = [recipients[i:i + chunk_size] for i in range(0, len(recipients), chunk_size)]
+        if chunks:
+            group(send_reminder_chunk.s(chunk) for chunk in chunks).apply_async()
+        
+        logger.info(f"Dispatched reminders for {len(recipients)} users in {len(chunks)} chunks")
+        return f"Sending reminders to {len(recipients)} inactive users"
     
     except Exception as e:
         logger.error(f"Error sending daily reminders: {str(e)}")
         return f"Error: {str(e)}"
 
 @celery.task
-def generate_monthly_reports():
+def send_reminder_chunk(recipients):
     """
-    Generate monthly activity reports for all users
+    Render and send reminder emails for one chunk of users
+    
+    Args:
+        recipients (list): Dicts with 'username', 'email' and 'quizzes', where
+            quizzes are (subject name, chapter name, quiz title) lists
     """
-    logger.info("Starting monthly report generation task")
+    subject = "Quiz Master Pro - New Quizzes Available"
     
-    try:
-        # Get all non-admin users
-        users = User.query.filter_by(is_admin=False).all()
-        
-        # Get previous month
-        today = datetime.utcnow()
-        first_day_of_current_month = datetime(today.year, today.month, 1)
-        last_day_of_previous_month = first_day_of_current_month - timedelta(days=1)
-        first_day_of_previous_month = datetime(last_day_of_previous_month.year, 
-                                              last_day_of_previous_month.month, 1)
-        
-        month_name = first_day_of_previous_month.strftime("%B %Y")
-        
-        # Generate report for each user
-        for user in users:
-            # Get all scores for user in previous month
-            scores = Score.query.filter(
-                Score.user_id == user.id,
-                Score.attempt_date >= first_day_of_previous_month,
-                Score.attempt_date <= last_day_of_previous_month
-            ).all()
-            
-            # Skip users with no activity
-            if not scores:
-                logger.info(f"No activity for user {user.username} in {month_name}, skipping report")
-                continue
-            
-            # Calculate statistics
-            total_quizzes = len(scores)
-            total_questions = sum(score.total_questions for score in scores)
-            total_correct = sum(score.total_correct for score in scores)
-            average_score = sum(score.percentage_score for score in scores) / total_quizzes if total_quizzes > 0 else 0
-            
-            # Generate HTML report
-            subject = f"Quiz Master Pro - Your Activity Report for {month_name}"
-            html_content = f"""
-            <html>
-            <head>
+    results = send_bulk_email(
+        {
+            "recipient": recipient["email"],
+            "subject": subject,
+            "html_content": render_reminder(recipient["username"], recipient["quizzes"])
+        }
+        for recipient in recipients
+    )
+    
+    emails_sent = sum(1 for result in results if result['ok'])
+    record_task_emails('send_daily_reminders', emails_sent)
+    logger.info(f"Reminder chunk sent {emails_sent} of {len(recipients)} emails")
+    return {"recipients": len(recipients), "emails_sent": emails_sent}
+
+def _previous_month_range(today=None):
+    """Return (first moment of previous month, first moment of current month, month name)"""
+    today = today or datetime.utcnow()
+    first_day_of_current_month = datetime(today.year, today.month, 1)
+    last_day_of_previous_month = first_day_of_current_month - timedelta(days=1)
+    first_day_of_previous_month = datetime(last_day_of_previous_month.year,
+                                          last_day_of_previous_month.month, 1)
+    return first_day_of_previous_month, first_day_of_current_month, first_day_of_previous_month.strftime("%B %Y")
+
+REPORT_STYLE = """
                 <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; }}
-                    .container {{ padding: 20px; }}
-                    h1 {{ color: #2c3e50; text-align: center; }}
-                    h2 {{ color: #3498db; }}
-                    .summary {{ background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
-                    .summary p {{ margin: 5px 0; }}
-                    table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                    th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                    th {{ background-color: #f2f2f2; }}
-                    tr:nth-child(even) {{ background-color: #f9f9f9; }}
-                    .footer {{ margin-top: 30px; color: #7f8c8d; font-size: 0.9em; text-align: center; }}
+                    body { font-family: Arial, sans-serif; line-height: 1.6; }
+                    .container { padding: 20px; }
+                    h1 { color: #2c3e50; text-align: center; }
+                    h2 { color: #3498db; }
+                    .summary { background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin-bottom: 20px; }
+                    .summary p { margin: 5px 0; }
+                    table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+                    th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+                    th { background-color: #f2f2f2; }
+                    tr:nth-child(even) { background-color: #f9f9f9; }
+                    .footer { margin-top: 30px; color: #7f8c8d; font-size: 0.9em; text-align: center; }
                 </style>
-            </head>
+"""
+
+def render_monthly_report(month_name, summary, score_rows, subject_rows, generated_on):
+    """
+    Render the HTML body of one user's monthly report
+    
+    Args:
+        month_name (str): e.g. "March 2025"
+        summary: Row with total_quizzes, total_questions, total_correct, average_score
+        score_rows: Rows with attempt_date, subject_name, chapter_name, quiz_title,
+            percentage_score, total_correct, total_questions, time_taken
+        subject_rows: Rows with subject_name, quizzes_taken, average_score
+        generated_on (str): Date printed in the footer
+    
+    Returns:
+        str: HTML document
+    """
+    parts = [f"""
+            <html>
+            <head>{REPORT_STYLE}</head>
             <body>
                 <div class="container">
                     <h1>Monthly Activity Report: {month_name}</h1>
                     <div class="summary">
                         <h2>Summary</h2>
-                        <p><strong>Total Quizzes Taken:</strong> {total_quizzes}</p>
-                        <p><strong>Total Questions Answered:</strong> {total_questions}</p>
-                        <p><strong>Total Correct Answers:</strong> {total_correct}</p>
-                        <p><strong>Average Score:</strong> {average_score:.2f}%</p>
+                        <p><strong>Total Quizzes Taken:</strong> {summary.total_quizzes}</p>
+                        <p><strong>Total Questions Answered:</strong> {summary.total_questions}</p>
+                        <p><strong>Total Correct Answers:</strong> {summary.total_correct}</p>
+                        <p><strong>Average Score:</strong> {summary.average_score:.2f}%</p>
                     </div>
                     
                     <h2>Quiz Details</h2>
@@ -172,31 +241,24 @@ def generate_monthly_reports():
                             <th>Score</th>
                             <th>Time Taken</th>
                         </tr>
-            """
-            
-            # Add rows for each score
-            for score in scores:
-                quiz = Quiz.query.get(score.quiz_id)
-                chapter = Chapter.query.get(quiz.chapter_id)
-                subject = Subject.query.get(chapter.subject_id)
-                
-                # Format time taken (seconds to MM:SS)
-                minutes = score.time_taken // 60
-                seconds = score.time_taken % 60
-                time_formatted = f"{minutes:02d}:{seconds:02d}"
-                
-                html_content += f"""
+    """]
+    
+    # Add rows for each score
+    for score in score_rows:
+        # Format time taken (seconds to MM:SS)
+        minutes, seconds = divmod(int(score.time_taken), 60)
+        parts.append(f"""
                         <tr>
                             <td>{score.attempt_date.strftime("%Y-%m-%d %H:%M")}</td>
-                            <td>{subject.name}</td>
-                            <td>{chapter.name}</td>
-                            <td>{quiz.title}</td>
+                            <td>{escape(score.subject_name)}</td>
+                            <td>{escape(score.chapter_name)}</td>
+                            <td>{escape(score.quiz_title)}</td>
                             <td>{score.percentage_score:.2f}% ({score.total_correct}/{score.total_questions})</td>
-                            <td>{time_formatted}</td>
+                            <td>{minutes:02d}:{seconds:02d}</td>
                         </tr>
-                """
-            
-            html_content += f"""
+        """)
+    
+    parts.append("""
                     </table>
                     
                     <h2>Performance by Subject</h2>
@@ -206,107 +268,311 @@ def generate_monthly_reports():
                             <th>Quizzes Taken</th>
                             <th>Average Score</th>
                         </tr>
-            """
-            
-            # Group scores by subject
-            subject_scores = {}
-            for score in scores:
-                quiz = Quiz.query.get(score.quiz_id)
-                chapter = Chapter.query.get(quiz.chapter_id)
-                subject = Subject.query.get(chapter.subject_id)
-                
-                if subject.name not in subject_scores:
-                    subject_scores[subject.name] = {
-                        'count': 0,
-                        'total_score': 0
-                    }
-                
-                subject_scores[subject.name]['count'] += 1
-                subject_scores[subject.name]['total_score'] += score.percentage_score
-            
-            # Add rows for each subject
-            for subject_name, data in subject_scores.items():
-                avg_score = data['total_score'] / data['count']
-                html_content += f"""
+    """)
+    
+    # Add rows for each subject
+    for subject in subject_rows:
+        parts.append(f"""
                         <tr>
-                            <td>{subject_name}</td>
-                            <td>{data['count']}</td>
-                            <td>{avg_score:.2f}%</td>
+                            <td>{escape(subject.subject_name)}</td>
+                            <td>{subject.quizzes_taken}</td>
+                            <td>{subject.average_score:.2f}%</td>
                         </tr>
-                """
-            
-            html_content += f"""
+        """)
+    
+    parts.append(f"""
                     </table>
                     
                     <div class="footer">
-                        <p>This is an automated report generated on {datetime.utcnow().strftime("%Y-%m-%d")}.</p>
+                        <p>This is an automated report generated on {generated_on}.</p>
                         <p>Log in to <a href="http://localhost:5000">Quiz Master Pro</a> to see more details and take more quizzes!</p>
                     </div>
                 </div>
             </body>
             </html>
-            """
-            
-            # Send email with report
-            send_email(user.email, subject, html_content)
-            logger.info(f"Monthly report sent to {user.email}")
+    """)
+    
+    return "".join(parts)
+
+@celery.task
+@replica_reads
+def generate_monthly_reports():
+    """
+    Generate monthly activity reports for all users
+    
+    Finds every non-admin user with activity last month in one grouped query
+    and fans the rendering out in chunks across workers; a chord callback
+    reports the totals once every chunk is done.
+    """
+    logger.info("Starting monthly report generation task")
+    started_at = time.time()
+    
+    try:
+        start, end, month_name = _previous_month_range()
+        
+        # Users without activity get no report, so only active users are fetched
+        user_ids = [row.user_id for row in db.session.query(Score.user_id)
+                    .join(User, User.id == Score.user_id)
+                    .filter(User.is_admin == False,
+                            Score.attempt_date >= start,
+                            Score.attempt_date < end)
+                    .group_by(Score.user_id)
+                    .order_by(Score.user_id)]
+        
+        chunk_size = Config.REPORT_CHUNK_SIZE
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        
+        logger.info(f"Dispatching {len(chunks)} report chunks for {len(user_ids)} users in {month_name}")
+        
+        if chunks:
+            chord(
+                send_monthly_report_chunk.s(chunk, start.isoformat(), end.isoformat())
+                for chunk in chunks
+            )(summarize_monthly_reports.s(started_at))
         
-        return f"Generated reports for {len(users)} users"
+        return {"month": month_name, "users": len(user_ids), "chunks": len(chunks)}
     
     except Exception as e:
         logger.error(f"Error generating monthly reports: {str(e)}")
         return f"Error: {str(e)}"
 
 @celery.task
-def generate_scores_csv():
+@replica_reads
+def send_monthly_report_chunk(user_ids, start, end):
+    """
+    Render and send the monthly reports of one chunk of users
+    
+    The chunk's scores come from a single joined query; per-user and
+    per-user-per-subject aggregates are computed in one vectorized pandas pass.
+    
+    Args:
+        user_ids (list): Users in this chunk
+        start (str): ISO timestamp of the first moment of the month
+        end (str): ISO timestamp of the first moment of the next month
+    """
+    started_at = time.time()
+    start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    month_name = start.strftime("%B %Y")
+    generated_on = datetime.utcnow().strftime("%Y-%m-%d")
+    
+    query = filter_score_rows(score_rows_query(), date_from=start, date_to=end) \
+        .filter(Score.user_id.in_(user_ids)) \
+        .order_by(None).order_by(Score.user_id, Score.attempt_date)
+    
+    scores = pd.read_sql(query.statement, db.session.connection())
+    if scores.empty:
+        return {"users": 0, "rows": 0, "emails_sent": 0, "seconds": time.time() - started_at}
+    scores['attempt_date'] = pd.to_datetime(scores['attempt_date'])
+    
+    summaries = scores.groupby('user_id').agg(
+        username=('username', 'first'),
+        email=('email', 'first'),
+        total_quizzes=('id', 'size'),
+        total_questions=('total_questions', 'sum'),
+        total_correct=('total_correct', 'sum'),
+        average_score=('percentage_score', 'mean')
+    )
+    by_subject = scores.groupby(['user_id', 'subject_name'], sort=True).agg(
+        quizzes_taken=('id', 'size'),
+        average_score=('percentage_score', 'mean')
+    ).reset_index()
+    
+    subject_groups = dict(tuple(by_subject.groupby('user_id')))
+    subject = f"Quiz Master Pro - Your Activity Report for {month_name}"
+    
+    messages = (
+        {
+            "recipient": summaries.loc[user_id].email,
+            "subject": subject,
+            "html_content": render_monthly_report(
+                month_name,
+                summaries.loc[user_id],
+                user_scores.itertuples(index=False),
+                subject_groups[user_id].itertuples(index=False),
+                generated_on
+            )
+        }
+        for user_id, user_scores in scores.groupby('user_id')
+    )
+    
+    # Send the reports over one pooled, rate-limited SMTP connection
+    results = send_bulk_email(messages)
+    emails_sent = sum(1 for result in results if result['ok'])
+    record_task_rows('generate_monthly_reports', len(scores))
+    record_task_emails('generate_monthly_reports', emails_sent)
+    
+    return {
+        "users": len(summaries),
+        "rows": len(scores),
+        "emails_sent": emails_sent,
+        "seconds": time.time() - started_at
+    }
+
+@celery.task
+def summarize_monthly_reports(results, started_at):
+    """
+    Log and return the totals of a monthly report run
+    
+    Args:
+        results (list): Return values of send_monthly_report_chunk
+        started_at (float): Epoch time the run was started
+    """
+    summary = {
+        "users": sum(result["users"] for result in results),
+        "rows_processed": sum(result["rows"] for result in results),
+        "emails_sent": sum(result["emails_sent"] for result in results),
+        "chunks": len(results),
+        "runtime_seconds": round(time.time() - started_at, 3)
+    }
+    logger.info(f"Monthly reports finished: {summary}")
+    return summary
+
+@celery.task
+def repair_counters():
+    """
+    Rebuild the denormalized child counters to correct any drift
+    """
+    logger.info("Starting counter repair task")
+    
+    try:
+        changed = rebuild_counters()
+        return {"changed": changed}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error repairing counters: {str(e)}")
+        return {"error": str(e)}
+
+@celery.task
+def reconcile_stats():
+    """
+    Recount the admin dashboard statistics to correct any drift
+    """
+    logger.info("Starting dashboard stats reconciliation task")
+    
+    try:
+        drift = reconcile_dashboard_stats()
+        return {"corrected": drift}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error reconciling dashboard stats: {str(e)}")
+        return {"error": str(e)}
+
+@celery.task
+def warm_quiz_payloads(day=None):
+    """
+    Pre-encode the question payloads of the quizzes held on a day
+    
+    Runs shortly before the exam window so the first students to open a
+    quiz are served from the cache instead of all missing at once.
+    
+    Args:
+        day (str): Date as YYYY-MM-DD, defaults to today
+    """
+    day = datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.utcnow().date()
+    logger.info(f"Warming quiz payloads for {day}")
+    
+    try:
+        quiz_ids = [quiz_id for quiz_id, in db.session.query(Quiz.id).filter(Quiz.date_of_quiz == day)]
+        warmed = sum(1 for quiz_id in quiz_ids if warm_quiz_payload(quiz_id))
+        logger.info(f"Warmed {warmed} of {len(quiz_ids)} quiz payloads")
+        return {"date": day.isoformat(), "quizzes": len(quiz_ids), "warmed": warmed}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error warming quiz payloads: {str(e)}")
+        return {"error": str(e)}
+
+def _report_progress(task, **meta):
+    """Publish PROGRESS state for a bound task; a missing result backend is not fatal"""
+    if not task.request.id:
+        return
+    try:
+        task.update_state(state='PROGRESS', meta=meta)
+    except Exception as e:
+        logger.debug(f"Could not update task state: {str(e)}")
+
+CSV_HEADER = [
+    'User ID', 'Username', 'Email', 'Subject', 'Chapter', 'Quiz', 'Date of Quiz',
+    'Total Questions', 'Correct Answers', 'Score (%)', 'Time Taken (seconds)', 'Attempt Date'
+]
+
+@celery.task(bind=True)
+@replica_reads
+def generate_scores_csv(self, compress=False, chunk_size=None):
     """
     Generate a CSV file with all quiz scores for admin export
+    
+    Rows are streamed from a server-side cursor over a single joined query
+    and written in chunks, so memory stays flat regardless of table size.
+    
+    Args:
+        compress (bool): Write a gzip-compressed file (scores_<id>.csv.gz)
+        chunk_size (int): Rows fetched and written per batch
     """
     logger.info("Starting CSV export task")
     
+    chunk_size = chunk_size or Config.CSV_EXPORT_CHUNK_SIZE
+    partial_path = None
+    
     try:
-        # Create a unique task ID
-        task_id = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        # Name the file after the Celery task so get_csv_file can find it
+        task_id = self.request.id or datetime.utcnow().strftime("%Y%m%d%H%M%S")
         
         # Directory for storing files
         output_dir = os.path.join("backend", "celery", "user-downloads")
         os.makedirs(output_dir, exist_ok=True)
         
-        # File path
-        file_path = os.path.join(output_dir, f"scores_{task_id}.csv")
+        # File path; write to a temporary name and rename once complete
+        file_name = f"scores_{task_id}.csv.gz" if compress else f"scores_{task_id}.csv"
+        file_path = os.path.join(output_dir, file_name)
+        partial_path = file_path + ".part"
         
-        # Get all scores with related data
-        scores_data = []
-        scores = Score.query.all()
+        total_rows = db.session.query(func.count(Score.id)).scalar()
+        rows_written = 0
         
-        for score in scores:
-            user = User.query.get(score.user_id)
-            quiz = Quiz.query.get(score.quiz_id)
-            chapter = Chapter.query.get(quiz.chapter_id)
-            subject = Subject.query.get(chapter.subject_id)
+        statement = score_rows_query().order_by(None).order_by(Score.id).statement
+        # Server-side cursor on Postgres, without the per-statement timeout
+        begin_bulk_read(db.session, Config)
+        result = db.session.execute(statement, execution_options={
+            "stream_results": True,
+            "yield_per": chunk_size
+        })
+        
+        opener = gzip.open if compress else open
+        with opener(partial_path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
             
-            scores_data.append({
-                'User ID': user.id,
-                'Username': user.username,
-                'Email': user.email,
-                'Subject': subject.name,
-                'Chapter': chapter.name,
-                'Quiz': quiz.title,
-                'Date of Quiz': quiz.date_of_quiz.isoformat(),
-                'Total Questions': score.total_questions,
-                'Correct Answers': score.total_correct,
-                'Score (%)': score.percentage_score,
-                'Time Taken (seconds)': score.time_taken,
-                'Attempt Date': score.attempt_date.isoformat()
-            })
+            for chunk in result.partitions():
+                writer.writerows(
+                    (
+                        row.user_id,
+                        row.username,
+                        row.email,
+                        row.subject_name,
+                        row.chapter_name,
+                        row.quiz_title,
+                        row.date_of_quiz.isoformat(),
+                        row.total_questions,
+                        row.total_correct,
+                        row.percentage_score,
+                        row.time_taken,
+                        row.attempt_date.isoformat()
+                    )
+                    for row in chunk
+                )
+                rows_written += len(chunk)
+                record_task_rows('generate_scores_csv', len(chunk))
+                
+                # Report progress through the task state
+                _report_progress(self, rows_written=rows_written, total_rows=total_rows)
         
-        # Create DataFrame and export to CSV
-        df = pd.DataFrame(scores_data)
-        df.to_csv(file_path, index=False)
+        os.replace(partial_path, file_path)
         
-        logger.info(f"CSV export completed: {file_path}")
-        return {"task_id": task_id, "file_path": file_path}
+        logger.info(f"CSV export completed: {file_path} ({rows_written} rows)")
+        return {"task_id": task_id, "file_path": file_path, "rows_written": rows_written}
     
     except Exception as e:
         logger.error(f"Error generating CSV: {str(e)}")
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
         return {"error": str(e)}
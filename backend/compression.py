@@ -0,0 +1,178 @@
+from flask import request, Response
+from backend.config import Config
+import gzip
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content codings we can produce, smallest output first: the preference for
+# bodies compressed ahead of time, when a client accepts several equally
+ENCODINGS = [encoding for encoding, module in (('br', brotli), ('zstd', zstandard), ('gzip', gzip)) if module]
+
+# Cheapest first: the preference for bodies compressed per request
+DYNAMIC_ENCODINGS = [encoding for encoding in ('zstd', 'br', 'gzip') if encoding in ENCODINGS]
+
+# File suffix of each coding's precompressed variant
+SUFFIXES = {'br': '.br', 'zstd': '.zst', 'gzip': '.gz'}
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+
+def compress(body, encoding, level=None):
+    """
+    Compress a body with a content coding
+
+    Args:
+        body (bytes): Data to compress
+        encoding (str): 'br', 'zstd' or 'gzip'
+        level (int): Compression level, the coding's maximum by default
+
+    Returns:
+        bytes: The compressed body
+    """
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=11 if level is None else level)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=19 if level is None else level).compress(body)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+def negotiate(accept_encodings, available, preference=None):
+    """
+    Pick the coding to send from the ones a body is available in
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header
+        available: Codings the body is available in
+        preference (list): Order among codings the client accepts equally,
+            ENCODINGS by default
+
+    Returns:
+        str: The coding, or None to send the body uncompressed
+    """
+    offered = [encoding for encoding in (preference or ENCODINGS) if encoding in available]
+    if not offered:
+        return None
+    return accept_encodings.best_match(offered)
+
+class EncodedBody:
+    """
+    A response body with its compressed variants
+
+    Bodies kept in the cache are compressed once when they are built, at
+    the API_COMPRESSION_LEVELS, and pack() stores all variants in one
+    value; a cache hit only picks the variant the client accepts.
+
+    Attributes:
+        bodies (dict): Content coding (None for identity) -> body
+    """
+
+    # Marks packed values and versions their format; change it when the format changes
+    MAGIC = b'\x00encoded\n'
+
+    def __init__(self, body, variants=None):
+        self.bodies = {None: body}
+        self.bodies.update(variants or {})
+
+    @property
+    def body(self):
+        """The uncompressed body"""
+        return self.bodies[None]
+
+    @classmethod
+    def build(cls, body):
+        """Compress a body with every available coding, if compression is on and it is large enough"""
+        variants = {}
+        if Config.API_COMPRESSION and len(body) >= Config.API_COMPRESSION_MIN_BYTES:
+            for encoding in ENCODINGS:
+                compressed = compress(body, encoding, Config.API_COMPRESSION_LEVELS.get(encoding))
+                if len(compressed) < len(body):
+                    variants[encoding] = compressed
+        return cls(body, variants)
+
+    def pack(self):
+        """Serialize to one cache value: a header of codings and lengths, then the bodies"""
+        header = ','.join(f"{encoding or 'identity'}:{len(body)}" for encoding, body in self.bodies.items())
+        return self.MAGIC + header.encode() + b'\n' + b''.join(self.bodies.values())
+
+    @classmethod
+    def unpack(cls, value):
+        if isinstance(value, str):
+            value = value.encode()
+        if not value.startswith(cls.MAGIC):
+            raise ValueError("Not a packed EncodedBody")
+
+        header, _, data = value[len(cls.MAGIC):].partition(b'\n')
+        bodies = {}
+        offset = 0
+        for item in header.decode().split(','):
+            encoding, length = item.split(':')
+            bodies[None if encoding == 'identity' else encoding] = data[offset:offset + int(length)]
+            offset += int(length)
+
+        encoded = cls(bodies.pop(None))
+        encoded.bodies.update(bodies)
+        return encoded
+
+    def response(self, mimetype='application/json', status=200):
+        """Send the variant the client accepts"""
+        encoding = negotiate(request.accept_encodings, self.bodies)
+        response = Response(self.bodies[encoding], status=status, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if len(self.bodies) > 1:
+            response.vary.add('Accept-Encoding')
+        return response
+
+def compress_response(response):
+    """
+    Compress an /api response on the fly when the client accepts it
+
+    Responses that are streamed, already encoded, not JSON or text, or
+    smaller than API_COMPRESSION_MIN_BYTES are left alone.
+    """
+    if not request.path.startswith('/api/'):
+        return response
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    body = response.get_data()
+    if len(body) < Config.API_COMPRESSION_MIN_BYTES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings, DYNAMIC_ENCODINGS, DYNAMIC_ENCODINGS)
+    if not encoding:
+        return response
+
+    compressed = compress(body, encoding, Config.API_COMPRESSION_LEVELS.get(encoding))
+    if len(compressed) >= len(body):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    # Each coding needs its own validator
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+def init_compression(app):
+    """Compress /api responses on the fly when API_COMPRESSION is on"""
+    if app.config.get('API_COMPRESSION'):
+        app.after_request(compress_response)
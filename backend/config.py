@@ -7,19 +7,79 @@ class Config:
     db_path = os.path.join(basedir, 'instance', 'database.sqlite3')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f'sqlite:///{db_path}')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
+    
+    # Engine profile: 'auto' (from the URL), 'sqlite', 'postgres' or 'default'
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'auto')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a connection
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # Postgres
+    DB_BULK_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_BULK_STATEMENT_TIMEOUT_MS', 0))  # Exports, 0 for none
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
+    
+    # Optional read replica for read-only requests and reporting tasks
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))  # Reads stay on the primary after a write
+    
+    # Per-request SQL profiling: Server-Timing headers and /api/admin/perf (off by default)
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', '0') == '1'
+    SQL_PROFILING_REPEAT_THRESHOLD = int(os.environ.get('SQL_PROFILING_REPEAT_THRESHOLD', 5))  # Same statement this often in a request = N+1
+    SQL_PROFILING_WINDOW = 500  # Recent requests per route kept for the percentiles
+    
+    # Prometheus metrics at /metrics; a METRICS_DIR shared by all workers aggregates them
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 5  # Seconds between the snapshots each process writes to METRICS_DIR
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token required by /metrics when set
     
     # JWT
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'dev-jwt-secret')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    PRINCIPAL_CACHE_TTL = 60  # Seconds a role loaded from the database is trusted
+    
+    # Uploaded question images, stored by content hash
+    BLOB_STORE_DIR = os.environ.get('BLOB_STORE_DIR', os.path.join(basedir, 'instance', 'blobs'))
+    MAX_IMAGE_BYTES = 5 * 1024 * 1024
+    
+    # Fingerprinted, precompressed frontend written by `flask build-assets`
+    ASSETS_DIR = os.environ.get('ASSETS_DIR', os.path.join(basedir, 'dist'))
     
     # Redis
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     
+    # Cache: 'redis' (with in-memory fallback when Redis is unreachable) or 'memory'
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'redis')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', REDIS_URL)
+    CACHE_REDIS_MAX_CONNECTIONS = int(os.environ.get('CACHE_REDIS_MAX_CONNECTIONS', 50))
+    CACHE_DEFAULT_TTL = 300
+    CACHE_LOCAL_MAX_ENTRIES = int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1024))
+    CACHE_LOCAL_TTL = int(os.environ.get('CACHE_LOCAL_TTL', 5))  # Bounds staleness across workers
+    CACHE_MEMORY_MAX_ENTRIES = int(os.environ.get('CACHE_MEMORY_MAX_ENTRIES', 10000))  # In-memory fallback tier
+    # The in-memory fallback only holds answer keys and roles when the app runs in one process
+    # (flask run, a single gunicorn worker); with several workers invalidations would not reach the others
+    CACHE_SINGLE_PROCESS = os.environ.get('CACHE_SINGLE_PROCESS', '0') == '1'
+    
+    # Compression of /api responses: gzip, plus br and zstd when brotli and zstandard are installed.
+    # Cached responses are stored with every coding, the rest is compressed per request.
+    API_COMPRESSION = os.environ.get('API_COMPRESSION', '1') == '1'
+    API_COMPRESSION_MIN_BYTES = int(os.environ.get('API_COMPRESSION_MIN_BYTES', 1024))
+    API_COMPRESSION_LEVELS = {
+        'gzip': int(os.environ.get('API_COMPRESSION_LEVEL_GZIP', 6)),
+        'br': int(os.environ.get('API_COMPRESSION_LEVEL_BR', 5)),
+        'zstd': int(os.environ.get('API_COMPRESSION_LEVEL_ZSTD', 3)),
+    }
+    
+    # Pre-encoded quiz question payloads, warmed daily before the exam window opens
+    QUIZ_PAYLOAD_TTL = 6 * 3600
+    QUIZ_PREWARM_HOUR = int(os.environ.get('QUIZ_PREWARM_HOUR', 7))  # UTC
+    QUIZ_PREWARM_MINUTE = int(os.environ.get('QUIZ_PREWARM_MINUTE', 45))
+    
+    # last_active heartbeats are buffered and written in bulk; 0 writes each one through
+    HEARTBEAT_FLUSH_INTERVAL = float(os.environ.get('HEARTBEAT_FLUSH_INTERVAL', 30))  # Seconds
+    HEARTBEAT_MAX_PENDING = 10000
+    
     # Celery
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -31,8 +91,17 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@quizmasterpro.com')
+    MAIL_RATE_LIMIT = float(os.environ.get('MAIL_RATE_LIMIT', 10))  # Messages per second, 0 for no limit
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 50))
+    MAIL_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('MAIL_MAX_MESSAGES_PER_CONNECTION', 100))
     
     # App specific
     ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
     ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'adminpassword')
     USER_INACTIVITY_DAYS = 7  # Number of days after which a user is considered inactive
+    SCORES_PAGE_SIZE = 50  # Default page size for score listings
+    SCORES_MAX_PAGE_SIZE = 200  # Upper bound for the ?limit= parameter of score listings
+    CSV_EXPORT_CHUNK_SIZE = 5000  # Rows fetched and written per batch by the CSV export
+    STREAM_BATCH_SIZE = 500  # Rows fetched and sent per chunk by ?stream=1 listings
+    REPORT_CHUNK_SIZE = 500  # Users per monthly report subtask
+    REMINDER_CHUNK_SIZE = 500  # Users per daily reminder subtask
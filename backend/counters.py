@@ -0,0 +1,76 @@
+from backend.extensions import db
+from backend.models import Subject, Chapter, Quiz, Question
+from sqlalchemy import inspect, func, select
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Denormalized child counters: (counter column, child model, child foreign key)
+COUNTERS = [
+    (Subject.chapters_count, Chapter, Chapter.subject_id),
+    (Chapter.quizzes_count, Quiz, Quiz.chapter_id),
+    (Quiz.questions_count, Question, Question.quiz_id),
+]
+
+def adjust_counter(column, row_id, delta):
+    """
+    Atomically add delta to a counter column in the current transaction
+
+    The UPDATE is issued on the session, so it commits or rolls back
+    together with the insert or delete it accounts for.
+
+    Args:
+        column: Counter column, e.g. Subject.chapters_count
+        row_id (int): Primary key of the parent row
+        delta (int): Amount to add (negative to subtract)
+    """
+    model = column.class_
+    db.session.query(model).filter(model.id == row_id) \
+        .update({column: column + delta}, synchronize_session=False)
+
+def rebuild_counters():
+    """
+    Recompute every counter column from the child tables
+
+    Each counter is rebuilt with one correlated UPDATE, so this is safe to
+    run as a periodic repair job.
+
+    Returns:
+        dict: Number of parent rows whose counter changed, by counter name
+    """
+    changed = {}
+
+    for column, child, foreign_key in COUNTERS:
+        model = column.class_
+        actual = select(func.count(child.id)).where(foreign_key == model.id).scalar_subquery()
+        result = db.session.query(model).filter(column != actual) \
+            .update({column: actual}, synchronize_session=False)
+        changed[f"{model.__tablename__}.{column.key}"] = result
+
+    db.session.commit()
+    logger.info(f"Rebuilt child counters: {changed}")
+    return changed
+
+def ensure_counter_columns():
+    """
+    Add the counter columns to tables created before they existed
+
+    db.create_all() never alters existing tables, so older databases get the
+    columns here and are backfilled with rebuild_counters().
+    """
+    inspector = inspect(db.engine)
+    added = False
+
+    for column, _, _ in COUNTERS:
+        table = column.class_.__tablename__
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column.key not in existing:
+            logger.info(f"Adding counter column {table}.{column.key}")
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table} ADD COLUMN {column.key} INTEGER NOT NULL DEFAULT 0"
+                )
+            added = True
+
+    if added:
+        rebuild_counters()
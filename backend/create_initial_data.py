@@ -68,15 +68,15 @@ def create_sample_data():
         questions = [
             Question(
                 quiz_id=quiz.id,
-                question_text="What is 2x + 3 when x = 2?",
-                correct_answer="7",
-                options=["5", "6", "7", "8"]
+                question_statement="What is 2x + 3 when x = 2?",
+                option1="5", option2="6", option3="7", option4="8",
+                correct_option=3
             ),
             Question(
                 quiz_id=quiz.id,
-                question_text="Solve for x: 3x = 9",
-                correct_answer="3",
-                options=["2", "3", "4", "5"]
+                question_statement="Solve for x: 3x = 9",
+                option1="2", option2="3", option3="4", option4="5",
+                correct_option=2
             )
         ]
         for question in questions:
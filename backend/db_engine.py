@@ -0,0 +1,206 @@
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool that counts checkouts, checkins and timeouts and times how
+    long callers wait for a connection
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "connects": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def recreate(self):
+        # dispose() rebuilds the pool; keep counting across the rebuild
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        pool._metrics_lock = self._metrics_lock
+        return pool
+
+    def _count(self, name, amount=1):
+        with self._metrics_lock:
+            self.metrics[name] += amount
+
+    def connect(self):
+        self._count("checkouts")
+        return super().connect()
+
+    def _do_return_conn(self, record):
+        self._count("checkins")
+        super()._do_return_conn(record)
+
+    def _create_connection(self):
+        self._count("connects")
+        return super()._create_connection()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self._count("timeouts")
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._metrics_lock:
+                self.metrics["wait_seconds_total"] += waited
+                self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+
+    def stats(self):
+        """Counters plus the pool's current occupancy"""
+        with self._metrics_lock:
+            stats = dict(self.metrics)
+        stats.update({
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": self.overflow(),
+        })
+        return stats
+
+def _pragma_listener(pragmas):
+    """A connect listener applying the given SQLite pragmas"""
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return apply_pragmas
+
+class SQLitePool(MeteredQueuePool):
+    """
+    Metered pool that applies its SQLite pragmas to every new connection
+
+    The pragmas come from create_engine(pragmas=...), so each engine (the
+    primary and a replica bind) keeps its own.
+    """
+
+    def __init__(self, creator, pragmas=None, **kwargs):
+        super().__init__(creator, **kwargs)
+        # Pools rebuilt by recreate() get the listener with the copied dispatch
+        if pragmas and '_dispatch' not in kwargs:
+            event.listen(self, 'connect', _pragma_listener(dict(pragmas)))
+
+def detect_profile(uri):
+    """Pick the engine profile for a database URL"""
+    backend = make_url(uri).get_backend_name()
+    if backend == 'sqlite':
+        return 'sqlite'
+    if backend == 'postgresql':
+        return 'postgres'
+    return 'default'
+
+def engine_options(config, uri=None):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the configured profile
+
+    Profiles:
+        sqlite: WAL journal, synchronous=NORMAL, busy_timeout, mmap_size and
+            cache_size on every connection, so readers no longer block the
+            writer and writers wait instead of failing with "database is locked"
+        postgres: sized pool, pre-ping and recycling, and a per-connection
+            statement_timeout
+        default: the previous pool_recycle / pool_pre_ping settings
+
+    The sqlite and postgres profiles use a metered pool (see pool_stats).
+
+    Args:
+        config: Object with the DB_* settings and SQLALCHEMY_DATABASE_URI
+        uri (str): Database URL to build options for, defaults to the primary
+
+    Returns:
+        dict: Keyword arguments for create_engine
+    """
+    uri = uri or config.SQLALCHEMY_DATABASE_URI
+    profile = config.DB_PROFILE
+    if profile == 'auto':
+        profile = detect_profile(uri)
+
+    if profile == 'sqlite':
+        database = make_url(uri).database
+        if not database or database == ':memory:':
+            # In-memory databases live in a single connection; keep the default pool
+            return {}
+
+        return {
+            "poolclass": SQLitePool,
+            "pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+                "mmap_size": config.SQLITE_MMAP_SIZE,
+                "cache_size": -config.SQLITE_CACHE_SIZE_KB,  # Negative values are KiB
+            },
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+            "connect_args": {
+                "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+                "check_same_thread": False,
+            },
+        }
+
+    if profile == 'postgres':
+        options = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+        return {
+            "poolclass": MeteredQueuePool,
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+            "pool_use_lifo": True,
+            "connect_args": {"options": options, "application_name": "quiz_master_pro"},
+        }
+
+    return {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+
+def begin_bulk_read(session, config):
+    """
+    Prepare the current transaction for a long streaming read
+
+    On Postgres the statement timeout is lifted (or raised to
+    DB_BULK_STATEMENT_TIMEOUT_MS) for this transaction only; combined with
+    stream_results the rows come from a server-side cursor. Other databases
+    need nothing.
+    """
+    # Run on the session's connection so the SET is not routed as a write
+    connection = session.connection()
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(f"SET LOCAL statement_timeout = {int(config.DB_BULK_STATEMENT_TIMEOUT_MS)}"))
+
+def pool_stats(engine):
+    """
+    Checkout and wait metrics of an engine's pool
+
+    Returns:
+        dict: Counters and occupancy, or just the pool status line for
+        pools that are not metered
+    """
+    pool = engine.pool
+    if isinstance(pool, MeteredQueuePool):
+        stats = pool.stats()
+        stats["pool"] = type(pool).__name__
+        return stats
+    return {"pool": type(pool).__name__, "status": pool.status()}
@@ -3,7 +3,8 @@ from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_mail import Mail
 from sqlalchemy.orm import DeclarativeBase
-import redis
+from backend.cache import Cache
+from backend.routing import RoutingSession
 import os
 import logging
 
@@ -16,10 +17,10 @@ class Base(DeclarativeBase):
     pass
 
 # Initialize extensions
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 jwt = JWTManager()
 cors = CORS()
 mail = Mail()
 
-# Initialize Redis client (will be connected in app.py)
-redis_client = None
\ No newline at end of file
+# Two-tier cache (local LRU + Redis); falls back to memory until init_app connects it
+cache = Cache()
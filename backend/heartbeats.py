@@ -0,0 +1,177 @@
+from backend.extensions import db, cache
+from backend.cache import RedisStore
+from backend.models import User
+from backend.config import Config
+from sqlalchemy import bindparam, or_, update
+from datetime import datetime
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Redis hash of user id -> epoch seconds waiting to be written
+PENDING_KEY = 'heartbeats:pending'
+
+class HeartbeatBuffer:
+    """
+    Coalesces last_active updates and writes them in one bulk UPDATE
+
+    Heartbeats go to a Redis hash when the cache is backed by Redis, so any
+    process (including a Celery worker) can flush them, and otherwise to an
+    in-process dict. Only the newest timestamp per user is kept. A
+    background thread flushes every HEARTBEAT_FLUSH_INTERVAL seconds, which
+    bounds how many heartbeats an in-memory buffer can lose on a crash.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['heartbeats'] = self
+        atexit.register(self._flush_at_exit)
+
+    def _redis(self):
+        return cache.remote.client if isinstance(cache.remote, RedisStore) else None
+
+    def record(self, user_id, when=None):
+        """Buffer a heartbeat for a user"""
+        when = when or datetime.utcnow()
+
+        if Config.HEARTBEAT_FLUSH_INTERVAL <= 0:
+            # Buffering disabled: write through
+            self._write({int(user_id): when})
+            return
+
+        client = self._redis()
+        if client is not None:
+            try:
+                client.hset(PENDING_KEY, str(user_id), f"{when.timestamp():.6f}")
+                self._ensure_flusher()
+                return
+            except Exception as e:
+                logger.warning(f"Redis heartbeat error, buffering in memory: {str(e)}")
+
+        with self._lock:
+            self._pending[int(user_id)] = when
+            overflow = len(self._pending) >= Config.HEARTBEAT_MAX_PENDING
+
+        if overflow:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def _drain(self):
+        """Take everything buffered so far, from memory and from Redis"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        client = self._redis()
+        if client is not None:
+            # RENAME makes the hand-over atomic; concurrent flushers get disjoint batches
+            batch_key = f"heartbeats:flushing:{uuid.uuid4().hex}"
+            try:
+                client.rename(PENDING_KEY, batch_key)
+                for user_id, epoch in client.hgetall(batch_key).items():
+                    when = datetime.utcfromtimestamp(float(epoch))
+                    user_id = int(user_id)
+                    if user_id not in pending or pending[user_id] < when:
+                        pending[user_id] = when
+                client.delete(batch_key)
+            except Exception as e:
+                # ResponseError "no such key" simply means nothing was pending
+                if 'no such key' not in str(e).lower():
+                    logger.warning(f"Redis heartbeat drain error: {str(e)}")
+
+        return pending
+
+    def _restore(self, pending):
+        """Put a batch back after a failed write, keeping newer heartbeats"""
+        with self._lock:
+            for user_id, when in pending.items():
+                if user_id not in self._pending or self._pending[user_id] < when:
+                    self._pending[user_id] = when
+
+    def _write(self, pending):
+        """Write a batch of heartbeats in one executemany UPDATE and one commit"""
+        users = User.__table__
+        statement = update(users) \
+            .where(users.c.id == bindparam('b_id')) \
+            .where(or_(users.c.last_active.is_(None), users.c.last_active < bindparam('b_when'))) \
+            .values(last_active=bindparam('b_when'))
+
+        db.session.execute(statement, [{"b_id": user_id, "b_when": when} for user_id, when in pending.items()])
+        db.session.commit()
+
+    def flush(self):
+        """
+        Write all buffered heartbeats to the users table
+
+        Returns:
+            int: Number of users whose heartbeat was written
+        """
+        pending = self._drain()
+        if not pending:
+            return 0
+
+        try:
+            self._write(pending)
+        except Exception as e:
+            db.session.rollback()
+            self._restore(pending)
+            logger.error(f"Error flushing heartbeats: {str(e)}")
+            return 0
+
+        logger.debug(f"Flushed {len(pending)} heartbeats")
+        return len(pending)
+
+    def _ensure_flusher(self):
+        """Start the background flush thread in this process if it is not running"""
+        if self.app is None:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='heartbeat-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(Config.HEARTBEAT_FLUSH_INTERVAL)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Heartbeat flusher error: {str(e)}")
+
+    def _flush_at_exit(self):
+        with self._lock:
+            has_pending = bool(self._pending)
+        if has_pending and self.app is not None:
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing heartbeats at exit: {str(e)}")
+
+heartbeats = HeartbeatBuffer()
+
+def record_heartbeat(user_id):
+    """Buffer a last_active update for a user"""
+    heartbeats.record(user_id)
+
+def flush_heartbeats():
+    """Write all buffered last_active updates now; returns the number of users written"""
+    return heartbeats.flush()
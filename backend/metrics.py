@@ -0,0 +1,376 @@
+from flask import request, g, Response
+from bisect import bisect_left
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Task duration buckets in seconds (reports and exports run for minutes)
+TASK_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+class Metric:
+    """
+    A named family of samples, one per combination of label values
+
+    Label values are passed positionally, in labelnames order, which keeps
+    recording to a tuple lookup and an addition under a lock.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+class Counter(Metric):
+    """Monotonic total, summed across processes"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def set_total(self, value, *labelvalues):
+        """Set from a total the process already keeps (pool and cache counters)"""
+        with self._lock:
+            self._values[labelvalues] = value
+
+class Gauge(Metric):
+    """Current value, summed across live processes"""
+
+    type = 'gauge'
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+class Histogram(Metric):
+    """Bucketed observations, summed across processes"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        # Counts per bucket (not cumulative) plus +Inf, then the sum
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self):
+        with self._lock:
+            return [[list(labels), list(state)] for labels, state in self._values.items()]
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) or abs(value) >= 1e15 else str(int(value))
+    return str(value)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class Registry:
+    """
+    Process-local metrics with Prometheus text exposition
+
+    Without a METRICS_DIR every process only reports itself. With one, each
+    process (gunicorn workers and Celery workers alike) writes a snapshot
+    file there every METRICS_FLUSH_INTERVAL seconds from a background
+    thread, and the /metrics endpoint adds the snapshots of all processes
+    up: counters and histograms of every process ever started (so totals
+    never go backwards), gauges of live processes only. Clear the directory
+    when deploying, as with prometheus_client's multiprocess mode.
+
+    Collectors are called before a snapshot or exposition to copy values
+    the app already keeps (pool and cache counters) into metrics.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self.directory = None
+        self.flush_interval = 5
+        self._file = None
+        self._file_pid = None
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        atexit.register(self._flush_at_exit)
+
+    def configure(self, config_mapping):
+        """Pick up METRICS_DIR and METRICS_FLUSH_INTERVAL"""
+        self.directory = config_mapping.get('METRICS_DIR') or None
+        self.flush_interval = config_mapping.get('METRICS_FLUSH_INTERVAL', 5)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def collect(self):
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug(f"Metrics collector failed: {str(e)}")
+
+    def snapshot(self):
+        """This process's metrics as a JSON-serializable dict"""
+        self.collect()
+        return {
+            "pid": os.getpid(),
+            "metrics": {
+                name: {
+                    "type": metric.type,
+                    "help": metric.documentation,
+                    "labels": list(metric.labelnames),
+                    "buckets": list(getattr(metric, 'buckets', ())),
+                    "samples": metric.samples(),
+                }
+                for name, metric in self._metrics.items()
+            },
+        }
+
+    def flush(self):
+        """Write this process's snapshot to the metrics directory"""
+        if not self.directory:
+            return
+        if self._file is None or self._file_pid != os.getpid():
+            # A fresh file per process; a forked child must not overwrite its parent's
+            self._file_pid = os.getpid()
+            self._file = os.path.join(self.directory, f"metrics-{self._file_pid}-{uuid.uuid4().hex[:8]}.json")
+
+        temporary = f"{self._file}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(temporary, self._file)
+
+    def ensure_flusher(self):
+        """Start the background snapshot thread in this process if it is not running"""
+        if not self.directory:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Metrics flush error: {str(e)}")
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing metrics at exit: {str(e)}")
+
+    def _snapshots(self):
+        """Snapshots of every process, this one freshly taken"""
+        if not self.directory:
+            return [self.snapshot()]
+
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed or being replaced; the next scrape sees it
+                continue
+        return snapshots
+
+    def render(self):
+        """
+        Aggregate every process's metrics in the Prometheus text format
+
+        Returns:
+            str: Exposition text (version 0.0.4)
+        """
+        merged = {}
+        for snapshot in self._snapshots():
+            alive = snapshot["pid"] == os.getpid() or _pid_alive(snapshot["pid"])
+            for name, metric in snapshot["metrics"].items():
+                entry = merged.setdefault(name, {**metric, "samples": {}})
+                if metric["type"] == 'gauge' and not alive:
+                    continue
+                for labels, value in metric["samples"]:
+                    key = tuple(labels)
+                    if metric["type"] == 'histogram':
+                        current = entry["samples"].get(key)
+                        entry["samples"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        entry["samples"][key] = entry["samples"].get(key, 0) + value
+
+        lines = []
+        for name, metric in sorted(merged.items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            names = metric["labels"]
+            for labels, value in sorted(metric["samples"].items()):
+                if metric["type"] != 'histogram':
+                    lines.append(f"{name}{_labels(names, labels)} {_format(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric["buckets"] + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == '+Inf' else f'le="{_format(float(bound))}"'
+                    lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_format(value[-1])}")
+                lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# Web requests
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route', ('method', 'route'))
+REQUESTS = registry.counter(
+    'http_requests_total', 'Requests by route and status code', ('method', 'route', 'status'))
+
+# Database pools (see backend.db_engine.pool_stats)
+POOL_CHECKED_OUT = registry.gauge('db_pool_checked_out', 'Connections in use', ('bind',))
+POOL_IDLE = registry.gauge('db_pool_idle', 'Idle pooled connections', ('bind',))
+POOL_OVERFLOW = registry.gauge('db_pool_overflow', 'Connections beyond pool_size', ('bind',))
+POOL_CHECKOUTS = registry.counter('db_pool_checkouts_total', 'Connection checkouts', ('bind',))
+POOL_CONNECTS = registry.counter('db_pool_connects_total', 'New database connections', ('bind',))
+POOL_TIMEOUTS = registry.counter('db_pool_timeouts_total', 'Checkouts that timed out', ('bind',))
+POOL_WAIT = registry.counter('db_pool_wait_seconds_total', 'Time spent waiting for a connection', ('bind',))
+
+# Cache lookups by key family (see backend.cache)
+CACHE_LOOKUPS = registry.counter(
+    'cache_lookups_total', 'Cache lookups by key family and result (local_hit, remote_hit, miss)',
+    ('family', 'result'))
+
+# Celery tasks
+TASK_DURATION = registry.histogram(
+    'celery_task_duration_seconds', 'Task run time', ('task', 'state'), buckets=TASK_BUCKETS)
+TASK_ROWS = registry.counter('celery_task_rows_processed_total', 'Rows processed by a job', ('job',))
+TASK_EMAILS = registry.counter('celery_task_emails_sent_total', 'Emails sent by a job', ('job',))
+
+def _collect_cache():
+    from backend.extensions import cache
+    for family, counts in cache.stats()["families"].items():
+        CACHE_LOOKUPS.set_total(counts["local_hits"], family, 'local_hit')
+        CACHE_LOOKUPS.set_total(counts["remote_hits"], family, 'remote_hit')
+        CACHE_LOOKUPS.set_total(counts["misses"], family, 'miss')
+
+registry.add_collector(_collect_cache)
+
+def record_task_rows(job, rows):
+    """Count rows processed by a Celery job (a task and its chunk subtasks)"""
+    TASK_ROWS.inc(rows, job)
+
+def record_task_emails(job, sent):
+    """Count emails sent by a Celery job"""
+    TASK_EMAILS.inc(sent, job)
+
+def init_metrics(app):
+    """
+    Record request metrics and serve them at /metrics
+
+    When METRICS_TOKEN is set the endpoint requires it as a bearer token.
+    """
+    from backend.extensions import db
+    from backend.db_engine import pool_stats
+
+    registry.configure(app.config)
+    token = app.config.get('METRICS_TOKEN')
+
+    def collect_pools():
+        with app.app_context():
+            for bind, engine in db.engines.items():
+                stats = pool_stats(engine)
+                if "checkouts" not in stats:
+                    continue
+                bind = bind or 'primary'
+                POOL_CHECKED_OUT.set(stats["checked_out"], bind)
+                POOL_IDLE.set(stats["idle"], bind)
+                POOL_OVERFLOW.set(max(0, stats["overflow"]), bind)
+                POOL_CHECKOUTS.set_total(stats["checkouts"], bind)
+                POOL_CONNECTS.set_total(stats["connects"], bind)
+                POOL_TIMEOUTS.set_total(stats["timeouts"], bind)
+                POOL_WAIT.set_total(stats["wait_seconds_total"], bind)
+
+    registry.add_collector(collect_pools)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # The rule, not the path, so ids do not explode the label values
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            REQUEST_LATENCY.observe(time.perf_counter() - started, request.method, route)
+            REQUESTS.inc(1, request.method, route, str(response.status_code))
+            registry.ensure_flusher()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            return Response("Unauthorized\n", status=401, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,65 @@
+from backend.extensions import db
+from backend.models import SchemaMigration
+from backend.counters import ensure_counter_columns
+from backend.search import ensure_search_index
+from backend.stats import ensure_dashboard_stats
+from backend.blob_store import migrate_inline_images
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+import logging
+
+logger = logging.getLogger(__name__)
+
+def create_indexes():
+    """
+    Create the secondary indexes declared on the models
+
+    db.create_all() only creates indexes together with new tables, so
+    databases created before an index was declared get it here.
+    """
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+# Applied in order, each at most once per database. Every step is idempotent,
+# so a run interrupted between a step and its record is safely repeated.
+MIGRATIONS = [
+    (1, "Add denormalized counter columns", ensure_counter_columns),
+    (2, "Create the full-text search index", ensure_search_index),
+    (3, "Seed the dashboard statistics", ensure_dashboard_stats),
+    (4, "Add indexes for the hot query predicates", create_indexes),
+    (5, "Move inline question images to the blob store", migrate_inline_images),
+]
+
+def applied_versions():
+    """Versions already recorded in schema_migrations"""
+    return {version for version, in db.session.query(SchemaMigration.version)}
+
+def run_migrations():
+    """
+    Apply every migration not yet recorded in schema_migrations
+
+    Returns:
+        list: Versions applied by this run
+    """
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    done = applied_versions()
+    applied = []
+
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+
+        logger.info(f"Applying migration {version}: {name}")
+        migrate()
+
+        try:
+            db.session.add(SchemaMigration(version=version, name=name))
+            db.session.commit()
+            applied.append(version)
+        except IntegrityError:
+            # Another process applied it at the same time
+            db.session.rollback()
+
+    return applied
@@ -1,6 +1,7 @@
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from backend.extensions import db
+from backend.serializers import user_serializer, chapter_serializer
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -16,11 +17,21 @@ class User(db.Model):
     # Relationships
     scores = db.relationship('Score', backref='user', lazy='dynamic')
     
+    __table_args__ = (
+        # Inactive-user reminders: is_admin = false AND last_active < cutoff
+        db.Index('ix_users_admin_last_active', 'is_admin', 'last_active'),
+        # Recent registrations on the admin dashboard: is_admin = false ORDER BY created_at DESC
+        db.Index('ix_users_admin_created_at', 'is_admin', 'created_at'),
+    )
+    
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
+    
+    def to_dict(self):
+        return user_serializer(self)
 
 class Subject(db.Model):
     __tablename__ = 'subjects'
@@ -29,6 +40,7 @@ class Subject(db.Model):
     name = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    chapters_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Maintained by backend.counters
     
     # Relationships
     chapters = db.relationship('Chapter', backref='subject', lazy='dynamic', cascade='all, delete-orphan')
@@ -41,6 +53,7 @@ class Chapter(db.Model):
     description = db.Column(db.Text, nullable=True)
     subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    quizzes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Maintained by backend.counters
     
     # Relationships
     quizzes = db.relationship('Quiz', backref='chapter', lazy='dynamic', cascade='all, delete-orphan')
@@ -49,14 +62,7 @@ class Chapter(db.Model):
     __table_args__ = (db.UniqueConstraint('subject_id', 'name', name='_subject_chapter_uc'),)
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'subject_id': self.subject_id,
-            'created_at': self.created_at.isoformat(),
-            'quizzes_count': self.quizzes.count()
-        }
+        return chapter_serializer(self)
 
 class Quiz(db.Model):
     __tablename__ = 'quizzes'
@@ -68,13 +74,20 @@ class Quiz(db.Model):
     date_of_quiz = db.Column(db.Date, nullable=False)
     time_duration = db.Column(db.Integer, nullable=False)  # Duration in minutes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    questions_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Maintained by backend.counters
     
     # Relationships
     questions = db.relationship('Question', backref='quiz', lazy='dynamic', cascade='all, delete-orphan')
     scores = db.relationship('Score', backref='quiz', lazy='dynamic', cascade='all, delete-orphan')
     
-    # Make sure quiz titles are unique within a chapter
-    __table_args__ = (db.UniqueConstraint('chapter_id', 'title', name='_chapter_quiz_uc'),)
+    __table_args__ = (
+        # Make sure quiz titles are unique within a chapter
+        db.UniqueConstraint('chapter_id', 'title', name='_chapter_quiz_uc'),
+        # Recent quizzes for reminders
+        db.Index('ix_quizzes_created_at', 'created_at'),
+        # Quizzes held on a day (payload pre-warming)
+        db.Index('ix_quizzes_date_of_quiz', 'date_of_quiz'),
+    )
 
 class Question(db.Model):
     __tablename__ = 'questions'
@@ -93,6 +106,9 @@ class Question(db.Model):
     option4_image = db.Column(db.Text, nullable=True)  # URL to image or base64 encoded image
     correct_option = db.Column(db.Integer, nullable=False)  # 1, 2, 3, or 4
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Questions of a quiz in id order (answer keys, quiz payloads)
+    __table_args__ = (db.Index('ix_questions_quiz_id', 'quiz_id', 'id'),)
 
 class Score(db.Model):
     __tablename__ = 'scores'
@@ -106,5 +122,29 @@ class Score(db.Model):
     time_taken = db.Column(db.Integer, nullable=False)  # Time taken in seconds
     attempt_date = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Make sure a user can only have one score per quiz
-    __table_args__ = (db.UniqueConstraint('user_id', 'quiz_id', name='_user_quiz_uc'),)
+    __table_args__ = (
+        # Make sure a user can only have one score per quiz
+        db.UniqueConstraint('user_id', 'quiz_id', name='_user_quiz_uc'),
+        # A user's score listing, newest first (keyset on attempt_date, id)
+        db.Index('ix_scores_user_attempt', 'user_id', 'attempt_date', 'id'),
+        # The admin listing and the monthly report range
+        db.Index('ix_scores_attempt', 'attempt_date', 'id'),
+        # Scores of a quiz (quiz filter, cascading deletes)
+        db.Index('ix_scores_quiz_id', 'quiz_id'),
+    )
+
+class DashboardStat(db.Model):
+    __tablename__ = 'dashboard_stats'
+    
+    # One row per counter shown on the admin dashboard, maintained by backend.stats
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    # One row per migration applied by backend.migrations
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
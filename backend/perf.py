@@ -0,0 +1,213 @@
+from flask import request, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import deque
+from contextvars import ContextVar
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Profile of the request being handled in this context, if profiling is on
+_current = ContextVar('sql_profile', default=None)
+
+# Expanded IN lists and multi-row VALUES differ in length from call to call;
+# collapsing them gives every call of the same query the same shape
+_PARAM = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PARAM_LIST = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})+\s*\)")
+
+# N+1 statements kept per route in the summary
+MAX_SHAPES_PER_ROUTE = 20
+
+def statement_shape(statement):
+    """Normalize a SQL statement so repeated calls of the same query compare equal"""
+    return _PARAM_LIST.sub("(?)", " ".join(statement.split()))
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+class RequestProfile:
+    """SQL statements run while handling one request"""
+
+    __slots__ = ('started', 'queries', 'sql_seconds', 'statements', 'query_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = {}
+        self.query_started = None
+
+    def repeated(self, threshold):
+        """
+        Statement shapes run at least threshold times, the N+1 suspects
+
+        Returns:
+            dict: Shape -> number of executions
+        """
+        counts = {}
+        for statement, count in self.statements.items():
+            shape = statement_shape(statement)
+            counts[shape] = counts.get(shape, 0) + count
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+class RouteStats:
+    """Rolling timings of one route plus the N+1 statements seen on it"""
+
+    def __init__(self, window):
+        self.requests = 0
+        self.samples = deque(maxlen=window)
+        self.repeated = {}
+
+    def add(self, total_ms, sql_ms, queries, repeated):
+        self.requests += 1
+        self.samples.append((total_ms, sql_ms, queries))
+        for shape, count in repeated.items():
+            seen = self.repeated.get(shape)
+            if seen is None:
+                if len(self.repeated) >= MAX_SHAPES_PER_ROUTE:
+                    continue
+                seen = self.repeated[shape] = {"requests": 0, "max_repeats": 0}
+            seen["requests"] += 1
+            seen["max_repeats"] = max(seen["max_repeats"], count)
+
+    def summary(self):
+        totals = sorted(sample[0] for sample in self.samples)
+        sql_ms = [sample[1] for sample in self.samples]
+        queries = [sample[2] for sample in self.samples]
+        window = len(self.samples) or 1
+        return {
+            "requests": self.requests,
+            "window": len(self.samples),
+            "p50_ms": round(_percentile(totals, 50), 2),
+            "p95_ms": round(_percentile(totals, 95), 2),
+            "p99_ms": round(_percentile(totals, 99), 2),
+            "mean_sql_ms": round(sum(sql_ms) / window, 2),
+            "mean_queries": round(sum(queries) / window, 2),
+            "max_queries": max(queries, default=0),
+            "n_plus_one": sorted(
+                ({"statement": shape, **seen} for shape, seen in self.repeated.items()),
+                key=lambda item: item["max_repeats"], reverse=True
+            ),
+        }
+
+class SQLProfiler:
+    """
+    Counts and times the SQL statements of every request
+
+    When SQL_PROFILING is on, cursor execute hooks on every engine add up
+    the statements of the current request. The totals go into a
+    Server-Timing header and a rolling per-route summary (see summary()),
+    and statements repeated SQL_PROFILING_REPEAT_THRESHOLD times or more in
+    one request are reported as likely N+1 queries. When it is off nothing
+    is registered, so there is no overhead at all.
+
+    Summaries are per process; with several workers each one reports its
+    own traffic.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 5
+        self.window = 500
+        self._routes = {}
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        app.extensions['sql_profiler'] = self
+        self.enabled = app.config.get('SQL_PROFILING', False)
+        if not self.enabled:
+            return
+
+        self.threshold = app.config.get('SQL_PROFILING_REPEAT_THRESHOLD', 5)
+        self.window = app.config.get('SQL_PROFILING_WINDOW', 500)
+        self._listen()
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._reset_request)
+
+    def _listen(self):
+        # Engine-class listeners cover the primary and the replica binds
+        if self._listening:
+            return
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        self._listening = True
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        if profile is not None:
+            profile.query_started = time.perf_counter()
+
+    @staticmethod
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        if profile is None or profile.query_started is None:
+            return
+        profile.sql_seconds += time.perf_counter() - profile.query_started
+        profile.query_started = None
+        profile.queries += 1
+        profile.statements[statement] = profile.statements.get(statement, 0) + 1
+
+    def _start_request(self):
+        g.sql_profile_token = _current.set(RequestProfile())
+
+    def _finish_request(self, response):
+        profile = _current.get()
+        if profile is None:
+            return response
+
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        sql_ms = profile.sql_seconds * 1000
+        repeated = profile.repeated(self.threshold)
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else '<unmatched>'}"
+
+        timing = [f'db;dur={sql_ms:.2f};desc="{profile.queries} queries"']
+        if repeated:
+            timing.append(f'n-plus-one;desc="{len(repeated)} repeated statements"')
+        timing.append(f'app;dur={total_ms:.2f}')
+        response.headers.add('Server-Timing', ', '.join(timing))
+
+        for shape, count in repeated.items():
+            logger.warning(f"Possible N+1 in {route}: statement run {count} times: {shape[:200]}")
+
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats(self.window)
+            stats.add(total_ms, sql_ms, profile.queries, repeated)
+
+        return response
+
+    def _reset_request(self, exc):
+        token = g.pop('sql_profile_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    def summary(self):
+        """
+        Per-route timings and N+1 statements, busiest database time first
+
+        Returns:
+            dict: Profiling state and one entry per route
+        """
+        with self._lock:
+            routes = [{"route": route, **stats.summary()} for route, stats in self._routes.items()]
+        routes.sort(key=lambda item: item["mean_sql_ms"] * item["requests"], reverse=True)
+        return {
+            "enabled": self.enabled,
+            "pid": os.getpid(),
+            "repeat_threshold": self.threshold,
+            "routes": routes,
+        }
+
+profiler = SQLProfiler()
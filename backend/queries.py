@@ -0,0 +1,113 @@
+from backend.extensions import db
+from backend.models import User, Subject, Chapter, Quiz, Score
+from sqlalchemy import tuple_
+from datetime import datetime
+import base64
+
+def score_rows_query():
+    """
+    Build a single joined projection over scores and their user, quiz,
+    chapter and subject, so listings never lazy-load related rows
+
+    Returns:
+        Query yielding flat rows, newest attempt first
+    """
+    return db.session.query(
+        Score.id,
+        Score.user_id,
+        User.username,
+        User.email,
+        Score.quiz_id,
+        Quiz.title.label('quiz_title'),
+        Quiz.date_of_quiz,
+        Chapter.id.label('chapter_id'),
+        Chapter.name.label('chapter_name'),
+        Subject.id.label('subject_id'),
+        Subject.name.label('subject_name'),
+        Score.total_questions,
+        Score.total_correct,
+        Score.percentage_score,
+        Score.time_taken,
+        Score.attempt_date
+    ).join(User, User.id == Score.user_id) \
+     .join(Quiz, Quiz.id == Score.quiz_id) \
+     .join(Chapter, Chapter.id == Quiz.chapter_id) \
+     .join(Subject, Subject.id == Chapter.subject_id) \
+     .order_by(Score.attempt_date.desc(), Score.id.desc())
+
+def filter_score_rows(query, user_id=None, subject_id=None, quiz_id=None, date_from=None, date_to=None):
+    """
+    Apply the optional listing filters to a score_rows_query()
+
+    Args:
+        user_id (int): Only scores of this user
+        subject_id (int): Only scores of quizzes in this subject
+        quiz_id (int): Only scores of this quiz
+        date_from (datetime): Inclusive lower bound on attempt_date
+        date_to (datetime): Exclusive upper bound on attempt_date
+    """
+    if user_id is not None:
+        query = query.filter(Score.user_id == user_id)
+    if subject_id is not None:
+        query = query.filter(Subject.id == subject_id)
+    if quiz_id is not None:
+        query = query.filter(Score.quiz_id == quiz_id)
+    if date_from is not None:
+        query = query.filter(Score.attempt_date >= date_from)
+    if date_to is not None:
+        query = query.filter(Score.attempt_date < date_to)
+    return query
+
+def encode_cursor(attempt_date, score_id):
+    """Encode the (attempt_date, id) position of a row as an opaque cursor"""
+    raw = f"{attempt_date.isoformat()}|{score_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        attempt_date, score_id = raw.split('|', 1)
+        return datetime.fromisoformat(attempt_date), int(score_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def after_cursor(query, cursor):
+    """
+    Restrict a score_rows_query() to the rows after a cursor, if one is given
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return query
+    attempt_date, score_id = decode_cursor(cursor)
+    return query.filter(tuple_(Score.attempt_date, Score.id) < (attempt_date, score_id))
+
+def paginate_score_rows(query, limit, cursor=None):
+    """
+    Fetch one keyset page of score rows
+
+    Args:
+        query: A score_rows_query(), optionally filtered
+        limit (int): Maximum rows to return
+        cursor (str): Cursor returned with the previous page
+
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    rows = after_cursor(query, cursor).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.attempt_date, last.id)
+
+    return rows, next_cursor
@@ -0,0 +1,78 @@
+from backend.extensions import db
+from backend.models import User, Quiz, Question, Score
+from backend.queries import score_rows_query, filter_score_rows
+from sqlalchemy import func, text
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _hot_queries():
+    """
+    The hot-path queries, each with the index its plan is expected to use
+
+    Returns:
+        list: (name, expected index, query) tuples
+    """
+    now = datetime.utcnow()
+    month_start = (now.replace(day=1) - timedelta(days=1)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    return [
+        ("user score listing", 'ix_scores_user_attempt',
+         filter_score_rows(score_rows_query(), user_id=1).limit(50)),
+        ("admin score listing", 'ix_scores_attempt',
+         score_rows_query().limit(50)),
+        ("monthly report users", 'ix_scores_attempt',
+         db.session.query(Score.user_id)
+         .filter(Score.attempt_date >= month_start, Score.attempt_date < now)
+         .group_by(Score.user_id)),
+        ("scores of a quiz", 'ix_scores_quiz_id',
+         db.session.query(func.count(Score.id)).filter(Score.quiz_id == 1)),
+        ("inactive users", 'ix_users_admin_last_active',
+         db.session.query(User.id).filter(User.is_admin == False, User.last_active < now - timedelta(days=7))),
+        ("recent registrations", 'ix_users_admin_created_at',
+         db.session.query(User.id).filter(User.is_admin == False).order_by(User.created_at.desc()).limit(5)),
+        ("recent quizzes", 'ix_quizzes_created_at',
+         db.session.query(Quiz.id).filter(Quiz.created_at > now - timedelta(days=7))),
+        ("quizzes held today", 'ix_quizzes_date_of_quiz',
+         db.session.query(Quiz.id).filter(Quiz.date_of_quiz == now.date())),
+        ("answer key", 'ix_questions_quiz_id',
+         db.session.query(Question.id, Question.correct_option).filter(Question.quiz_id == 1).order_by(Question.id)),
+    ]
+
+def explain(query):
+    """
+    Get the plan of a query as text lines
+
+    Uses EXPLAIN QUERY PLAN on SQLite and EXPLAIN on Postgres, with literal
+    parameters compiled in.
+    """
+    connection = db.session.connection()
+    sql = str(query.statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+
+    if connection.dialect.name == 'sqlite':
+        return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in connection.execute(text(f"EXPLAIN {sql}"))]
+
+def check_query_plans():
+    """
+    Check that every hot query is planned with its expected index
+
+    On Postgres sequential scans are disabled for the check, since on small
+    tables the planner would rightly prefer them.
+
+    Returns:
+        list: (name, expected index, ok, plan lines) tuples
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+
+    results = []
+    for name, index, query in _hot_queries():
+        plan = explain(query)
+        ok = any(index in line for line in plan)
+        results.append((name, index, ok, plan))
+
+    db.session.rollback()
+    return results
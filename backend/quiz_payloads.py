@@ -0,0 +1,107 @@
+from backend.extensions import db, cache
+from backend.models import Quiz, Question
+from backend.config import Config
+from backend.compression import EncodedBody
+from backend.serializers import quiz_header_serializer, student_question_serializer, dumps
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+class QuizPayload:
+    """
+    The encoded question payload of one quiz version
+
+    Attributes:
+        etag (str): Content hash of the JSON body; each coding's validator
+            is etag-<coding>
+        encoded (EncodedBody): JSON document with its compressed variants
+    """
+
+    def __init__(self, etag, encoded):
+        self.etag = etag
+        self.encoded = encoded
+
+    def pack(self):
+        """Serialize to one cache value: etag line, then the packed bodies"""
+        return f"{self.etag}\n".encode() + self.encoded.pack()
+
+    @classmethod
+    def unpack(cls, value):
+        etag, rest = value.split(b'\n', 1)
+        return cls(etag.decode(), EncodedBody.unpack(rest))
+
+def _cache_key(quiz_id):
+    return f"quiz:{quiz_id}:payload"
+
+def build_quiz_payload(quiz_id):
+    """
+    Load a quiz and its questions and encode the student-facing payload
+
+    Args:
+        quiz_id (int): ID of the quiz
+
+    Returns:
+        QuizPayload: The encoded payload, or None if the quiz does not exist
+        or has no questions
+    """
+    quiz = db.session.query(*quiz_header_serializer.columns(Quiz)) \
+        .filter(Quiz.id == quiz_id) \
+        .first()
+    if not quiz:
+        return None
+
+    questions = db.session.query(*student_question_serializer.columns(Question)) \
+        .filter(Question.quiz_id == quiz_id) \
+        .order_by(Question.id) \
+        .all()
+    if not questions:
+        return None
+
+    data = {
+        "quiz": quiz_header_serializer(quiz),  # time_duration in minutes
+        "questions": student_question_serializer.many(questions)
+    }
+
+    body = dumps(data)
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    return QuizPayload(etag, EncodedBody.build(body))
+
+def get_quiz_payload(quiz_id):
+    """
+    Get the encoded payload of a quiz, building and caching it on a miss
+
+    Concurrent misses (every student opening the quiz at once) share one build.
+
+    Returns:
+        QuizPayload: The payload, or None if the quiz does not exist or has no questions
+    """
+    quiz_id = int(quiz_id)
+
+    def load():
+        payload = build_quiz_payload(quiz_id)
+        return payload.pack() if payload else None
+
+    value = cache.get_or_set(_cache_key(quiz_id), load, ttl=Config.QUIZ_PAYLOAD_TTL, tags=[f"quiz:{quiz_id}"],
+                             consistent=True)
+    return QuizPayload.unpack(value) if value is not None else None
+
+def warm_quiz_payload(quiz_id):
+    """
+    Rebuild and store the payload of a quiz whether or not it is cached
+
+    Returns:
+        bool: Whether a payload was stored
+    """
+    quiz_id = int(quiz_id)
+    payload = build_quiz_payload(quiz_id)
+    if payload is None:
+        return False
+
+    cache.set(_cache_key(quiz_id), payload.pack(), ttl=Config.QUIZ_PAYLOAD_TTL, tags=[f"quiz:{quiz_id}"],
+              consistent=True)
+    return True
+
+def invalidate_quiz_payload(quiz_id):
+    """Drop the cached payload of a quiz after the quiz or its questions change"""
+    cache.delete(_cache_key(int(quiz_id)))
@@ -1,9 +1,16 @@
 from flask import request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import check_password_hash
-from backend.extensions import db, redis_client
+from backend.extensions import db, cache
+from backend.auth import admin_required, create_user_token, set_principal_role
 from backend.models import User, Subject, Chapter, Quiz, Question, Score
-import json
+from backend.search import search_documents, parse_search_args
+from backend.stats import get_dashboard_stats
+from backend.db_engine import pool_stats
+from backend.perf import profiler
+from backend.queries import score_rows_query
+from backend.resources.quiz_resources import quiz_search_results
+from backend.serializers import user_serializer
+from backend.streaming import wants_stream, stream_rows
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,8 +31,8 @@ def admin_login():
     if not admin or not admin.check_password(password):
         return jsonify({"error": "Invalid credentials"}), 401
     
-    # Create access token with string identity
-    access_token = create_access_token(identity=str(admin.id))
+    # Create access token with string identity and the role as a claim
+    access_token = create_user_token(admin)
     
     return jsonify({
         "access_token": access_token,
@@ -34,205 +41,102 @@ def admin_login():
         "is_admin": admin.is_admin
     }), 200
 
-@jwt_required()
+@admin_required
 def get_users():
     """Get all users"""
-    user_id = get_jwt_identity()
-    
-    # Get the user from the database
-    current_user = User.query.get(user_id)
-    
-    # Check if the user is an admin
-    if not current_user or not current_user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
+    if wants_stream():
+        return stream_rows(db.session.query(*user_serializer.columns(User)).order_by(User.id), user_serializer)
     
     try:
-        users = User.query.all()
-        return jsonify([user.to_dict() for user in users]), 200
+        users = db.session.query(*user_serializer.columns(User)).order_by(User.id).all()
+        return jsonify(user_serializer.many(users)), 200
     except Exception as e:
         logger.error(f"Error getting users: {str(e)}")
         return jsonify({"error": "Could not retrieve users"}), 500
 
+@admin_required
 def update_user_role(user_id, request):
     """Update user's admin status"""
-    current_user_id = get_jwt_identity()
-    
-    # Get the current user
-    current_user = User.query.get(current_user_id)
-    
-    # Check if the current user is an admin
-    if not current_user or not current_user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     # Get the target user
     user = User.query.get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
     
     data = request.get_json()
-    if 'is_admin' not in data:
+    if not data or 'is_admin' not in data:
         return jsonify({"error": "is_admin field is required"}), 400
     
     try:
         user.is_admin = bool(data['is_admin'])
         db.session.commit()
+        
+        # Tokens issued before the change still carry the old role claim
+        set_principal_role(user.id, user.is_admin)
+        
         return jsonify({"message": "User role updated successfully"}), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating user role: {str(e)}")
         return jsonify({"error": "Could not update user role"}), 500
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
-    # Get all users
-    users = User.query.all()
-    
-    users_data = [{
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "is_admin": user.is_admin,
-        "last_active": user.last_active.isoformat() if user.last_active else None,
-        "created_at": user.created_at.isoformat()
-    } for user in users]
-    
-    return jsonify(users_data), 200
 
-@jwt_required()
+@admin_required
 def admin_search_users():
     """Search users by username or email"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
+    search_term, page, per_page = parse_search_args()
     
-    search_term = request.args.get('q', '')
+    # Rank matches in the full-text index, then load the page of users by id
+    result = search_documents(search_term, ['user'], page=page, per_page=per_page)
+    ids = [hit["id"] for hit in result["hits"]]
+    users = {user.id: user for user in User.query.filter(User.id.in_(ids)).all()} if ids else {}
     
-    # Search users
-    users = User.query.filter(
-        (User.username.ilike(f'%{search_term}%') | User.email.ilike(f'%{search_term}%'))
-    ).all()
-    
-    users_data = [{
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "is_admin": user.is_admin,
-        "last_active": user.last_active.isoformat() if user.last_active else None,
-        "created_at": user.created_at.isoformat()
-    } for user in users]
+    users_data = user_serializer.many(users[i] for i in ids if i in users)
     
-    return jsonify(users_data), 200
+    return jsonify({
+        "results": users_data,
+        "total": result["total"],
+        "page": page,
+        "per_page": per_page
+    }), 200
 
-@jwt_required()
+@admin_required
 def admin_search_subjects():
-    """Search subjects by name"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
-    search_term = request.args.get('q', '')
-    
-    # Try to get from cache first
-    try:
-        cache_key = f"subject_search_{search_term}"
-        cached_data = redis_client.get(cache_key)
-        
-        if cached_data:
-            return jsonify(json.loads(cached_data)), 200
-    except Exception as e:
-        logger.warning(f"Redis cache error: {str(e)}")
-        # Continue without cache
+    """Search subjects by name or description"""
+    search_term, page, per_page = parse_search_args()
     
-    # Search subjects
-    subjects = Subject.query.filter(Subject.name.ilike(f'%{search_term}%')).all()
+    # Rank matches in the full-text index, then load the page of subjects by id
+    result = search_documents(search_term, ['subject'], page=page, per_page=per_page)
+    ids = [hit["id"] for hit in result["hits"]]
+    subjects = {subject.id: subject for subject in Subject.query.filter(Subject.id.in_(ids)).all()} if ids else {}
     
     subjects_data = [{
         "id": subject.id,
         "name": subject.name,
         "description": subject.description,
         "created_at": subject.created_at.isoformat(),
-        "chapters_count": subject.chapters.count()
-    } for subject in subjects]
+        "chapters_count": subject.chapters_count
+    } for subject in (subjects[i] for i in ids if i in subjects)]
     
-    # Cache the result for 5 minutes
-    # Only cache if Redis is available
-    if redis_client:
-        try:
-            cache_key = f"subject_search_{search_term}"
-            redis_client.setex(cache_key, 300, json.dumps(subjects_data))
-        except Exception as e:
-            logger.warning(f"Redis cache write error: {str(e)}")
-    
-    return jsonify(subjects_data), 200
+    return jsonify({
+        "results": subjects_data,
+        "total": result["total"],
+        "page": page,
+        "per_page": per_page
+    }), 200
 
-@jwt_required()
+@admin_required
 def admin_search_quizzes():
-    """Search quizzes by title"""
-    user_id = get_jwt_identity()
+    """Search quizzes by title, description, chapter and subject names"""
+    search_term, page, per_page = parse_search_args()
+    subject_id = request.args.get('subject_id', type=int)
+    chapter_id = request.args.get('chapter_id', type=int)
     
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
-    search_term = request.args.get('q', '')
-    
-    # Search quizzes
-    quizzes = Quiz.query.filter(Quiz.title.ilike(f'%{search_term}%')).all()
-    
-    quizzes_data = [{
-        "id": quiz.id,
-        "title": quiz.title,
-        "description": quiz.description,
-        "chapter_id": quiz.chapter_id,
-        "chapter_name": quiz.chapter.name,
-        "subject_name": quiz.chapter.subject.name,
-        "date_of_quiz": quiz.date_of_quiz.isoformat(),
-        "time_duration": quiz.time_duration,
-        "questions_count": quiz.questions.count(),
-        "created_at": quiz.created_at.isoformat()
-    } for quiz in quizzes]
-    
-    return jsonify(quizzes_data), 200
+    return jsonify(quiz_search_results(search_term, subject_id, chapter_id, page, per_page)), 200
 
-@jwt_required()
+@admin_required
 def get_admin_dashboard_stats():
     """Get statistics for the admin dashboard"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
-    # Try to get from cache first if Redis is available
-    if redis_client:
-        try:
-            cache_key = "admin_dashboard_stats"
-            cached_data = redis_client.get(cache_key)
-            
-            if cached_data:
-                return jsonify(json.loads(cached_data)), 200
-        except Exception as e:
-            logger.warning(f"Redis cache error: {str(e)}")
-            # Continue without cache
-    
-    # Get statistics
-    total_users = User.query.filter_by(is_admin=False).count()
-    total_subjects = Subject.query.count()
-    total_chapters = Chapter.query.count()
-    total_quizzes = Quiz.query.count()
-    total_questions = Question.query.count()
-    total_attempts = Score.query.count()
+    # Totals are maintained incrementally by the write paths (see backend.stats)
+    totals = get_dashboard_stats()
     
     # Get recent user registrations
     recent_users = User.query.filter_by(is_admin=False).order_by(User.created_at.desc()).limit(5).all()
@@ -243,35 +147,34 @@ def get_admin_dashboard_stats():
         "created_at": user.created_at.isoformat()
     } for user in recent_users]
     
-    # Get recent quiz attempts
-    recent_scores = Score.query.order_by(Score.attempt_date.desc()).limit(5).all()
+    # Get recent quiz attempts with user and quiz names from the same query
+    recent_scores = score_rows_query().limit(5).all()
     recent_scores_data = [{
         "id": score.id,
         "user_id": score.user_id,
-        "username": score.user.username,
+        "username": score.username,
         "quiz_id": score.quiz_id,
-        "quiz_title": score.quiz.title,
+        "quiz_title": score.quiz_title,
         "percentage_score": score.percentage_score,
         "attempt_date": score.attempt_date.isoformat()
     } for score in recent_scores]
     
     stats = {
-        "total_users": total_users,
-        "total_subjects": total_subjects,
-        "total_chapters": total_chapters,
-        "total_quizzes": total_quizzes,
-        "total_questions": total_questions,
-        "total_attempts": total_attempts,
+        "total_users": totals.get("total_users", 0),
+        "total_subjects": totals.get("total_subjects", 0),
+        "total_chapters": totals.get("total_chapters", 0),
+        "total_quizzes": totals.get("total_quizzes", 0),
+        "total_questions": totals.get("total_questions", 0),
+        "total_attempts": totals.get("total_attempts", 0),
         "recent_users": recent_users_data,
-        "recent_scores": recent_scores_data
+        "recent_scores": recent_scores_data,
+        "cache": cache.stats(),
+        "database": {bind or "primary": pool_stats(engine) for bind, engine in db.engines.items()}
     }
     
-    # Cache the results for 5 minutes if Redis is available
-    if redis_client:
-        try:
-            cache_key = "admin_dashboard_stats"
-            redis_client.setex(cache_key, 300, json.dumps(stats))
-        except Exception as e:
-            logger.warning(f"Redis cache write error: {str(e)}")
-    
     return jsonify(stats), 200
+
+@admin_required
+def get_perf_summary():
+    """Get the per-route SQL profile of this process (needs SQL_PROFILING)"""
+    return jsonify(profiler.summary()), 200
@@ -0,0 +1,31 @@
+from flask import jsonify, send_file
+from backend.blob_store import resolve_blob
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Blobs are content-addressed, so a name always refers to the same bytes
+IMAGE_MAX_AGE = 31536000
+
+def get_image(name):
+    """Serve a stored question or option image"""
+    blob = resolve_blob(name)
+    if not blob:
+        return jsonify({"error": "Image not found"}), 404
+    
+    path, digest, mime_type = blob
+    
+    # conditional=True answers If-None-Match and Range requests from the file
+    response = send_file(
+        path,
+        mimetype=mime_type,
+        conditional=True,
+        etag=digest,
+        max_age=IMAGE_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    # Never let a browser second-guess the image type
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    
+    return response
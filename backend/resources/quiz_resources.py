@@ -1,8 +1,18 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from backend.extensions import db, redis_client
-from backend.models import User, Quiz, Chapter, Question, Score
-import json
+from backend.extensions import db, cache
+from backend.auth import admin_required
+from backend.models import Quiz, Chapter, Question, Score
+from backend.answer_keys import get_answer_key, grade, invalidate_answer_key
+from backend.quiz_payloads import get_quiz_payload, invalidate_quiz_payload
+from backend.counters import adjust_counter
+from backend.blob_store import externalize_image, BlobError, IMAGE_FIELDS
+from backend.search import search_documents, parse_search_args
+from backend.models import Subject
+from backend.serializers import quiz_serializer, question_serializer, json_response
+from backend.streaming import wants_stream, stream_rows
+from backend.compression import negotiate
+from sqlalchemy.exc import IntegrityError
 import logging
 import base64
 import re
@@ -13,44 +23,67 @@ logger = logging.getLogger(__name__)
 @jwt_required()
 def get_quizzes(chapter_id):
     """Get all quizzes for a chapter"""
-    # Check if chapter exists
-    chapter = Chapter.query.get(chapter_id)
-    if not chapter:
+    def load_quizzes():
+        # Check if chapter exists
+        if not db.session.query(Chapter.id).filter(Chapter.id == chapter_id).first():
+            return None
+
+        return quiz_serializer.many(Quiz.query.filter_by(chapter_id=chapter_id).all())
+
+    body = cache.get_or_set_encoded(
+        f"chapter:{chapter_id}:quizzes", load_quizzes, ttl=300, tags=[f"chapter:{chapter_id}"]
+    )
+    if body is None:
         return jsonify({"error": "Chapter not found"}), 404
-    
-    # Get all quizzes for the chapter
-    quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
-    
+
+    return json_response(body)
+
+def quiz_search_results(query, subject_id=None, chapter_id=None, page=1, per_page=20):
+    """
+    Run a quiz search and load the matching quizzes with their chapter and subject names
+    
+    Returns:
+        dict: Ranked quizzes, total match count, page info and subject/chapter facets
+    """
+    result = search_documents(query, ['quiz'], subject_id=subject_id, chapter_id=chapter_id,
+                              page=page, per_page=per_page)
+    
+    ids = [hit["id"] for hit in result["hits"]]
+    rows = db.session.query(Quiz, Chapter.name, Subject.name) \
+        .join(Chapter, Chapter.id == Quiz.chapter_id) \
+        .join(Subject, Subject.id == Chapter.subject_id) \
+        .filter(Quiz.id.in_(ids)) \
+        .all() if ids else []
+    
+    by_id = {quiz.id: (quiz, chapter_name, subject_name) for quiz, chapter_name, subject_name in rows}
+    
+    # Keep the ranking order of the search hits
     quizzes_data = [{
-        "id": quiz.id,
-        "title": quiz.title,
-        "description": quiz.description,
-        "date_of_quiz": quiz.date_of_quiz.isoformat(),
-        "time_duration": quiz.time_duration,
-        "questions_count": quiz.questions.count(),
-        "created_at": quiz.created_at.isoformat()
-    } for quiz in quizzes]
-    
-    # Only use Redis if it's available
-    if redis_client:
-        try:
-            cache_key = f"chapter_{chapter_id}_quizzes"
-            redis_client.setex(cache_key, 300, json.dumps(quizzes_data))
-        except Exception as e:
-            logger.error(f"Redis error when caching quizzes: {e}")
-    
-    return jsonify(quizzes_data), 200
+        **quiz_serializer(quiz),
+        "chapter_name": chapter_name,
+        "subject_name": subject_name
+    } for quiz, chapter_name, subject_name in (by_id[i] for i in ids if i in by_id)]
+    
+    return {
+        "results": quizzes_data,
+        "total": result["total"],
+        "page": page,
+        "per_page": per_page,
+        "facets": result["facets"]
+    }
 
 @jwt_required()
+def search_quizzes():
+    """Search quizzes by title, description, chapter and subject names"""
+    query, page, per_page = parse_search_args()
+    subject_id = request.args.get('subject_id', type=int)
+    chapter_id = request.args.get('chapter_id', type=int)
+    
+    return jsonify(quiz_search_results(query, subject_id, chapter_id, page, per_page)), 200
+
+@admin_required
 def create_quiz(chapter_id):
     """Create a new quiz for a chapter"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     if not data:
         return jsonify({"error": "No input data provided"}), 400
@@ -83,41 +116,24 @@ def create_quiz(chapter_id):
     
     try:
         db.session.add(quiz)
+        adjust_counter(Chapter.quizzes_count, chapter_id, 1)
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete(f"chapter_{chapter_id}_quizzes")
-            except Exception as e:
-                logger.error(f"Redis error when invalidating cache: {e}")
+        # The chapter listing carries quizzes_count
+        cache.invalidate_tags(f"chapter:{chapter_id}", f"subject:{chapter.subject_id}")
         
         return jsonify({
             "message": "Quiz created successfully",
-            "quiz": {
-                "id": quiz.id,
-                "title": quiz.title,
-                "description": quiz.description,
-                "date_of_quiz": quiz.date_of_quiz.isoformat(),
-                "time_duration": quiz.time_duration,
-                "created_at": quiz.created_at.isoformat()
-            }
+            "quiz": quiz_serializer(quiz)
         }), 201
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating quiz: {str(e)}")
         return jsonify({"error": "Error creating quiz"}), 500
 
-@jwt_required()
+@admin_required
 def update_quiz(quiz_id):
     """Update an existing quiz"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     if not data:
         return jsonify({"error": "No input data provided"}), 400
@@ -146,56 +162,37 @@ def update_quiz(quiz_id):
     try:
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete(f"chapter_{quiz.chapter_id}_quizzes")
-            except Exception as e:
-                logger.error(f"Redis error when invalidating cache: {e}")
+        invalidate_quiz_payload(quiz_id)
+        # Score listings carry quiz titles
+        cache.invalidate_tags(f"chapter:{quiz.chapter_id}", "scores")
         
         return jsonify({
             "message": "Quiz updated successfully",
-            "quiz": {
-                "id": quiz.id,
-                "title": quiz.title,
-                "description": quiz.description,
-                "date_of_quiz": quiz.date_of_quiz.isoformat(),
-                "time_duration": quiz.time_duration,
-                "created_at": quiz.created_at.isoformat()
-            }
+            "quiz": quiz_serializer(quiz)
         }), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating quiz: {str(e)}")
         return jsonify({"error": "Error updating quiz"}), 500
 
-@jwt_required()
+@admin_required
 def delete_quiz(quiz_id):
     """Delete a quiz"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     # Check if quiz exists
     quiz = Quiz.query.get(quiz_id)
     if not quiz:
         return jsonify({"error": "Quiz not found"}), 404
     
     chapter_id = quiz.chapter_id
+    subject_id = quiz.chapter.subject_id
     
     try:
         db.session.delete(quiz)
+        adjust_counter(Chapter.quizzes_count, chapter_id, -1)
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete(f"chapter_{chapter_id}_quizzes")
-            except Exception as e:
-                logger.error(f"Redis error when invalidating cache: {e}")
+        # Drops the chapter listing counts, everything cached for the quiz and the score listings
+        cache.invalidate_tags(f"chapter:{chapter_id}", f"subject:{subject_id}", f"quiz:{quiz_id}", "scores")
         
         return jsonify({"message": "Quiz deleted successfully"}), 200
     except Exception as e:
@@ -203,51 +200,26 @@ def delete_quiz(quiz_id):
         logger.error(f"Error deleting quiz: {str(e)}")
         return jsonify({"error": "Error deleting quiz"}), 500
 
-@jwt_required()
+@admin_required
 def get_questions(quiz_id):
     """Get all questions for a quiz"""
-    # Check if the user is an admin
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     # Check if quiz exists
     quiz = Quiz.query.get(quiz_id)
     if not quiz:
         return jsonify({"error": "Quiz not found"}), 404
     
     # Get all questions for the quiz
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    
-    questions_data = [{
-        "id": question.id,
-        "question_statement": question.question_statement,
-        "question_image": question.question_image,
-        "option1": question.option1,
-        "option1_image": question.option1_image,
-        "option2": question.option2,
-        "option2_image": question.option2_image,
-        "option3": question.option3,
-        "option3_image": question.option3_image,
-        "option4": question.option4,
-        "option4_image": question.option4_image,
-        "correct_option": question.correct_option,
-        "created_at": question.created_at.isoformat()
-    } for question in questions]
-    
-    return jsonify(questions_data), 200
+    query = db.session.query(*question_serializer.columns(Question)) \
+        .filter(Question.quiz_id == quiz_id) \
+        .order_by(Question.id)
+    if wants_stream():
+        return stream_rows(query, question_serializer)
+    
+    return jsonify(question_serializer.many(query.all())), 200
 
-@jwt_required()
+@admin_required
 def create_question(quiz_id):
     """Create a new question for a quiz"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     if not data:
         return jsonify({"error": "No input data provided"}), 400
@@ -271,12 +243,15 @@ def create_question(quiz_id):
     except ValueError:
         return jsonify({"error": "Correct option must be a number"}), 400
     
-    # Handle image data (base64 or URL)
-    question_image = data.get('question_image', None)
-    option1_image = data.get('option1_image', None)
-    option2_image = data.get('option2_image', None)
-    option3_image = data.get('option3_image', None)
-    option4_image = data.get('option4_image', None)
+    # Handle image data (base64 or URL); inline images go to the blob store
+    try:
+        question_image = externalize_image(data.get('question_image', None))
+        option1_image = externalize_image(data.get('option1_image', None))
+        option2_image = externalize_image(data.get('option2_image', None))
+        option3_image = externalize_image(data.get('option3_image', None))
+        option4_image = externalize_image(data.get('option4_image', None))
+    except BlobError as e:
+        return jsonify({"error": str(e)}), 400
     
     # Create new question
     question = Question(
@@ -296,41 +271,25 @@ def create_question(quiz_id):
     
     try:
         db.session.add(question)
+        adjust_counter(Quiz.questions_count, quiz_id, 1)
         db.session.commit()
         
+        invalidate_answer_key(quiz_id)
+        invalidate_quiz_payload(quiz_id)
+        cache.invalidate_tags(f"chapter:{quiz.chapter_id}")
+        
         return jsonify({
             "message": "Question created successfully",
-            "question": {
-                "id": question.id,
-                "question_statement": question.question_statement,
-                "question_image": question.question_image,
-                "option1": question.option1,
-                "option1_image": question.option1_image,
-                "option2": question.option2,
-                "option2_image": question.option2_image,
-                "option3": question.option3,
-                "option3_image": question.option3_image,
-                "option4": question.option4,
-                "option4_image": question.option4_image,
-                "correct_option": question.correct_option,
-                "created_at": question.created_at.isoformat()
-            }
+            "question": question_serializer(question)
         }), 201
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating question: {str(e)}")
         return jsonify({"error": "Error creating question"}), 500
 
-@jwt_required()
+@admin_required
 def update_question(question_id):
     """Update an existing question"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     if not data:
         return jsonify({"error": "No input data provided"}), 400
@@ -340,6 +299,14 @@ def update_question(question_id):
     if not question:
         return jsonify({"error": "Question not found"}), 404
     
+    # Move inline images to the blob store before touching the row
+    try:
+        for field in IMAGE_FIELDS:
+            if field in data:
+                data[field] = externalize_image(data[field])
+    except BlobError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Update fields
     if 'question_statement' in data:
         question.question_statement = data['question_statement']
@@ -383,48 +350,38 @@ def update_question(question_id):
     try:
         db.session.commit()
         
+        invalidate_answer_key(question.quiz_id)
+        invalidate_quiz_payload(question.quiz_id)
+        
         return jsonify({
             "message": "Question updated successfully",
-            "question": {
-                "id": question.id,
-                "question_statement": question.question_statement,
-                "question_image": question.question_image,
-                "option1": question.option1,
-                "option1_image": question.option1_image,
-                "option2": question.option2,
-                "option2_image": question.option2_image,
-                "option3": question.option3,
-                "option3_image": question.option3_image,
-                "option4": question.option4,
-                "option4_image": question.option4_image,
-                "correct_option": question.correct_option,
-                "created_at": question.created_at.isoformat()
-            }
+            "question": question_serializer(question)
         }), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating question: {str(e)}")
         return jsonify({"error": "Error updating question"}), 500
 
-@jwt_required()
+@admin_required
 def delete_question(question_id):
     """Delete a question"""
-    user_id = get_jwt_identity()
-    
-    # Check if the user is an admin
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     # Check if question exists
     question = Question.query.get(question_id)
     if not question:
         return jsonify({"error": "Question not found"}), 404
     
+    quiz_id = question.quiz_id
+    chapter_id = question.quiz.chapter_id
+    
     try:
         db.session.delete(question)
+        adjust_counter(Quiz.questions_count, quiz_id, -1)
         db.session.commit()
         
+        invalidate_answer_key(quiz_id)
+        invalidate_quiz_payload(quiz_id)
+        cache.invalidate_tags(f"chapter:{chapter_id}")
+        
         return jsonify({"message": "Question deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
@@ -441,27 +398,12 @@ def get_quiz(quiz_id):
     if not quiz:
         return jsonify({"error": "Quiz not found"}), 404
         
-    quiz_data = {
-        "id": quiz.id,
-        "title": quiz.title,
-        "description": quiz.description,
-        "chapter_id": quiz.chapter_id,
-        "date_of_quiz": quiz.date_of_quiz.isoformat(),
-        "time_duration": quiz.time_duration,
-        "created_at": quiz.created_at.isoformat()
-    }
-    
-    return jsonify(quiz_data), 200
+    return jsonify(quiz_serializer(quiz)), 200
 
 def get_quiz_questions(quiz_id):
     """Get all questions for a quiz for users to take"""
     user_id = get_jwt_identity()
     
-    # Check if quiz exists
-    quiz = Quiz.query.get(quiz_id)
-    if not quiz:
-        return jsonify({"error": "Quiz not found"}), 404
-    
     # Check if the user has already taken this quiz
     existing_score = Score.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
     if existing_score:
@@ -476,37 +418,32 @@ def get_quiz_questions(quiz_id):
             }
         }), 400
     
-    # Get all questions for the quiz
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    
-    # Check if there are questions
-    if not questions:
+    # The question list is identical for every student, so it is encoded once
+    # per quiz version (without correct answers) and served from the cache
+    payload = get_quiz_payload(quiz_id)
+    if payload is None:
+        if not db.session.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+            return jsonify({"error": "Quiz not found"}), 404
         return jsonify({"error": "No questions found for this quiz"}), 404
     
-    # For security, don't include correct answers
-    questions_data = [{
-        "id": question.id,
-        "question_statement": question.question_statement,
-        "question_image": question.question_image,
-        "option1": question.option1,
-        "option1_image": question.option1_image,
-        "option2": question.option2,
-        "option2_image": question.option2_image,
-        "option3": question.option3,
-        "option3_image": question.option3_image,
-        "option4": question.option4,
-        "option4_image": question.option4_image
-    } for question in questions]
-    
-    return jsonify({
-        "quiz": {
-            "id": quiz.id,
-            "title": quiz.title,
-            "description": quiz.description,
-            "time_duration": quiz.time_duration  # in minutes
-        },
-        "questions": questions_data
-    }), 200
+    return _quiz_payload_response(payload)
+
+def _quiz_payload_response(payload):
+    """Send a pre-encoded payload, honouring If-None-Match and Accept-Encoding"""
+    # Each encoding gets its own strong validator
+    etags = {encoding: f"{payload.etag}-{encoding}" if encoding else payload.etag
+             for encoding in payload.encoded.bodies}
+    if any(request.if_none_match.contains(etag) for etag in etags.values()):
+        response = Response(status=304)
+        encoding = negotiate(request.accept_encodings, payload.encoded.bodies)
+    else:
+        response = payload.encoded.response()
+        encoding = response.headers.get('Content-Encoding')
+    
+    response.set_etag(etags[encoding])
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
 
 @jwt_required()
 def submit_quiz(quiz_id):
@@ -520,33 +457,28 @@ def submit_quiz(quiz_id):
     answers = data['answers']  # Should be a dict of question_id: selected_option
     time_taken = data['time_taken']  # Time taken in seconds
     
-    # Check if quiz exists
-    quiz = Quiz.query.get(quiz_id)
-    if not quiz:
-        return jsonify({"error": "Quiz not found"}), 404
+    if not isinstance(answers, dict):
+        return jsonify({"error": "Answers must map question IDs to selected options"}), 400
     
-    # Check if the user has already taken this quiz
-    existing_score = Score.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
-    if existing_score:
-        return jsonify({"error": "You have already taken this quiz"}), 400
+    # Check if quiz exists; the cached answer key can outlive a deleted quiz
+    if not db.session.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+        invalidate_answer_key(quiz_id)
+        return jsonify({"error": "Quiz not found"}), 404
     
-    # Get all questions for the quiz
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    # Grade against the compiled answer key instead of loading every question
+    answer_key = get_answer_key(quiz_id)
+    if answer_key is None:
+        return jsonify({"error": "Quiz not found"}), 404
     
     # Check if there are questions
-    if not questions:
+    if not answer_key['question_ids']:
         return jsonify({"error": "No questions found for this quiz"}), 404
     
     # Calculate score
-    total_questions = len(questions)
-    total_correct = 0
-    
-    for question in questions:
-        # Check if the question was answered
-        if str(question.id) in answers:
-            selected_option = int(answers[str(question.id)])
-            if selected_option == question.correct_option:
-                total_correct += 1
+    try:
+        total_questions, total_correct = grade(answer_key, answers)
+    except (ValueError, TypeError):
+        return jsonify({"error": "Selected options must be numbers"}), 400
     
     # Calculate percentage
     percentage_score = (total_correct / total_questions) * 100 if total_questions > 0 else 0
@@ -565,6 +497,9 @@ def submit_quiz(quiz_id):
         db.session.add(score)
         db.session.commit()
         
+        # Invalidate cached score listings
+        cache.delete(f"user:{user_id}:scores", "scores:all")
+        
         return jsonify({
             "message": "Quiz submitted successfully",
             "score": {
@@ -576,6 +511,10 @@ def submit_quiz(quiz_id):
                 "attempt_date": score.attempt_date.isoformat()
             }
         }), 201
+    except IntegrityError:
+        # The (user_id, quiz_id) unique constraint rejects a second attempt
+        db.session.rollback()
+        return jsonify({"error": "You have already taken this quiz"}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error submitting quiz: {str(e)}")
@@ -1,129 +1,203 @@
 from flask import request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from backend.extensions import db, redis_client
-from backend.models import Score, User, Quiz
+from backend.extensions import db, cache
+from backend.auth import admin_required
+from backend.models import Score, Quiz
+from backend.queries import score_rows_query, filter_score_rows, paginate_score_rows, after_cursor
+from backend.serializers import score_row_serializer, dumps, json_response
+from backend.streaming import wants_stream, stream_rows
+from backend.compression import EncodedBody
+from backend.config import Config
 from backend.celery.tasks import generate_scores_csv
-import json
+from datetime import datetime, timedelta
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+def _parse_listing_args():
+    """
+    Parse the pagination and filter query parameters shared by the score listings
+
+    Returns:
+        tuple: (params, error) where error is an error message or None
+    """
+    params = {}
+
+    try:
+        limit = int(request.args.get('limit', Config.SCORES_PAGE_SIZE))
+    except ValueError:
+        return None, "limit must be a number"
+    params['limit'] = max(1, min(limit, Config.SCORES_MAX_PAGE_SIZE))
+    params['cursor'] = request.args.get('cursor') or None
+
+    for field in ('subject_id', 'quiz_id'):
+        value = request.args.get(field)
+        if value is None or value == '':
+            params[field] = None
+        elif value.isdigit():
+            params[field] = int(value)
+        else:
+            return None, f"{field} must be a number"
+
+    for field in ('date_from', 'date_to'):
+        value = request.args.get(field)
+        if not value:
+            params[field] = None
+            continue
+        try:
+            params[field] = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return None, "Invalid date format. Use YYYY-MM-DD"
+
+    # date_to is inclusive for callers, so compare against the next midnight
+    if params['date_to'] is not None:
+        params['date_to'] += timedelta(days=1)
+
+    return params, None
+
+def _is_default_page(params):
+    """Whether the request asks for the unfiltered first page, which is the only one cached"""
+    return not any(params[field] for field in ('cursor', 'subject_id', 'quiz_id', 'date_from', 'date_to')) \
+        and params['limit'] == Config.SCORES_PAGE_SIZE
+
+def _scores_page_response(body_and_cursor):
+    """Send an encoded page, exposing the next cursor as a header"""
+    body, next_cursor = body_and_cursor
+    response = json_response(body)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
+
+def _load_scores_page(params, user_id=None):
+    """Run the joined keyset query for one page of scores"""
+    query = filter_score_rows(
+        score_rows_query(),
+        user_id=user_id,
+        subject_id=params['subject_id'],
+        quiz_id=params['quiz_id'],
+        date_from=params['date_from'],
+        date_to=params['date_to']
+    )
+    rows, next_cursor = paginate_score_rows(query, params['limit'], params['cursor'])
+    return score_row_serializer.many(rows), next_cursor
+
+def _unpack_page(value):
+    """Split a cached page into its body (EncodedBody) and next cursor"""
+    if isinstance(value, str):
+        value = value.encode()
+    cursor, _, body = value.partition(b'\n')
+    return EncodedBody.unpack(body), cursor.decode() or None
+
+def _get_scores_page(params, cache_key, user_id=None):
+    """
+    Load a page of scores as its JSON body and next cursor
+
+    Only the default first page is cached, it is what the dashboards ask
+    for. It is stored as the cursor line followed by the body and its
+    compressed variants, so hits are sent without decoding or compressing
+    anything. Pages carry the "scores" tag, dropped when a quiz, chapter or
+    subject they show is renamed or deleted.
+    """
+    if not _is_default_page(params):
+        scores_data, next_cursor = _load_scores_page(params, user_id=user_id)
+        return dumps(scores_data), next_cursor
+
+    def load():
+        scores_data, next_cursor = _load_scores_page(params, user_id=user_id)
+        return (next_cursor or '').encode() + b'\n' + EncodedBody.build(dumps(scores_data)).pack()
+
+    return _unpack_page(cache.get_or_set(cache_key, load, ttl=300, tags=["scores"]))
+
+def _stream_scores(params, user_id=None):
+    """Stream the filtered scores after the cursor, ignoring the page limit"""
+    query = filter_score_rows(
+        score_rows_query(),
+        user_id=user_id,
+        subject_id=params['subject_id'],
+        quiz_id=params['quiz_id'],
+        date_from=params['date_from'],
+        date_to=params['date_to']
+    )
+    return stream_rows(after_cursor(query, params['cursor']), score_row_serializer)
+
 @jwt_required()
 def get_user_scores():
-    """Get all scores for the current user"""
-    current_user = get_jwt_identity()
-    user_id = current_user.get('id')
-    
-    # Try to get from cache first
-    cache_key = f"user_{user_id}_scores"
-    cached_data = redis_client.get(cache_key)
+    """Get a page of scores for the current user"""
+    user_id = int(get_jwt_identity())
     
-    if cached_data:
-        return jsonify(json.loads(cached_data)), 200
+    params, error = _parse_listing_args()
+    if error:
+        return jsonify({"error": error}), 400
     
-    # Get all scores for the user
-    scores = Score.query.filter_by(user_id=user_id).order_by(Score.attempt_date.desc()).all()
+    try:
+        page = _get_scores_page(params, f"user:{user_id}:scores", user_id=user_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    scores_data = []
-    for score in scores:
-        quiz = Quiz.query.get(score.quiz_id)
-        chapter = quiz.chapter
-        subject = chapter.subject
-        
-        scores_data.append({
-            "id": score.id,
-            "quiz_id": score.quiz_id,
-            "quiz_title": quiz.title,
-            "chapter_name": chapter.name,
-            "subject_name": subject.name,
-            "total_questions": score.total_questions,
-            "total_correct": score.total_correct,
-            "percentage_score": score.percentage_score,
-            "time_taken": score.time_taken,
-            "attempt_date": score.attempt_date.isoformat()
-        })
-    
-    # Cache the results for 5 minutes
-    redis_client.setex(cache_key, 300, json.dumps(scores_data))
-    
-    return jsonify(scores_data), 200
+    return _scores_page_response(page)
 
-@jwt_required()
+@admin_required
 def get_all_scores():
-    """Get all scores for all users (admin only)"""
-    current_user = get_jwt_identity()
-    
-    # Check if the user is an admin
-    if not current_user.get('is_admin', False):
-        return jsonify({"error": "Admin privileges required"}), 403
-    
-    # Try to get from cache first
-    cache_key = "all_scores"
-    cached_data = redis_client.get(cache_key)
-    
-    if cached_data:
-        return jsonify(json.loads(cached_data)), 200
-    
-    # Get all scores
-    scores = Score.query.order_by(Score.attempt_date.desc()).all()
-    
-    scores_data = []
-    for score in scores:
-        user = User.query.get(score.user_id)
-        quiz = Quiz.query.get(score.quiz_id)
-        chapter = quiz.chapter
-        subject = chapter.subject
-        
-        scores_data.append({
-            "id": score.id,
-            "user_id": score.user_id,
-            "username": user.username,
-            "quiz_id": score.quiz_id,
-            "quiz_title": quiz.title,
-            "chapter_name": chapter.name,
-            "subject_name": subject.name,
-            "total_questions": score.total_questions,
-            "total_correct": score.total_correct,
-            "percentage_score": score.percentage_score,
-            "time_taken": score.time_taken,
-            "attempt_date": score.attempt_date.isoformat()
-        })
-    
-    # Cache the results for 5 minutes
-    redis_client.setex(cache_key, 300, json.dumps(scores_data))
-    
-    return jsonify(scores_data), 200
+    """Get a page of scores for all users (admin only)"""
+    params, error = _parse_listing_args()
+    if error:
+        return jsonify({"error": error}), 400
+    
+    # Every matching score from the cursor on, as NDJSON, instead of one page
+    if wants_stream():
+        try:
+            return _stream_scores(params)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    try:
+        page = _get_scores_page(params, "scores:all")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return _scores_page_response(page)
 
-@jwt_required()
+@admin_required
 def export_scores_csv():
     """Trigger a Celery task to export scores to CSV"""
-    current_user = get_jwt_identity()
-    
-    # Check if the user is an admin
-    if not current_user.get('is_admin', False):
-        return jsonify({"error": "Admin privileges required"}), 403
+    data = request.get_json(silent=True) or {}
+    compress = bool(data.get('compress', request.args.get('compress') == '1'))
     
     # Start the Celery task
-    task = generate_scores_csv.delay()
+    task = generate_scores_csv.delay(compress=compress)
     
     return jsonify({
         "message": "CSV export started",
         "task_id": task.id
     }), 202
 
-@jwt_required()
+@admin_required
 def get_csv_file(task_id):
     """Get the generated CSV file"""
-    current_user = get_jwt_identity()
-    
-    # Check if the user is an admin
-    if not current_user.get('is_admin', False):
-        return jsonify({"error": "Admin privileges required"}), 403
-    
-    # Check if the file exists
-    file_path = os.path.join("backend", "celery", "user-downloads", f"scores_{task_id}.csv")
-    if not os.path.exists(file_path):
-        return jsonify({"error": "File not found. Task may still be processing."}), 404
-    
-    return send_file(file_path, as_attachment=True, download_name="quiz_scores.csv")
+    # Task ids come from Celery; reject anything that could escape the directory
+    if not task_id.replace('-', '').isalnum():
+        return jsonify({"error": "Invalid task id"}), 400
+    
+    # Check if the file exists, plain or gzip-compressed
+    output_dir = os.path.join("backend", "celery", "user-downloads")
+    file_path = os.path.join(output_dir, f"scores_{task_id}.csv")
+    if os.path.exists(file_path):
+        return send_file(os.path.abspath(file_path), as_attachment=True, download_name="quiz_scores.csv")
+    
+    if os.path.exists(file_path + ".gz"):
+        return send_file(os.path.abspath(file_path + ".gz"), as_attachment=True, download_name="quiz_scores.csv.gz",
+                         mimetype="application/gzip")
+    
+    # Report progress while the export is still running
+    try:
+        result = generate_scores_csv.AsyncResult(task_id)
+        if result.state == 'PROGRESS':
+            return jsonify({
+                "message": "Export in progress",
+                "progress": result.info
+            }), 202
+    except Exception as e:
+        logger.warning(f"Could not read export task state: {str(e)}")
+    
+    return jsonify({"error": "File not found. Task may still be processing."}), 404
@@ -1,47 +1,27 @@
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from backend.extensions import db, redis_client
-from backend.models import Subject, Chapter, User
-import json
+from flask_jwt_extended import jwt_required
+from backend.extensions import db, cache
+from backend.auth import admin_required
+from backend.models import Subject, Chapter, Quiz
+from backend.counters import adjust_counter
+from backend.serializers import subject_serializer, chapter_serializer, json_response
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _cascade_tags(quiz_query):
+    """Cache tags of the quizzes a delete cascades to (answer keys, payloads) and of their chapters"""
+    rows = quiz_query.with_entities(Quiz.id, Quiz.chapter_id).all()
+    return {f"quiz:{row.id}" for row in rows} | {f"chapter:{row.chapter_id}" for row in rows}
+
 @jwt_required()
 def get_subjects():
     """Get all subjects"""
-    # Try to get from cache first if Redis is available
-    cache_key = "all_subjects"
-    cached_data = None
-    
-    if redis_client:
-        try:
-            cached_data = redis_client.get(cache_key)
-        except Exception as e:
-            logger.warning(f"Redis get error: {str(e)}")
-    
-    if cached_data:
-        return jsonify(json.loads(cached_data)), 200
-    
-    # If not in cache, query the database
-    subjects = Subject.query.all()
-    
-    subjects_data = [{
-        "id": subject.id,
-        "name": subject.name,
-        "description": subject.description,
-        "created_at": subject.created_at.isoformat(),
-        "chapters_count": subject.chapters.count()
-    } for subject in subjects]
-    
-    # Cache the results for 5 minutes if Redis is available
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, 300, json.dumps(subjects_data))
-        except Exception as e:
-            logger.warning(f"Redis setex error: {str(e)}")
-    
-    return jsonify(subjects_data), 200
+    def load_subjects():
+        return subject_serializer.many(Subject.query.all())
+
+    body = cache.get_or_set_encoded("subjects:all", load_subjects, ttl=300, tags=["subjects"])
+    return json_response(body)
 
 @jwt_required()
 def get_subject(subject_id):
@@ -50,28 +30,11 @@ def get_subject(subject_id):
     if not subject:
         return jsonify({"error": "Subject not found"}), 404
     
-    subject_data = {
-        "id": subject.id,
-        "name": subject.name,
-        "description": subject.description,
-        "created_at": subject.created_at.isoformat(),
-        "chapters_count": subject.chapters.count()
-    }
-    
-    return jsonify(subject_data), 200
+    return jsonify(subject_serializer(subject)), 200
 
-@jwt_required()
+@admin_required
 def create_subject():
     """Create a new subject"""
-    current_user_id = get_jwt_identity()
-    
-    # Get the user from the database using the identity (which is the user ID as a string)
-    user = User.query.get(current_user_id)
-    
-    # Check if the user is an admin
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     
     if not data or not data.get('name'):
@@ -92,39 +55,20 @@ def create_subject():
         db.session.add(subject)
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete("all_subjects")
-            except Exception as e:
-                logger.warning(f"Redis delete error: {str(e)}")
+        cache.invalidate_tags("subjects")
         
         return jsonify({
             "message": "Subject created successfully",
-            "subject": {
-                "id": subject.id,
-                "name": subject.name,
-                "description": subject.description,
-                "created_at": subject.created_at.isoformat()
-            }
+            "subject": subject_serializer(subject)
         }), 201
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating subject: {str(e)}")
         return jsonify({"error": "Failed to create subject"}), 500
 
-@jwt_required()
+@admin_required
 def update_subject(subject_id):
     """Update an existing subject"""
-    current_user_id = get_jwt_identity()
-    
-    # Get the user from the database using the identity
-    user = User.query.get(current_user_id)
-    
-    # Check if the user is an admin
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     
     if not data:
@@ -149,54 +93,35 @@ def update_subject(subject_id):
     try:
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete("all_subjects")
-            except Exception as e:
-                logger.warning(f"Redis delete error: {str(e)}")
+        # Score listings carry subject names
+        cache.invalidate_tags("subjects", "scores")
         
         return jsonify({
             "message": "Subject updated successfully",
-            "subject": {
-                "id": subject.id,
-                "name": subject.name,
-                "description": subject.description,
-                "created_at": subject.created_at.isoformat()
-            }
+            "subject": subject_serializer(subject)
         }), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating subject: {str(e)}")
         return jsonify({"error": "Failed to update subject"}), 500
 
-@jwt_required()
+@admin_required
 def delete_subject(subject_id):
     """Delete a subject"""
-    current_user_id = get_jwt_identity()
-    
-    # Get the user from the database using the identity
-    user = User.query.get(current_user_id)
-    
-    # Check if the user is an admin
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     # Check if subject exists
     subject = Subject.query.get(subject_id)
     if not subject:
         return jsonify({"error": "Subject not found"}), 404
     
+    # Collected before the cascade removes the rows
+    cascade_tags = _cascade_tags(Quiz.query.join(Chapter).filter(Chapter.subject_id == subject_id))
+    
     try:
         db.session.delete(subject)
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete("all_subjects")
-            except Exception as e:
-                logger.warning(f"Redis delete error: {str(e)}")
+        # Score listings show the subject and lose its scores with it
+        cache.invalidate_tags("subjects", f"subject:{subject_id}", "scores", *cascade_tags)
         
         return jsonify({"message": "Subject deleted successfully"}), 200
     except Exception as e:
@@ -207,57 +132,24 @@ def delete_subject(subject_id):
 @jwt_required()
 def get_chapters(subject_id):
     """Get all chapters for a subject"""
-    # Try to get from cache first if Redis is available
-    cache_key = f"subject_{subject_id}_chapters"
-    cached_data = None
-    
-    if redis_client:
-        try:
-            cached_data = redis_client.get(cache_key)
-        except Exception as e:
-            logger.warning(f"Redis get error: {str(e)}")
-    
-    if cached_data:
-        return jsonify(json.loads(cached_data)), 200
-    
-    # Check if subject exists
-    subject = Subject.query.get(subject_id)
-    if not subject:
+    def load_chapters():
+        # Check if subject exists
+        if not db.session.query(Subject.id).filter(Subject.id == subject_id).first():
+            return None
+
+        return chapter_serializer.many(Chapter.query.filter_by(subject_id=subject_id).all())
+
+    body = cache.get_or_set_encoded(
+        f"subject:{subject_id}:chapters", load_chapters, ttl=300, tags=[f"subject:{subject_id}"]
+    )
+    if body is None:
         return jsonify({"error": "Subject not found"}), 404
-    
-    # Get all chapters for the subject
-    chapters = Chapter.query.filter_by(subject_id=subject_id).all()
-    
-    chapters_data = [{
-        "id": chapter.id,
-        "name": chapter.name,
-        "description": chapter.description,
-        "subject_id": chapter.subject_id,
-        "created_at": chapter.created_at.isoformat(),
-        "quizzes_count": chapter.quizzes.count()
-    } for chapter in chapters]
-    
-    # Cache the results for 5 minutes if Redis is available
-    if redis_client:
-        try:
-            redis_client.setex(cache_key, 300, json.dumps(chapters_data))
-        except Exception as e:
-            logger.warning(f"Redis setex error: {str(e)}")
-    
-    return jsonify(chapters_data), 200
 
-@jwt_required()
+    return json_response(body)
+
+@admin_required
 def create_chapter(subject_id):
     """Create a new chapter for a subject"""
-    current_user_id = get_jwt_identity()
-    
-    # Get the user from the database using the identity
-    user = User.query.get(current_user_id)
-    
-    # Check if the user is an admin
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     
     if not data or not data.get('name'):
@@ -282,42 +174,24 @@ def create_chapter(subject_id):
     
     try:
         db.session.add(chapter)
+        adjust_counter(Subject.chapters_count, subject_id, 1)
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete(f"subject_{subject_id}_chapters")
-            except Exception as e:
-                logger.warning(f"Redis delete error: {str(e)}")
+        # The subject listing carries chapters_count
+        cache.invalidate_tags("subjects", f"subject:{subject_id}")
         
         return jsonify({
             "message": "Chapter created successfully",
-            "chapter": {
-                "id": chapter.id,
-                "name": chapter.name,
-                "description": chapter.description,
-                "subject_id": chapter.subject_id,
-                "created_at": chapter.created_at.isoformat()
-            }
+            "chapter": chapter_serializer(chapter)
         }), 201
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating chapter: {str(e)}")
         return jsonify({"error": "Failed to create chapter"}), 500
 
-@jwt_required()
+@admin_required
 def update_chapter(chapter_id):
     """Update an existing chapter"""
-    current_user_id = get_jwt_identity()
-    
-    # Get the user from the database using the identity
-    user = User.query.get(current_user_id)
-    
-    # Check if the user is an admin
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     data = request.get_json()
     
     if not data:
@@ -342,57 +216,37 @@ def update_chapter(chapter_id):
     try:
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete(f"subject_{chapter.subject_id}_chapters")
-            except Exception as e:
-                logger.warning(f"Redis delete error: {str(e)}")
+        # Score listings carry chapter names
+        cache.invalidate_tags(f"subject:{chapter.subject_id}", "scores")
         
         return jsonify({
             "message": "Chapter updated successfully",
-            "chapter": {
-                "id": chapter.id,
-                "name": chapter.name,
-                "description": chapter.description,
-                "subject_id": chapter.subject_id,
-                "created_at": chapter.created_at.isoformat()
-            }
+            "chapter": chapter_serializer(chapter)
         }), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating chapter: {str(e)}")
         return jsonify({"error": "Failed to update chapter"}), 500
 
-@jwt_required()
+@admin_required
 def delete_chapter(chapter_id):
     """Delete a chapter"""
-    current_user_id = get_jwt_identity()
-    
-    # Get the user from the database using the identity
-    user = User.query.get(current_user_id)
-    
-    # Check if the user is an admin
-    if not user or not user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-    
     # Check if chapter exists
     chapter = Chapter.query.get(chapter_id)
     if not chapter:
         return jsonify({"error": "Chapter not found"}), 404
     
     subject_id = chapter.subject_id
+    # Collected before the cascade removes the rows
+    cascade_tags = _cascade_tags(Quiz.query.filter(Quiz.chapter_id == chapter_id))
     
     try:
         db.session.delete(chapter)
+        adjust_counter(Subject.chapters_count, subject_id, -1)
         db.session.commit()
         
-        # Invalidate cache if Redis is available
-        if redis_client:
-            try:
-                redis_client.delete(f"subject_{subject_id}_chapters")
-            except Exception as e:
-                logger.warning(f"Redis delete error: {str(e)}")
+        # Score listings show the chapter and lose its scores with it
+        cache.invalidate_tags("subjects", f"subject:{subject_id}", f"chapter:{chapter_id}", "scores", *cascade_tags)
         
         return jsonify({"message": "Chapter deleted successfully"}), 200
     except Exception as e:
@@ -1,7 +1,8 @@
 from flask import request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from backend.models import User
-from datetime import datetime
+from backend.auth import create_user_token
+from backend.heartbeats import record_heartbeat
 import logging
 
 logger = logging.getLogger(__name__)
@@ -49,13 +50,11 @@ def login_user(request):
     if not user or not user.check_password(data['password']):
         return jsonify({"error": "Invalid credentials"}), 401
 
-    # Update last active timestamp
-    user.last_active = datetime.utcnow()
-    from backend.extensions import db
-    db.session.commit()
+    # Update last active timestamp (buffered, written in bulk)
+    record_heartbeat(user.id)
 
-    # Create access token
-    access_token = create_access_token(identity=str(user.id))
+    # Create access token carrying the role as a signed claim
+    access_token = create_user_token(user)
 
     return jsonify({
         "access_token": access_token,
@@ -68,13 +67,9 @@ def update_last_active():
     try:
         from flask_jwt_extended import get_jwt_identity
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        if user:
-            user.last_active = datetime.utcnow()
-            from backend.extensions import db
-            db.session.commit()
-            return jsonify({"message": "Last active time updated"}), 200
-        return jsonify({"error": "User not found"}), 404
+        # Heartbeats are coalesced and flushed in one UPDATE every few seconds
+        record_heartbeat(int(user_id))
+        return jsonify({"message": "Last active time updated"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -3,17 +3,28 @@ from backend.extensions import db, jwt
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from backend.models import User, Subject, Chapter, Quiz, Question, Score
 from backend.resources.user_resources import create_user, login_user, update_last_active
-from backend.resources.admin_resources import get_users, update_user_role
+from backend.resources.admin_resources import (
+    get_users, update_user_role, admin_search_users,
+    admin_search_subjects, admin_search_quizzes, get_perf_summary
+)
 from backend.resources.subject_resources import (
     get_subjects, get_subject, create_subject, 
-    update_subject, delete_subject
+    update_subject, delete_subject, get_chapters, create_chapter,
+    update_chapter, delete_chapter
 )
 from backend.resources.quiz_resources import (
     get_quizzes, get_quiz, create_quiz, 
     update_quiz, delete_quiz, get_quiz_questions,
-    submit_quiz
+    submit_quiz, create_question, update_question,
+    delete_question, search_quizzes, get_questions
+)
+from backend.resources.image_resources import get_image
+from backend.serializers import chapter_serializer
+from backend.streaming import wants_stream, stream_rows
+from backend.resources.score_resources import (
+    get_user_scores, get_all_scores,
+    export_scores_csv, get_csv_file
 )
-from backend.resources.score_resources import get_user_scores
 
 # Create a Blueprint for API routes
 api_bp = Blueprint('api', __name__)
@@ -56,6 +67,26 @@ def get_stats():
     from backend.resources.admin_resources import get_admin_dashboard_stats
     return get_admin_dashboard_stats()
 
+@api_bp.route('/admin/perf', methods=['GET'])
+@jwt_required()
+def get_perf():
+    return get_perf_summary()
+
+@api_bp.route('/admin/search/users', methods=['GET'])
+@jwt_required()
+def search_users():
+    return admin_search_users()
+
+@api_bp.route('/admin/search/subjects', methods=['GET'])
+@jwt_required()
+def search_subjects():
+    return admin_search_subjects()
+
+@api_bp.route('/admin/search/quizzes', methods=['GET'])
+@jwt_required()
+def search_quizzes_admin():
+    return admin_search_quizzes()
+
 # Quiz routes
 @api_bp.route('/quizzes', methods=['GET'])
 @jwt_required()
@@ -65,47 +96,8 @@ def list_quizzes():
 
 @api_bp.route('/quizzes/search', methods=['GET'])
 @jwt_required()
-def search_quizzes():
-    query = request.args.get('q', '')
-    subject_id = request.args.get('subject_id')
-    chapter_id = request.args.get('chapter_id')
-    
-    # Convert to integers if they exist
-    if subject_id and subject_id.isdigit():
-        subject_id = int(subject_id)
-    else:
-        subject_id = None
-        
-    if chapter_id and chapter_id.isdigit():
-        chapter_id = int(chapter_id)
-    else:
-        chapter_id = None
-    
-    # Query quizzes with filters
-    quizzes_query = Quiz.query
-    
-    if query:
-        quizzes_query = quizzes_query.filter(Quiz.title.ilike(f'%{query}%'))
-    
-    if subject_id:
-        quizzes_query = quizzes_query.filter(Quiz.subject_id == subject_id)
-        
-    if chapter_id:
-        quizzes_query = quizzes_query.filter(Quiz.chapter_id == chapter_id)
-    
-    quizzes = quizzes_query.all()
-    
-    # Format the response
-    result = []
-    for quiz in quizzes:
-        # Count questions for each quiz
-        question_count = Question.query.filter_by(quiz_id=quiz.id).count()
-        
-        quiz_data = quiz.to_dict()
-        quiz_data['questions_count'] = question_count
-        result.append(quiz_data)
-    
-    return jsonify(result)
+def quiz_search():
+    return search_quizzes()
 
 @api_bp.route('/quizzes/<int:quiz_id>', methods=['GET'])
 @jwt_required()
@@ -115,12 +107,13 @@ def get_quiz_by_id(quiz_id):
 @api_bp.route('/quizzes', methods=['POST'])
 @jwt_required()
 def new_quiz():
-    return create_quiz(request)
+    data = request.get_json(silent=True) or {}
+    return create_quiz(data.get('chapter_id'))
 
 @api_bp.route('/quizzes/<int:quiz_id>', methods=['PUT'])
 @jwt_required()
 def edit_quiz(quiz_id):
-    return update_quiz(quiz_id, request)
+    return update_quiz(quiz_id)
 
 @api_bp.route('/quizzes/<int:quiz_id>', methods=['DELETE'])
 @jwt_required()
@@ -132,10 +125,36 @@ def remove_quiz(quiz_id):
 def list_quiz_questions(quiz_id):
     return get_quiz_questions(quiz_id)
 
+@api_bp.route('/admin/quizzes/<int:quiz_id>/questions', methods=['GET'])
+@jwt_required()
+def list_quiz_questions_admin(quiz_id):
+    return get_questions(quiz_id)
+
 @api_bp.route('/quizzes/<int:quiz_id>/submit', methods=['POST'])
 @jwt_required()
 def quiz_submission(quiz_id):
-    return submit_quiz(quiz_id, request)
+    return submit_quiz(quiz_id)
+
+# Question routes
+@api_bp.route('/quizzes/<int:quiz_id>/questions', methods=['POST'])
+@jwt_required()
+def new_question(quiz_id):
+    return create_question(quiz_id)
+
+@api_bp.route('/questions/<int:question_id>', methods=['PUT'])
+@jwt_required()
+def edit_question(question_id):
+    return update_question(question_id)
+
+@api_bp.route('/questions/<int:question_id>', methods=['DELETE'])
+@jwt_required()
+def remove_question(question_id):
+    return delete_question(question_id)
+
+# Image routes (no JWT: images are loaded by <img> tags and named by content hash)
+@api_bp.route('/images/<name>', methods=['GET'])
+def image(name):
+    return get_image(name)
 
 # Subject routes
 @api_bp.route('/subjects', methods=['GET'])
@@ -151,12 +170,12 @@ def get_subject_by_id(subject_id):
 @api_bp.route('/subjects', methods=['POST'])
 @jwt_required()
 def new_subject():
-    return create_subject(request)
+    return create_subject()
 
 @api_bp.route('/subjects/<int:subject_id>', methods=['PUT'])
 @jwt_required()
 def edit_subject(subject_id):
-    return update_subject(subject_id, request)
+    return update_subject(subject_id)
 
 @api_bp.route('/subjects/<int:subject_id>', methods=['DELETE'])
 @jwt_required()
@@ -167,30 +186,53 @@ def remove_subject(subject_id):
 @api_bp.route('/subjects/<int:subject_id>/chapters', methods=['GET'])
 @jwt_required()
 def get_subject_chapters(subject_id):
-    try:
-        chapters = Chapter.query.filter_by(subject_id=subject_id).all()
-        return jsonify([{
-            'id': chapter.id,
-            'name': chapter.name,
-            'description': chapter.description,
-            'subject_id': chapter.subject_id,
-            'created_at': chapter.created_at.isoformat(),
-            'quizzes_count': chapter.quizzes.count()
-        } for chapter in chapters])
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return get_chapters(subject_id)
+
+@api_bp.route('/subjects/<int:subject_id>/chapters', methods=['POST'])
+@jwt_required()
+def new_chapter(subject_id):
+    return create_chapter(subject_id)
+
+@api_bp.route('/chapters/<int:chapter_id>', methods=['PUT'])
+@jwt_required()
+def edit_chapter(chapter_id):
+    return update_chapter(chapter_id)
+
+@api_bp.route('/chapters/<int:chapter_id>', methods=['DELETE'])
+@jwt_required()
+def remove_chapter(chapter_id):
+    return delete_chapter(chapter_id)
 
 @api_bp.route('/chapters', methods=['GET'])
 @jwt_required()
 def list_chapters():
+    query = db.session.query(*chapter_serializer.columns(Chapter)).order_by(Chapter.id)
+    if wants_stream():
+        return stream_rows(query, chapter_serializer)
+    
     try:
-        chapters = Chapter.query.all()
-        return jsonify([chapter.to_dict() for chapter in chapters])
+        return jsonify(chapter_serializer.many(query.all()))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # Score routes
 @api_bp.route('/scores', methods=['GET'])
+@api_bp.route('/users/scores', methods=['GET'])
 @jwt_required()
 def list_user_scores():
     return get_user_scores()
+
+@api_bp.route('/admin/scores', methods=['GET'])
+@jwt_required()
+def list_all_scores():
+    return get_all_scores()
+
+@api_bp.route('/admin/scores/export', methods=['POST'])
+@jwt_required()
+def start_scores_export():
+    return export_scores_csv()
+
+@api_bp.route('/admin/scores/export/<task_id>', methods=['GET'])
+@jwt_required()
+def download_scores_export(task_id):
+    return get_csv_file(task_id)
@@ -0,0 +1,118 @@
+from flask import request, g
+from flask_sqlalchemy.session import Session
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+# Whether SELECTs in the current context may go to the replica
+_reads_from_replica = ContextVar('reads_from_replica', default=False)
+
+# Request methods that never write, and so may read from the replica
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the replica bind when the context allows it
+
+    SELECTs go to the replica inside use_replica() or a read-only request,
+    as long as the session has not written anything; once it flushes or
+    runs an UPDATE/INSERT/DELETE, every later statement in the session goes
+    to the primary so it sees its own writes. Without a replica bind
+    configured this is the regular Flask-SQLAlchemy session.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        if self._flushing:
+            self._wrote = True
+            return False
+        if clause is not None and not getattr(clause, 'is_select', False):
+            self._wrote = True
+            return False
+        return _reads_from_replica.get() and not self._wrote and REPLICA_BIND in self._db.engines
+
+    def close(self):
+        super().close()
+        self._wrote = False
+
+@contextmanager
+def use_replica():
+    """Let reads in this block go to the replica (used by reporting tasks)"""
+    token = _reads_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reads_from_replica.reset(token)
+
+def replica_reads(fn):
+    """Run a function (typically a reporting task) inside use_replica()"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+def _sticky_key(user_id):
+    return f"sticky:{user_id}"
+
+def _request_user_id():
+    """Identity of the request's access token, if it carries a valid one"""
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+def init_read_routing(app):
+    """
+    Route read-only requests to the replica, with read-your-writes stickiness
+
+    A user who made a successful write keeps reading from the primary for
+    REPLICA_STICKY_SECONDS, so they see e.g. the score they just submitted
+    while the replica catches up.
+    """
+    from backend.extensions import cache
+
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+
+    sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+    @app.before_request
+    def _route_reads():
+        if request.method not in SAFE_METHODS:
+            return
+        user_id = _request_user_id()
+        if user_id is not None and cache.get(_sticky_key(user_id)) is not None:
+            return
+        g.replica_token = _reads_from_replica.set(True)
+
+    @app.after_request
+    def _stick_writers(response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user_id = _request_user_id()
+            if user_id is not None:
+                cache.set(_sticky_key(user_id), b'1', ttl=sticky_seconds)
+        return response
+
+    @app.teardown_request
+    def _reset_routing(exc):
+        token = g.pop('replica_token', None)
+        if token is not None:
+            _reads_from_replica.reset(token)
@@ -0,0 +1,303 @@
+from flask import request
+from backend.extensions import db
+from backend.models import User, Subject, Chapter, Quiz
+from sqlalchemy import event, inspect, text, bindparam
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Default and maximum page sizes for search endpoints
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Every indexed row gets a document id of ref_id * 4 + kind code, so a single
+# document can be replaced or removed through the primary key
+KIND_CODES = {'subject': 0, 'chapter': 1, 'quiz': 2, 'user': 3}
+
+# Per kind: (table alias, title/body/subject_id/chapter_id expressions, FROM clause).
+# Chapters and quizzes also index their parents' names.
+DOCUMENT_SOURCES = {
+    'subject': (
+        's',
+        "s.name, COALESCE(s.description, ''), s.id, NULL",
+        "subjects s"
+    ),
+    'chapter': (
+        'c',
+        "c.name, COALESCE(c.description, '') || ' ' || s.name, s.id, c.id",
+        "chapters c JOIN subjects s ON s.id = c.subject_id"
+    ),
+    'quiz': (
+        'q',
+        "q.title, COALESCE(q.description, '') || ' ' || c.name || ' ' || s.name, s.id, c.id",
+        "quizzes q JOIN chapters c ON c.id = q.chapter_id JOIN subjects s ON s.id = c.subject_id"
+    ),
+    'user': (
+        'u',
+        "u.username, u.email, NULL, NULL",
+        "users u"
+    ),
+}
+
+def _is_postgres(connection):
+    return connection.dialect.name == 'postgresql'
+
+def _doc_id_column(connection):
+    """FTS5 tables key documents by rowid; the Postgres table has an explicit column"""
+    return 'doc_id' if _is_postgres(connection) else 'rowid'
+
+def create_search_index(connection):
+    """Create the search index table for the current dialect if it does not exist"""
+    if _is_postgres(connection):
+        connection.exec_driver_sql("""
+            CREATE TABLE IF NOT EXISTS search_index (
+                doc_id BIGINT PRIMARY KEY,
+                kind VARCHAR(16) NOT NULL,
+                ref_id INTEGER NOT NULL,
+                title TEXT,
+                body TEXT,
+                subject_id INTEGER,
+                chapter_id INTEGER,
+                document TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('simple', COALESCE(title, '')), 'A') ||
+                    setweight(to_tsvector('simple', COALESCE(body, '')), 'B')
+                ) STORED
+            )
+        """)
+        connection.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)"
+        )
+    else:
+        connection.exec_driver_sql("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                title, body,
+                kind UNINDEXED, ref_id UNINDEXED, subject_id UNINDEXED, chapter_id UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+
+def reindex(connection, kind, where=None, params=None):
+    """
+    Replace the index documents of one kind, optionally limited by a WHERE clause
+
+    Args:
+        connection: Connection to run on (the flush connection inside ORM events)
+        kind (str): One of KIND_CODES
+        where (str): SQL condition over the aliases used in DOCUMENT_SOURCES
+        params (dict): Bound parameters for the condition
+    """
+    alias, columns, from_clause = DOCUMENT_SOURCES[kind]
+    code = KIND_CODES[kind]
+    doc_id = _doc_id_column(connection)
+    where_clause = f" WHERE {where}" if where else ""
+    params = params or {}
+
+    connection.execute(text(
+        f"DELETE FROM search_index WHERE {doc_id} IN "
+        f"(SELECT {alias}.id * 4 + {code} FROM {from_clause}{where_clause})"
+    ), params)
+    connection.execute(text(
+        f"INSERT INTO search_index ({doc_id}, kind, ref_id, title, body, subject_id, chapter_id) "
+        f"SELECT {alias}.id * 4 + {code}, '{kind}', {alias}.id, {columns} FROM {from_clause}{where_clause}"
+    ), params)
+
+def remove_document(connection, kind, ref_id):
+    """Remove the index document of a deleted row"""
+    doc_id = _doc_id_column(connection)
+    connection.execute(
+        text(f"DELETE FROM search_index WHERE {doc_id} = :doc_id"),
+        {"doc_id": ref_id * 4 + KIND_CODES[kind]}
+    )
+
+def rebuild_search_index():
+    """
+    Rebuild the whole search index from the source tables
+
+    Returns:
+        int: Number of indexed documents
+    """
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        connection.exec_driver_sql("DELETE FROM search_index")
+        for kind in DOCUMENT_SOURCES:
+            reindex(connection, kind)
+        total = connection.exec_driver_sql("SELECT COUNT(*) FROM search_index").scalar()
+
+    logger.info(f"Rebuilt search index with {total} documents")
+    return total
+
+def ensure_search_index():
+    """Create and populate the search index on databases that do not have it yet"""
+    if inspect(db.engine).has_table('search_index'):
+        return
+    rebuild_search_index()
+
+# Keep the index in sync with ORM writes. The listeners run on the flush
+# connection, so index changes commit or roll back with the row itself.
+
+def _changed(target, *fields):
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+@event.listens_for(Subject, 'after_insert')
+def _index_new_subject(mapper, connection, target):
+    reindex(connection, 'subject', "s.id = :id", {"id": target.id})
+
+@event.listens_for(Subject, 'after_update')
+def _index_updated_subject(mapper, connection, target):
+    if _changed(target, 'name', 'description'):
+        reindex(connection, 'subject', "s.id = :id", {"id": target.id})
+    if _changed(target, 'name'):
+        reindex(connection, 'chapter', "s.id = :id", {"id": target.id})
+        reindex(connection, 'quiz', "s.id = :id", {"id": target.id})
+
+@event.listens_for(Chapter, 'after_insert')
+def _index_new_chapter(mapper, connection, target):
+    reindex(connection, 'chapter', "c.id = :id", {"id": target.id})
+
+@event.listens_for(Chapter, 'after_update')
+def _index_updated_chapter(mapper, connection, target):
+    if _changed(target, 'name', 'description', 'subject_id'):
+        reindex(connection, 'chapter', "c.id = :id", {"id": target.id})
+    if _changed(target, 'name', 'subject_id'):
+        reindex(connection, 'quiz', "c.id = :id", {"id": target.id})
+
+@event.listens_for(Quiz, 'after_insert')
+def _index_new_quiz(mapper, connection, target):
+    reindex(connection, 'quiz', "q.id = :id", {"id": target.id})
+
+@event.listens_for(Quiz, 'after_update')
+def _index_updated_quiz(mapper, connection, target):
+    if _changed(target, 'title', 'description', 'chapter_id'):
+        reindex(connection, 'quiz', "q.id = :id", {"id": target.id})
+
+@event.listens_for(User, 'after_insert')
+def _index_new_user(mapper, connection, target):
+    reindex(connection, 'user', "u.id = :id", {"id": target.id})
+
+@event.listens_for(User, 'after_update')
+def _index_updated_user(mapper, connection, target):
+    # last_active changes on every login; only names matter here
+    if _changed(target, 'username', 'email'):
+        reindex(connection, 'user', "u.id = :id", {"id": target.id})
+
+@event.listens_for(Subject, 'after_delete')
+def _unindex_subject(mapper, connection, target):
+    remove_document(connection, 'subject', target.id)
+
+@event.listens_for(Chapter, 'after_delete')
+def _unindex_chapter(mapper, connection, target):
+    remove_document(connection, 'chapter', target.id)
+
+@event.listens_for(Quiz, 'after_delete')
+def _unindex_quiz(mapper, connection, target):
+    remove_document(connection, 'quiz', target.id)
+
+@event.listens_for(User, 'after_delete')
+def _unindex_user(mapper, connection, target):
+    remove_document(connection, 'user', target.id)
+
+def _terms(query):
+    """Split free text into word tokens; punctuation never reaches the query syntax"""
+    return re.findall(r'\w+', query or '')[:16]
+
+def parse_search_args():
+    """
+    Read q, page and per_page from the query string
+
+    Returns:
+        tuple: (query, page, per_page)
+    """
+    query = request.args.get('q', '')
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = int(request.args.get('per_page', SEARCH_PAGE_SIZE))
+    except ValueError:
+        page, per_page = 1, SEARCH_PAGE_SIZE
+    per_page = max(1, min(per_page, SEARCH_MAX_PAGE_SIZE))
+    return query, page, per_page
+
+def search_documents(query, kinds, subject_id=None, chapter_id=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Run a ranked full-text search over the index
+
+    Hits, the total match count and subject/chapter facets come back from one
+    statement: the matches are computed once in a CTE and the page, the facet
+    groups and the total are UNION ALLed over it.
+
+    Args:
+        query (str): Free text; every word must match, as a prefix
+        kinds (list): Document kinds to search, e.g. ['quiz']
+        subject_id (int): Restrict to documents under this subject
+        chapter_id (int): Restrict to documents under this chapter
+        page (int): 1-based page number
+        per_page (int): Hits per page
+
+    Returns:
+        dict: {"hits": [{"kind", "id", "title", "score"}], "total": int,
+               "facets": {"subjects": [...], "chapters": [...]}}
+    """
+    connection = db.session.connection()
+    terms = _terms(query)
+    params = {"kinds": list(kinds), "limit": per_page, "offset": (page - 1) * per_page}
+
+    if _is_postgres(connection):
+        if terms:
+            params["q"] = " & ".join(f"{term}:*" for term in terms)
+            matches = ("SELECT kind, ref_id, title, subject_id, chapter_id, "
+                       "-ts_rank(document, to_tsquery('simple', :q)) AS score FROM search_index "
+                       "WHERE document @@ to_tsquery('simple', :q) AND kind IN :kinds")
+        else:
+            matches = ("SELECT kind, ref_id, title, subject_id, chapter_id, 0.0 AS score "
+                       "FROM search_index WHERE kind IN :kinds")
+    else:
+        if terms:
+            params["q"] = " ".join(f'"{term}"*' for term in terms)
+            matches = ("SELECT kind, ref_id, title, subject_id, chapter_id, "
+                       "bm25(search_index, 10.0, 1.0) AS score FROM search_index "
+                       "WHERE search_index MATCH :q AND kind IN :kinds")
+        else:
+            matches = ("SELECT kind, ref_id, title, subject_id, chapter_id, 0.0 AS score "
+                       "FROM search_index WHERE kind IN :kinds")
+
+    if subject_id is not None:
+        matches += " AND subject_id = :subject_id"
+        params["subject_id"] = subject_id
+    if chapter_id is not None:
+        matches += " AND chapter_id = :chapter_id"
+        params["chapter_id"] = chapter_id
+
+    statement = text(f"""
+        WITH matches AS ({matches})
+        SELECT * FROM (
+            SELECT 'hit' AS row_type, kind, ref_id, title, score, CAST(NULL AS BIGINT) AS hits
+            FROM matches ORDER BY score, ref_id LIMIT :limit OFFSET :offset
+        ) AS page
+        UNION ALL
+        SELECT 'subject', NULL, subject_id, (SELECT name FROM subjects WHERE subjects.id = matches.subject_id), NULL, COUNT(*)
+        FROM matches WHERE subject_id IS NOT NULL GROUP BY subject_id
+        UNION ALL
+        SELECT 'chapter', NULL, chapter_id, (SELECT name FROM chapters WHERE chapters.id = matches.chapter_id), NULL, COUNT(*)
+        FROM matches WHERE chapter_id IS NOT NULL GROUP BY chapter_id
+        UNION ALL
+        SELECT 'total', NULL, NULL, NULL, NULL, COUNT(*) FROM matches
+    """).bindparams(bindparam("kinds", expanding=True))
+
+    hits, subjects, chapters, total = [], [], [], 0
+    for row in connection.execute(statement, params):
+        if row.row_type == 'hit':
+            hits.append({"kind": row.kind, "id": int(row.ref_id), "title": row.title, "score": row.score})
+        elif row.row_type == 'subject':
+            subjects.append({"id": int(row.ref_id), "name": row.title, "count": row.hits})
+        elif row.row_type == 'chapter':
+            chapters.append({"id": int(row.ref_id), "name": row.title, "count": row.hits})
+        else:
+            total = row.hits
+
+    hits.sort(key=lambda hit: (hit["score"], hit["id"]))
+    subjects.sort(key=lambda facet: -facet["count"])
+    chapters.sort(key=lambda facet: -facet["count"])
+
+    return {"hits": hits, "total": total, "facets": {"subjects": subjects, "chapters": chapters}}
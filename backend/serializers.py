@@ -0,0 +1,155 @@
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+from backend.compression import EncodedBody
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Sorted keys keep the output identical to Flask's default provider
+_ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+def dumps(data):
+    """
+    Encode data as compact JSON with sorted keys
+
+    Uses orjson when it is installed and the standard library otherwise.
+
+    Returns:
+        bytes: The JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=_ORJSON_OPTIONS)
+    return json.dumps(data, separators=(',', ':'), sort_keys=True).encode()
+
+def loads(value):
+    """Decode a JSON document given as str or bytes"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+def json_response(body, status=200):
+    """Send an already encoded JSON document (bytes or EncodedBody) as is"""
+    if isinstance(body, EncodedBody):
+        return body.response('application/json', status)
+    return Response(body, status=status, mimetype='application/json')
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes and decodes with orjson
+
+    Responses look like the default provider's: sorted keys, compact unless
+    debugging, dates in HTTP format (orjson passes them to the default
+    provider's encoder). Calls with extra json.dumps/json.loads options are
+    handed to the default provider.
+    """
+
+    options = _ORJSON_OPTIONS | (orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Pretty-printing in debug mode is left to the default provider
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.options)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def init_json(app):
+    """Use orjson for the app's JSON requests and responses when it is installed"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+class Serializer:
+    """
+    Turns model instances or query rows into API dicts
+
+    A serializer emits a fixed list of attributes, the ones named in dates
+    as ISO strings. only() derives a projection with a subset of the
+    fields.
+    """
+
+    def __init__(self, *fields, dates=()):
+        self.fields = fields
+        self.dates = tuple(field for field in fields if field in dates)
+
+    def only(self, *fields):
+        """A serializer emitting only the given fields"""
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return Serializer(*fields, dates=self.dates)
+
+    def columns(self, model):
+        """The model columns of the fields, to query just what is serialized"""
+        return [getattr(model, field) for field in self.fields]
+
+    def __call__(self, obj):
+        data = {field: getattr(obj, field) for field in self.fields}
+        for field in self.dates:
+            data[field] = _iso(data[field])
+        return data
+
+    def many(self, objs):
+        return [self(obj) for obj in objs]
+
+user_serializer = Serializer(
+    'id', 'username', 'email', 'is_admin', 'last_active', 'created_at',
+    dates=('last_active', 'created_at')
+)
+
+subject_serializer = Serializer(
+    'id', 'name', 'description', 'created_at', 'chapters_count',
+    dates=('created_at',)
+)
+
+chapter_serializer = Serializer(
+    'id', 'name', 'description', 'subject_id', 'created_at', 'quizzes_count',
+    dates=('created_at',)
+)
+
+quiz_serializer = Serializer(
+    'id', 'title', 'description', 'chapter_id', 'date_of_quiz', 'time_duration',
+    'questions_count', 'created_at',
+    dates=('date_of_quiz', 'created_at')
+)
+
+# Quiz header sent with the questions to students
+quiz_header_serializer = quiz_serializer.only('id', 'title', 'description', 'time_duration')
+
+question_serializer = Serializer(
+    'id', 'question_statement', 'question_image',
+    'option1', 'option1_image', 'option2', 'option2_image',
+    'option3', 'option3_image', 'option4', 'option4_image',
+    'correct_option', 'created_at',
+    dates=('created_at',)
+)
+
+# Questions as sent to students; correct_option is never included
+student_question_serializer = question_serializer.only(
+    'id', 'question_statement', 'question_image',
+    'option1', 'option1_image', 'option2', 'option2_image',
+    'option3', 'option3_image', 'option4', 'option4_image'
+)
+
+# Rows of queries.score_rows_query()
+score_row_serializer = Serializer(
+    'id', 'user_id', 'username', 'quiz_id', 'quiz_title', 'chapter_name', 'subject_name',
+    'total_questions', 'total_correct', 'percentage_score', 'time_taken', 'attempt_date',
+    dates=('attempt_date',)
+)
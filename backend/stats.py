@@ -0,0 +1,100 @@
+from backend.extensions import db
+from backend.models import User, Subject, Chapter, Quiz, Question, Score, DashboardStat
+from sqlalchemy import event, inspect, func, text
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Dashboard counter name -> query counting it from scratch
+STAT_QUERIES = {
+    'total_users': lambda: db.session.query(func.count(User.id)).filter(User.is_admin == False),
+    'total_subjects': lambda: db.session.query(func.count(Subject.id)),
+    'total_chapters': lambda: db.session.query(func.count(Chapter.id)),
+    'total_quizzes': lambda: db.session.query(func.count(Quiz.id)),
+    'total_questions': lambda: db.session.query(func.count(Question.id)),
+    'total_attempts': lambda: db.session.query(func.count(Score.id)),
+}
+
+def _bump(connection, name, delta):
+    """Add delta to a dashboard counter on the flush connection"""
+    connection.execute(
+        text("UPDATE dashboard_stats SET value = value + :delta, updated_at = :now WHERE name = :name"),
+        {"delta": delta, "name": name, "now": datetime.utcnow()}
+    )
+
+def _track(model, name):
+    """Keep a counter in step with inserts and deletes of a model"""
+    @event.listens_for(model, 'after_insert')
+    def _on_insert(mapper, connection, target):
+        _bump(connection, name, 1)
+
+    @event.listens_for(model, 'after_delete')
+    def _on_delete(mapper, connection, target):
+        _bump(connection, name, -1)
+
+_track(Subject, 'total_subjects')
+_track(Chapter, 'total_chapters')
+_track(Quiz, 'total_quizzes')
+_track(Question, 'total_questions')
+_track(Score, 'total_attempts')
+
+# Only non-admin users are counted, so role changes move users in and out
+
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    if not target.is_admin:
+        _bump(connection, 'total_users', 1)
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    if not target.is_admin:
+        _bump(connection, 'total_users', -1)
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    history = inspect(target).attrs.is_admin.history
+    if history.has_changes():
+        was_admin = bool(history.deleted[0]) if history.deleted else False
+        if was_admin != bool(target.is_admin):
+            _bump(connection, 'total_users', -1 if target.is_admin else 1)
+
+def get_dashboard_stats():
+    """
+    Read every dashboard counter
+
+    Returns:
+        dict: Counter name -> value
+    """
+    return {stat.name: stat.value for stat in DashboardStat.query.all()}
+
+def reconcile_dashboard_stats():
+    """
+    Recount every dashboard counter from the source tables and correct drift
+
+    Returns:
+        dict: Counter name -> (stored value, actual value) for corrected counters
+    """
+    stored = get_dashboard_stats()
+    drift = {}
+
+    for name, count_query in STAT_QUERIES.items():
+        actual = count_query().scalar()
+        if name not in stored:
+            db.session.add(DashboardStat(name=name, value=actual))
+        elif stored[name] != actual:
+            drift[name] = (stored[name], actual)
+            db.session.query(DashboardStat).filter(DashboardStat.name == name) \
+                .update({DashboardStat.value: actual, DashboardStat.updated_at: datetime.utcnow()},
+                        synchronize_session=False)
+
+    db.session.commit()
+
+    if drift:
+        logger.warning(f"Corrected dashboard stat drift: {drift}")
+    return drift
+
+def ensure_dashboard_stats():
+    """Seed the counters on databases that do not have them yet"""
+    if len(get_dashboard_stats()) < len(STAT_QUERIES):
+        reconcile_dashboard_stats()
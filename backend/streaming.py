@@ -0,0 +1,55 @@
+from flask import request, Response, stream_with_context
+from backend.extensions import db
+from backend.config import Config
+from backend.db_engine import begin_bulk_read
+from backend.serializers import dumps
+import logging
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_stream():
+    """Whether the client asked for an NDJSON stream, with ?stream=1 or an Accept header"""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def stream_rows(query, serializer, batch_size=None):
+    """
+    Stream the rows of a query as NDJSON, one serialized row per line
+
+    Rows are fetched batch_size at a time (from a server-side cursor on
+    Postgres) and each batch is encoded and sent before the next is read,
+    so time to first byte and memory do not grow with the result.
+
+    Args:
+        query: Query over the columns the serializer reads
+        serializer (Serializer): Turns each row into a dict
+        batch_size (int): Rows per fetch and per chunk sent
+
+    Returns:
+        Response: Streaming response
+    """
+    batch_size = batch_size or Config.STREAM_BATCH_SIZE
+    path = request.path
+
+    def generate():
+        try:
+            begin_bulk_read(db.session, Config)
+            result = db.session.execute(query.statement, execution_options={
+                "stream_results": True,
+                "yield_per": batch_size
+            })
+            for chunk in result.partitions():
+                yield b''.join(dumps(serializer(row)) + b'\n' for row in chunk)
+        except Exception as e:
+            # The status line is gone already; the client sees a truncated stream
+            logger.error(f"Error streaming {path}: {str(e)}")
+        finally:
+            db.session.rollback()
+
+    response = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    # Ask proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,340 @@
+from backend.extensions import db
+from backend.models import User, Subject, Chapter, Quiz, Question, Score
+from backend.counters import rebuild_counters
+from backend.search import rebuild_search_index
+from backend.stats import reconcile_dashboard_stats
+from backend.migrations import create_indexes
+from werkzeug.security import generate_password_hash
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.schema import DropIndex
+from contextlib import contextmanager
+import bisect
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Password of every generated user (hashed once, the hash is shared)
+SYNTHETIC_PASSWORD = 'password'
+
+TOPICS = [
+    "Mathematics", "Physics", "Chemistry", "Biology", "History", "Geography",
+    "Economics", "Literature", "Computer Science", "Statistics", "Philosophy",
+    "Astronomy", "Psychology", "Music Theory", "Art History", "Linguistics",
+]
+
+WORDS = [
+    "algebra", "vectors", "motion", "energy", "cells", "genetics", "empires",
+    "rivers", "markets", "poetry", "graphs", "sorting", "probability", "logic",
+    "orbits", "memory", "harmony", "grammar", "reactions", "climate", "trade",
+    "functions", "waves", "atoms", "evolution", "revolutions", "maps", "inflation",
+]
+
+def _volumes(users, quizzes, questions, scores, subjects=None, chapters=None):
+    """Fill in the subject and chapter counts from the quiz count"""
+    if subjects is None:
+        subjects = max(1, min(len(TOPICS) * 4, quizzes // 100))
+    if chapters is None:
+        chapters = max(subjects, quizzes // 10)
+    return {
+        "users": users,
+        "subjects": subjects,
+        "chapters": chapters,
+        "quizzes": quizzes,
+        "questions": questions,
+        "scores": scores,
+    }
+
+def _split(total, weights, cap=None):
+    """
+    Split total into integer parts proportional to weights
+
+    Args:
+        total (int): Amount to split
+        weights (list): Relative size of every part
+        cap (int): Upper bound of a single part
+
+    Returns:
+        list: One int per weight, summing to total unless every part is capped
+    """
+    if cap is not None:
+        total = min(total, cap * len(weights))
+    weights = list(weights)
+    parts = [0] * len(weights)
+
+    # Whatever the cap cuts off is split again over the parts below it
+    while total > 0:
+        scale = total / sum(weights)
+        shares = [w * scale for w in weights]
+        grown = [int(share) for share in shares]
+        # Hand out the rounding remainder to the largest fractions
+        remainder = total - sum(grown)
+        by_fraction = sorted(range(len(weights)), key=lambda i: grown[i] - shares[i])
+        for i in by_fraction[:remainder]:
+            grown[i] += 1
+
+        total = 0
+        for i, amount in enumerate(grown):
+            if cap is not None and parts[i] + amount >= cap:
+                total += parts[i] + amount - cap
+                parts[i] = cap
+                weights[i] = 0
+            else:
+                parts[i] += amount
+    return parts
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+@contextmanager
+def _without_indexes(*models):
+    """
+    Drop the declared secondary indexes of the models for a bulk load
+
+    Maintaining several indexes row by row is what dominates a bulk insert;
+    building them once afterwards is several times faster. Unique
+    constraints stay, so duplicates still fail.
+    """
+    with db.engine.begin() as connection:
+        for model in models:
+            for index in model.__table__.indexes:
+                connection.execute(DropIndex(index, if_exists=True))
+    try:
+        yield
+    finally:
+        create_indexes()
+
+def _insert(table, rows, batch_size, counts):
+    """Insert rows with executemany, committing every batch_size rows"""
+    batch = []
+    inserted = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with db.engine.begin() as connection:
+                connection.execute(table.insert(), batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), batch)
+        inserted += len(batch)
+    counts[table.name] = inserted
+
+def generate_synthetic_data(users=1000, quizzes=50, questions=2000, scores=20000,
+                            subjects=None, chapters=None, seed=0, anchor=None,
+                            batch_size=10000):
+    """
+    Generate a large, realistic dataset with bulk Core inserts
+
+    The scaled-up counterpart of create_sample_data for reproducing
+    production-sized problems locally. Everything is drawn from one seeded
+    random generator and dated relative to the anchor day, so the same seed
+    and anchor give the same rows (only the password salt differs). Rows are added after the existing ones.
+
+    Distributions:
+        users: registered over the past two years, most recently active
+            within weeks of the anchor, a tail inactive for months
+        questions: spread unevenly over quizzes (at least one each)
+        scores: per-user attempts follow a heavy-tailed (Pareto) activity
+            level, quizzes are picked by Zipf-like popularity, results
+            depend on user skill and quiz difficulty; only quizzes held on
+            or before the anchor have attempts
+
+    The score indexes are dropped during the load and rebuilt after it.
+    ORM listeners do not see Core inserts, so the counters, the search
+    index and the dashboard stats are rebuilt at the end too.
+
+    Args:
+        users, quizzes, questions, scores (int): Row counts to generate
+        subjects, chapters (int): Row counts, derived from quizzes if omitted
+        seed (int): Random seed
+        anchor (date): "Today" of the dataset, defaults to the current date
+        batch_size (int): Rows per INSERT transaction
+
+    Returns:
+        dict: Rows inserted by table name, plus elapsed seconds
+    """
+    volumes = _volumes(users, quizzes, questions, scores, subjects, chapters)
+    rng = random.Random(seed)
+    anchor = anchor or datetime.utcnow().date()
+    now = datetime.combine(anchor, datetime.min.time())
+    started = time.perf_counter()
+    counts = {}
+
+    def moment(earliest, latest):
+        """A random datetime between two datetimes, to the second"""
+        span = max(0, int((latest - earliest).total_seconds()))
+        return earliest + timedelta(seconds=int(rng.random() * span))
+
+    # Users
+    first_user = _next_id(User)
+    password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+    user_created = []
+    skill = []
+
+    def user_rows():
+        for n in range(volumes["users"]):
+            user_id = first_user + n
+            created = moment(now - timedelta(days=730), now)
+            # Most users were active recently, some drifted away long ago
+            idle_days = rng.expovariate(1 / 10) if rng.random() < 0.8 else rng.uniform(14, 365)
+            last_active = max(created, now - timedelta(days=idle_days))
+            user_created.append(created)
+            skill.append(min(0.98, max(0.05, rng.gauss(0.65, 0.15))))
+            yield {
+                "id": user_id,
+                "username": f"user{user_id}",
+                "email": f"user{user_id}@example.com",
+                "password_hash": password_hash,
+                "is_admin": False,
+                "last_active": last_active,
+                "created_at": created,
+            }
+
+    _insert(User.__table__, user_rows(), batch_size, counts)
+
+    # Subjects and chapters
+    first_subject = _next_id(Subject)
+    subject_ids = list(range(first_subject, first_subject + volumes["subjects"]))
+    _insert(Subject.__table__, (
+        {
+            "id": subject_id,
+            "name": f"{TOPICS[n % len(TOPICS)]} {subject_id}",
+            "description": f"Course on {TOPICS[n % len(TOPICS)].lower()}",
+            "created_at": moment(now - timedelta(days=900), now - timedelta(days=730)),
+        }
+        for n, subject_id in enumerate(subject_ids)
+    ), batch_size, counts)
+
+    first_chapter = _next_id(Chapter)
+    chapter_ids = list(range(first_chapter, first_chapter + volumes["chapters"]))
+    # Every subject gets a chapter, the rest go to random subjects
+    chapter_subjects = subject_ids[:len(chapter_ids)] + \
+        [rng.choice(subject_ids) for _ in range(len(chapter_ids) - len(subject_ids))]
+    _insert(Chapter.__table__, (
+        {
+            "id": chapter_id,
+            "name": f"{rng.choice(WORDS).title()} {chapter_id}",
+            "description": f"Chapter about {rng.choice(WORDS)} and {rng.choice(WORDS)}",
+            "subject_id": subject_id,
+            "created_at": moment(now - timedelta(days=730), now - timedelta(days=400)),
+        }
+        for chapter_id, subject_id in zip(chapter_ids, chapter_subjects)
+    ), batch_size, counts)
+
+    # Quizzes, held from a year ago to two weeks ahead
+    first_quiz = _next_id(Quiz)
+    quiz_ids = list(range(first_quiz, first_quiz + volumes["quizzes"]))
+    quiz_date = {}
+    quiz_created = {}
+    quiz_duration = {}
+
+    def quiz_rows():
+        for quiz_id in quiz_ids:
+            held = anchor - timedelta(days=rng.randint(-14, 365))
+            created = moment(datetime.combine(held, datetime.min.time()) - timedelta(days=30),
+                             datetime.combine(held, datetime.min.time()))
+            quiz_date[quiz_id] = held
+            quiz_created[quiz_id] = created
+            quiz_duration[quiz_id] = rng.choice((10, 15, 20, 30, 45, 60))
+            yield {
+                "id": quiz_id,
+                "title": f"{rng.choice(WORDS).title()} quiz {quiz_id}",
+                "description": f"Test your knowledge of {rng.choice(WORDS)}",
+                "chapter_id": rng.choice(chapter_ids),
+                "date_of_quiz": held,
+                "time_duration": quiz_duration[quiz_id],
+                "created_at": created,
+            }
+
+    _insert(Quiz.__table__, quiz_rows(), batch_size, counts)
+
+    # Questions, unevenly spread over the quizzes
+    question_counts = [1] * len(quiz_ids)
+    if volumes["questions"] > len(quiz_ids):
+        extra = _split(volumes["questions"] - len(quiz_ids),
+                       [rng.lognormvariate(0, 0.5) for _ in quiz_ids])
+        question_counts = [1 + n for n in extra]
+    question_counts = dict(zip(quiz_ids, question_counts))
+
+    def question_rows():
+        for quiz_id in quiz_ids:
+            for _ in range(question_counts[quiz_id]):
+                a, b = rng.randint(1, 99), rng.randint(1, 99)
+                answer = rng.randint(1, 4)
+                options = [str(a + b + offset) for offset in rng.sample((-3, -2, -1, 1, 2, 3), 3)]
+                options.insert(answer - 1, str(a + b))
+                yield {
+                    "quiz_id": quiz_id,
+                    "question_statement": f"What is {a} + {b}? ({rng.choice(WORDS)})",
+                    "option1": options[0],
+                    "option2": options[1],
+                    "option3": options[2],
+                    "option4": options[3],
+                    "correct_option": answer,
+                    "created_at": quiz_created[quiz_id],
+                }
+
+    _insert(Question.__table__, question_rows(), batch_size, counts)
+
+    # Scores: a user attempts a quiz at most once
+    held_quizzes = [quiz_id for quiz_id in quiz_ids if quiz_date[quiz_id] <= anchor]
+    rng.shuffle(held_quizzes)
+    # Zipf-like popularity by position in the shuffled list
+    cumulative = []
+    total_weight = 0.0
+    for rank in range(len(held_quizzes)):
+        total_weight += 1 / (rank + 1) ** 0.8
+        cumulative.append(total_weight)
+    difficulty = {quiz_id: rng.uniform(-0.2, 0.15) for quiz_id in held_quizzes}
+
+    attempts = [0] * volumes["users"]
+    if held_quizzes and volumes["scores"]:
+        attempts = _split(volumes["scores"], [rng.paretovariate(1.5) for _ in range(volumes["users"])],
+                          cap=len(held_quizzes))
+
+    def pick_quizzes(k):
+        """k distinct quizzes drawn by popularity"""
+        if k * 2 >= len(held_quizzes):
+            return rng.sample(held_quizzes, k)
+        picked = set()
+        while len(picked) < k:
+            picked.add(held_quizzes[bisect.bisect(cumulative, rng.random() * total_weight)])
+        return picked
+
+    held_at = {quiz_id: datetime.combine(quiz_date[quiz_id], datetime.min.time()) for quiz_id in held_quizzes}
+
+    def score_rows():
+        for n, k in enumerate(attempts):
+            user_id = first_user + n
+            for quiz_id in pick_quizzes(k):
+                total = question_counts[quiz_id]
+                p = min(1.0, max(0.0, skill[n] + difficulty[quiz_id] + rng.gauss(0, 0.1)))
+                correct = round(total * p)
+                limit = quiz_duration[quiz_id] * 60
+                yield {
+                    "user_id": user_id,
+                    "quiz_id": quiz_id,
+                    "total_questions": total,
+                    "total_correct": correct,
+                    "percentage_score": round(correct / total * 100, 2),
+                    "time_taken": int(limit * (0.2 + 0.8 * rng.random())),
+                    "attempt_date": moment(max(held_at[quiz_id], user_created[n]), now),
+                }
+
+    with _without_indexes(Score):
+        _insert(Score.__table__, score_rows(), batch_size, counts)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Inserted {sum(counts.values())} synthetic rows in {elapsed:.1f}s: {counts}")
+
+    # Bring the denormalized data in line with the new rows
+    rebuild_counters()
+    rebuild_search_index()
+    reconcile_dashboard_stats()
+
+    counts["seconds"] = round(time.perf_counter() - started, 1)
+    return counts
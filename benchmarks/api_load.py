@@ -0,0 +1,438 @@
+"""
+End-to-end HTTP benchmark for the API
+
+Seeds a throwaway SQLite database with the synthetic data generator, serves
+the app from a separate process and drives it over real HTTP with a pool
+of client threads. The server is the threaded Werkzeug one, which opens a
+connection per request, so the numbers are for comparing runs rather than
+for capacity planning. Each scenario is one traffic mix:
+
+    login_storm       every client logs in at once
+    exam_start        clients fetch the questions of the same quiz
+    submission_burst  the same clients submit that quiz
+    browsing          subject, chapter and quiz listings
+    score_listings    users page through their scores
+    admin_dashboard   dashboard stats and the admin score listing
+
+p50/p95/p99 latency, throughput, error count, SQL queries and bytes on
+the wire per request are recorded per endpoint. Save a run as the baseline, then compare later
+runs against it (exit status 1 on a regression):
+
+    python -m benchmarks.api_load --save benchmarks/baseline.json
+    python -m benchmarks.api_load --compare benchmarks/baseline.json
+
+A latency regression is a p95 more than --tolerance slower and at least
+--min-delta-ms slower than the baseline; half a SQL query more per request
+on average (an extra query per row or per request, not a cache miss more)
+or more errors are regressions as well. Latencies
+depend on the machine, so compare against a baseline saved on the same one.
+
+To see what response compression does, save a run that refuses it and
+compare a normal run with it:
+
+    python -m benchmarks.api_load --accept-encoding identity --save /tmp/identity.json
+    python -m benchmarks.api_load --compare /tmp/identity.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SCENARIOS = ['login_storm', 'exam_start', 'submission_burst', 'browsing', 'score_listings', 'admin_dashboard']
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+class Recorder:
+    """Collects latency, status and SQL query count per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, endpoint, seconds, status, queries, wire_bytes=None):
+        with self._lock:
+            self.samples[endpoint].append((seconds, status, queries, wire_bytes))
+
+    def summary(self, elapsed):
+        results = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _, _, _ in samples)
+            statuses = Counter(status for _, status, _, _ in samples)
+            queries = [count for _, _, count, _ in samples if count is not None]
+            sizes = [size for _, _, _, size in samples if size is not None]
+            results[endpoint] = {
+                "requests": len(samples),
+                "errors": sum(n for status, n in statuses.items() if status >= 500 or status == 0),
+                "statuses": {str(status): n for status, n in sorted(statuses.items())},
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+                "sql_queries": round(sum(queries) / len(queries), 2) if queries else None,
+                "bytes": round(sum(sizes) / len(sizes)) if sizes else None,
+            }
+        return results
+
+def install_query_counter(app):
+    """Count the SQL statements of every request into an X-SQL-Queries header"""
+    from flask import g, has_request_context
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.benchmark_queries = g.get('benchmark_queries', 0) + 1
+
+    @app.after_request
+    def _report_queries(response):
+        response.headers['X-SQL-Queries'] = str(g.get('benchmark_queries', 0))
+        return response
+
+def serve(port):
+    """Serve the app with SQL query counting (the --serve-port child process)"""
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app
+    from werkzeug.serving import make_server
+
+    install_query_counter(app)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+def start_server():
+    """
+    Start the server process on a free local port and wait until it accepts connections
+
+    Returns:
+        tuple: (process, base URL)
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.api_load', '--serve-port', str(port)],
+                               cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("The benchmark server exited during startup")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("The benchmark server did not start")
+
+class Client:
+    """Thread-local HTTP sessions that record every request"""
+
+    def __init__(self, base_url, recorder, accept_encoding=None):
+        import requests
+        self._requests = requests
+        self.base_url = base_url
+        self.recorder = recorder
+        self.accept_encoding = accept_encoding
+        self._local = threading.local()
+
+    def request(self, endpoint, method, path, token=None, **kwargs):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+            if self.accept_encoding:
+                session.headers['Accept-Encoding'] = self.accept_encoding
+        headers = kwargs.pop('headers', {})
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+
+        started = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + path, headers=headers, timeout=60, **kwargs)
+        except self._requests.RequestException:
+            self.recorder.add(endpoint, time.perf_counter() - started, 0, None)
+            return None
+        elapsed = time.perf_counter() - started
+        queries = response.headers.get('X-SQL-Queries')
+        # Content-Length is the size on the wire, before the client decompresses
+        wire_bytes = int(response.headers.get('Content-Length') or len(response.content))
+        self.recorder.add(endpoint, elapsed, response.status_code, int(queries) if queries else None, wire_bytes)
+        return response
+
+def prepare(app, args):
+    """
+    Pick the quiz, users and listings the scenarios use
+
+    Returns:
+        dict: Scenario context (quiz id, usernames, chapter and subject ids)
+    """
+    from backend.extensions import db
+    from backend.models import User, Subject, Chapter, Quiz, Score
+    from sqlalchemy import func
+
+    with app.app_context():
+        # The held quiz with the most questions is the one everybody starts
+        quiz_id = db.session.query(Quiz.id) \
+            .filter(Quiz.date_of_quiz <= datetime.utcnow().date()) \
+            .order_by(Quiz.questions_count.desc(), Quiz.id).limit(1).scalar()
+        attempted = db.session.query(Score.user_id).filter(Score.quiz_id == quiz_id)
+        usernames = [username for username, in db.session.query(User.username)
+                     .filter(User.is_admin == False, ~User.id.in_(attempted))
+                     .order_by(User.id).limit(args.clients)]
+        subject_ids = [subject_id for subject_id, in db.session.query(Subject.id).order_by(Subject.id)]
+        chapter_ids = [chapter_id for chapter_id, in db.session.query(Chapter.id)
+                       .order_by(Chapter.quizzes_count.desc(), Chapter.id).limit(args.clients)]
+        busiest_quiz = db.session.query(Score.quiz_id).group_by(Score.quiz_id) \
+            .order_by(func.count(Score.id).desc(), Score.quiz_id).limit(1).scalar()
+
+    return {
+        "quiz_id": quiz_id,
+        "usernames": usernames,
+        "subject_ids": subject_ids,
+        "chapter_ids": chapter_ids,
+        "busiest_quiz": busiest_quiz,
+        "tokens": {},
+        "question_ids": [],
+    }
+
+def admin_token(client, config):
+    response = client.request('POST /api/admin/login', 'POST', '/api/admin/login',
+                              json={'username': config.ADMIN_USERNAME, 'password': config.ADMIN_PASSWORD})
+    return response.json()['access_token']
+
+def scenario_jobs(name, context, args):
+    """
+    The requests of a scenario, as (endpoint, method, path, token, kwargs) tuples
+
+    Jobs of one scenario run concurrently; scenarios run one after another.
+    """
+    users = context["usernames"]
+    tokens = context["tokens"]
+    quiz_id = context["quiz_id"]
+
+    if name == 'login_storm':
+        return [('POST /api/users/login', 'POST', '/api/users/login', None,
+                 {'json': {'username': username, 'password': args.password}}) for username in users]
+
+    if name == 'exam_start':
+        return [('GET /api/quizzes/<id>/questions', 'GET', f'/api/quizzes/{quiz_id}/questions', tokens[username], {})
+                for username in users if username in tokens]
+
+    if name == 'submission_burst':
+        jobs = []
+        for n, username in enumerate(users):
+            if username not in tokens:
+                continue
+            answers = {str(question_id): (n + i) % 4 + 1 for i, question_id in enumerate(context["question_ids"])}
+            jobs.append(('POST /api/quizzes/<id>/submit', 'POST', f'/api/quizzes/{quiz_id}/submit', tokens[username],
+                         {'json': {'answers': answers, 'time_taken': 300 + n % 600}}))
+        return jobs
+
+    if name == 'browsing':
+        jobs = []
+        subjects = context["subject_ids"]
+        chapters = context["chapter_ids"]
+        for n, username in enumerate(users):
+            token = tokens.get(username)
+            if not token:
+                continue
+            jobs.append(('GET /api/subjects', 'GET', '/api/subjects', token, {}))
+            jobs.append(('GET /api/subjects/<id>/chapters', 'GET',
+                         f'/api/subjects/{subjects[n % len(subjects)]}/chapters', token, {}))
+            jobs.append(('GET /api/quizzes?chapter_id=<id>', 'GET',
+                         f'/api/quizzes?chapter_id={chapters[n % len(chapters)]}', token, {}))
+        return jobs
+
+    if name == 'score_listings':
+        return [('GET /api/scores', 'GET', '/api/scores', tokens[username], {})
+                for username in users if username in tokens]
+
+    if name == 'admin_dashboard':
+        token = context["admin_token"]
+        jobs = []
+        for n in range(args.admin_requests):
+            jobs.append(('GET /api/admin/stats', 'GET', '/api/admin/stats', token, {}))
+            jobs.append(('GET /api/admin/scores', 'GET', '/api/admin/scores', token, {}))
+            jobs.append(('GET /api/admin/scores?quiz_id=<id>', 'GET',
+                         f'/api/admin/scores?quiz_id={context["busiest_quiz"]}', token, {}))
+        return jobs
+
+    raise ValueError(f"Unknown scenario {name}")
+
+def run_scenario(name, client, context, args):
+    """Run a scenario's jobs on the thread pool and summarize them"""
+    client.recorder = Recorder()
+    jobs = scenario_jobs(name, context, args)
+
+    def run(job):
+        endpoint, method, path, token, kwargs = job
+        response = client.request(endpoint, method, path, token=token, **kwargs)
+        if name == 'login_storm' and response is not None and response.status_code == 200:
+            context["tokens"][kwargs['json']['username']] = response.json()['access_token']
+        if name == 'exam_start' and response is not None and response.status_code == 200 and not context["question_ids"]:
+            context["question_ids"] = [question['id'] for question in response.json()['questions']]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, jobs))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(jobs),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(jobs) / elapsed, 1) if elapsed else 0.0,
+        "endpoints": client.recorder.summary(elapsed),
+    }
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Compare a run with a baseline
+
+    Returns:
+        list: Regression messages, empty when nothing got worse
+    """
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        base_scenario = baseline.get("scenarios", {}).get(scenario)
+        if not base_scenario:
+            continue
+        for endpoint, stats in current["endpoints"].items():
+            base = base_scenario["endpoints"].get(endpoint)
+            if not base:
+                continue
+            label = f"{scenario} / {endpoint}"
+            delta = stats["p95_ms"] - base["p95_ms"]
+            if stats["p95_ms"] > base["p95_ms"] * (1 + tolerance) and delta >= min_delta_ms:
+                regressions.append(f"{label}: p95 {base['p95_ms']:.1f}ms -> {stats['p95_ms']:.1f}ms")
+            if stats["sql_queries"] is not None and base["sql_queries"] is not None \
+                    and stats["sql_queries"] > base["sql_queries"] + 0.5:
+                regressions.append(f"{label}: SQL queries per request {base['sql_queries']} -> {stats['sql_queries']}")
+            if stats["errors"] > base["errors"]:
+                regressions.append(f"{label}: errors {base['errors']} -> {stats['errors']}")
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"{'scenario / endpoint':<58} {'reqs':>5} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'sql':>5} {'err':>4} {'kB':>7}")
+    for scenario, current in results["scenarios"].items():
+        print(f"{scenario:<58} {current['requests']:>5} {current['rps']:>7.1f}")
+        base_endpoints = (baseline or {}).get("scenarios", {}).get(scenario, {}).get("endpoints", {})
+        for endpoint, stats in current["endpoints"].items():
+            line = (f"  {endpoint:<56} {stats['requests']:>5} {stats['rps']:>7.1f} {stats['p50_ms']:>6.1f}ms "
+                    f"{stats['p95_ms']:>6.1f}ms {stats['p99_ms']:>6.1f}ms {stats['sql_queries'] or 0:>5g} {stats['errors']:>4}"
+                    f" {(stats.get('bytes') or 0) / 1024:>7.1f}")
+            base = base_endpoints.get(endpoint)
+            if base and base["p95_ms"]:
+                line += f"  p95 {(stats['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%"
+            if base and base.get("bytes") and stats.get("bytes") is not None:
+                line += f"  bytes {(stats['bytes'] / base['bytes'] - 1) * 100:+.0f}%"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000, help='generated users')
+    parser.add_argument('--quizzes', type=int, default=200, help='generated quizzes')
+    parser.add_argument('--questions', type=int, default=8000, help='generated questions')
+    parser.add_argument('--scores', type=int, default=40000, help='generated scores')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', help='reuse a database made by "flask generate-data" instead of seeding one')
+    parser.add_argument('--password', default='password', help='password of the generated users')
+    parser.add_argument('--clients', type=int, default=100, help='simulated students')
+    parser.add_argument('--admin-requests', type=int, default=50, help='rounds of admin dashboard requests')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated, in order')
+    parser.add_argument('--accept-encoding', help='Accept-Encoding the clients send, e.g. identity '
+                        '(defaults to the codings the requests library can decode)')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95 slowdown')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='ignore p95 slowdowns smaller than this')
+    parser.add_argument('--serve-port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_port:
+        return serve(args.serve_port)
+
+    if args.database:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(args.database)}"
+    else:
+        workdir = tempfile.mkdtemp(prefix='api-load-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ.setdefault('CACHE_TYPE', 'memory')
+
+    import logging
+    logging.disable(logging.WARNING)
+    from app import app
+    from backend.config import Config
+
+    if not args.database:
+        from backend.synthetic_data import generate_synthetic_data
+        with app.app_context():
+            generate_synthetic_data(users=args.users, quizzes=args.quizzes, questions=args.questions,
+                                    scores=args.scores, seed=args.seed)
+
+    server, base_url = start_server()
+    client = Client(base_url, Recorder(), args.accept_encoding)
+    context = prepare(app, args)
+    context["admin_token"] = admin_token(client, Config)
+
+    results = {
+        "created": datetime.utcnow().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "config": {
+            "dataset": None if args.database else {
+                "users": args.users, "quizzes": args.quizzes, "questions": args.questions,
+                "scores": args.scores, "seed": args.seed,
+            },
+            "clients": args.clients,
+            "admin_requests": args.admin_requests,
+            "concurrency": args.concurrency,
+            "accept_encoding": args.accept_encoding,
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in args.scenarios.split(','):
+            results["scenarios"][name] = run_scenario(name, client, context, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Saved results to {args.save}")
+
+    if baseline is not None:
+        if baseline.get("config") != results["config"]:
+            print("Warning: the baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == '__main__':
+    main()
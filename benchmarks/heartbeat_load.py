@@ -0,0 +1,89 @@
+"""
+Heartbeat load test for the last_active write buffer
+
+Creates a throwaway SQLite database, logs in a set of users and has
+several threads ping POST /api/users/active as fast as they can, once with
+every heartbeat written through (HEARTBEAT_FLUSH_INTERVAL=0) and once
+buffered. Commits are counted on the engine.
+
+    python -m benchmarks.heartbeat_load --users 50 --threads 8 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--flush-interval', type=float, default=1, help='buffered run flush interval in seconds')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='heartbeat-load-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ.setdefault('CACHE_TYPE', 'memory')
+    os.environ['HEARTBEAT_FLUSH_INTERVAL'] = str(args.flush_interval)
+
+    from sqlalchemy import event
+    from app import app
+    from backend.config import Config
+    from backend.extensions import db
+    from backend.heartbeats import flush_heartbeats
+    from backend.models import User
+
+    with app.app_context():
+        for i in range(args.users):
+            user = User(username=f'load{i}', email=f'load{i}@example.com')
+            user.set_password('password')
+            db.session.add(user)
+        db.session.commit()
+
+        commits = [0]
+        event.listen(db.engine, 'commit', lambda conn: commits.__setitem__(0, commits[0] + 1))
+
+    client = app.test_client()
+    tokens = []
+    for i in range(args.users):
+        response = client.post('/api/users/login', json={'username': f'load{i}', 'password': 'password'})
+        tokens.append({'Authorization': 'Bearer ' + response.get_json()['access_token']})
+
+    def run(flush_interval):
+        Config.HEARTBEAT_FLUSH_INTERVAL = flush_interval
+        with app.app_context():
+            flush_heartbeats()
+        commits[0] = 0
+        requests = [0] * args.threads
+        deadline = time.perf_counter() + args.seconds
+
+        def worker(n):
+            local_client = app.test_client()
+            i = n
+            while time.perf_counter() < deadline:
+                local_client.post('/api/users/active', headers=tokens[i % len(tokens)])
+                requests[n] += 1
+                i += args.threads
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with app.app_context():
+            flush_heartbeats()
+        elapsed = time.perf_counter() - started
+        return sum(requests), commits[0], elapsed
+
+    for name, interval in (("write-through", 0), (f"buffered ({args.flush_interval:g}s)", args.flush_interval)):
+        total, committed, elapsed = run(interval)
+        print(f"{name:>18}: {total} heartbeats in {elapsed:.2f}s = {total / elapsed:.0f} req/s, "
+              f"{committed} commits = {committed / elapsed:.1f} commits/s")
+
+if __name__ == '__main__':
+    main()
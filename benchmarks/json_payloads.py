@@ -0,0 +1,132 @@
+"""
+JSON encoding benchmark for large list payloads
+
+Times the ways a listing gets from rows to a response body, for score
+listings and question lists of several sizes:
+
+    handbuilt_stdlib   dicts built by hand, jsonify with the stdlib provider
+                       (how the resources used to do it)
+    serializer_orjson  shared serializers, jsonify with the orjson provider
+    cached_decode      cache hit decoded and re-encoded by jsonify
+    cached_raw         cache hit sent as the stored bytes
+
+No database or server is involved; rows are plain objects with the same
+attributes as the query results. Without orjson installed the orjson
+provider is not used and serializer_orjson measures the stdlib provider.
+
+    python -m benchmarks.json_payloads --rows 100,1000,10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def score_rows(n):
+    start = datetime(2024, 1, 1)
+    return [SimpleNamespace(
+        id=i, user_id=i % 997, username=f"user{i % 997}", quiz_id=i % 211,
+        quiz_title=f"Quiz {i % 211}", chapter_name=f"Chapter {i % 53}", subject_name=f"Subject {i % 7}",
+        total_questions=20, total_correct=i % 21, percentage_score=(i % 21) * 5.0, time_taken=300 + i % 600,
+        attempt_date=start + timedelta(minutes=i)
+    ) for i in range(n)]
+
+def question_rows(n):
+    start = datetime(2024, 1, 1)
+    return [SimpleNamespace(
+        id=i, question_statement=f"What is the value of expression number {i} in the worked example?",
+        question_image=None, option1=f"{i}", option1_image=None, option2=f"{i + 1}", option2_image=None,
+        option3=f"{i * 2}", option3_image=None, option4="None of these", option4_image=None,
+        correct_option=i % 4 + 1, created_at=start + timedelta(seconds=i)
+    ) for i in range(n)]
+
+def handbuilt_scores(rows):
+    return [{
+        "id": row.id,
+        "user_id": row.user_id,
+        "username": row.username,
+        "quiz_id": row.quiz_id,
+        "quiz_title": row.quiz_title,
+        "chapter_name": row.chapter_name,
+        "subject_name": row.subject_name,
+        "total_questions": row.total_questions,
+        "total_correct": row.total_correct,
+        "percentage_score": row.percentage_score,
+        "time_taken": row.time_taken,
+        "attempt_date": row.attempt_date.isoformat()
+    } for row in rows]
+
+def handbuilt_questions(rows):
+    return [{
+        "id": question.id,
+        "question_statement": question.question_statement,
+        "question_image": question.question_image,
+        "option1": question.option1,
+        "option1_image": question.option1_image,
+        "option2": question.option2,
+        "option2_image": question.option2_image,
+        "option3": question.option3,
+        "option3_image": question.option3_image,
+        "option4": question.option4,
+        "option4_image": question.option4_image,
+        "correct_option": question.correct_option,
+        "created_at": question.created_at.isoformat()
+    } for question in rows]
+
+def best_of(fn, repeat):
+    """Best wall time of repeat calls, in milliseconds, and the last result"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='100,1000,10000', help='comma-separated payload sizes')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement, the best one is kept')
+    args = parser.parse_args()
+
+    from flask import Flask
+    from backend.serializers import init_json, json_response, dumps, score_row_serializer, question_serializer, orjson
+
+    stdlib_app = Flask('stdlib')
+    fast_app = Flask('fast')
+    init_json(fast_app)
+
+    kinds = [
+        ("scores", score_rows, handbuilt_scores, score_row_serializer),
+        ("questions", question_rows, handbuilt_questions, question_serializer),
+    ]
+
+    print(f"orjson: {'yes' if orjson else 'no (stdlib fallback)'}")
+    print(f"{'payload':<18}{'rows':>8}{'KiB':>9}  {'path':<20}{'ms':>9}{'MB/s':>9}{'speedup':>9}")
+
+    for size in [int(n) for n in args.rows.split(',')]:
+        for name, make_rows, handbuilt, serializer in kinds:
+            rows = make_rows(size)
+            cached = json.dumps(handbuilt(rows))
+            cached_bytes = dumps(serializer.many(rows))
+
+            with stdlib_app.app_context():
+                baseline, response = best_of(lambda: stdlib_app.json.response(handbuilt(rows)), args.repeat)
+                decode, _ = best_of(lambda: stdlib_app.json.response(json.loads(cached)), args.repeat)
+            with fast_app.app_context():
+                fast, _ = best_of(lambda: fast_app.json.response(serializer.many(rows)), args.repeat)
+                raw, _ = best_of(lambda: json_response(cached_bytes), args.repeat)
+
+            size_mb = len(response.get_data()) / 1e6
+            for path, ms in [("handbuilt_stdlib", baseline), ("serializer_orjson", fast),
+                             ("cached_decode", decode), ("cached_raw", raw)]:
+                print(f"{name:<18}{size:>8}{size_mb * 1e6 / 1024:>9.1f}  {path:<20}{ms:>9.3f}"
+                      f"{size_mb / (ms / 1000):>9.1f}{baseline / ms:>8.1f}x")
+        print()
+
+if __name__ == '__main__':
+    main()
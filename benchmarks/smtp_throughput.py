@@ -0,0 +1,89 @@
+"""
+Throughput benchmark for the SMTP delivery layer
+
+Starts a local aiosmtpd sink and sends the same batch of messages twice:
+once opening a new connection per message (the old send_email behaviour)
+and once over the pooled SMTPDelivery connection.
+
+    pip install aiosmtpd
+    python -m benchmarks.smtp_throughput --messages 500 --handshake-delay 20
+
+--handshake-delay adds latency to every EHLO to approximate the cost of a
+remote server's greeting, STARTTLS and login round trips.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.celery.mail_service import SMTPDelivery
+
+class SinkHandler:
+    """aiosmtpd handler that accepts and counts every message"""
+
+    def __init__(self, handshake_delay):
+        self.handshake_delay = handshake_delay
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 Message accepted'
+
+def run(delivery, messages):
+    started = time.perf_counter()
+    results = delivery.send_many(messages)
+    elapsed = time.perf_counter() - started
+    delivery.close()
+    failed = sum(1 for result in results if not result['ok'])
+    return elapsed, failed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--handshake-delay', type=float, default=10, help='milliseconds added to each EHLO')
+    parser.add_argument('--rate-limit', type=float, default=0, help='messages per second for the pooled run, 0 for none')
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("aiosmtpd is required: pip install aiosmtpd")
+
+    handler = SinkHandler(args.handshake_delay / 1000.0)
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+
+    messages = [{
+        "recipient": f"user{i}@example.com",
+        "subject": "Benchmark",
+        "html_content": "<p>" + "Quiz Master Pro " * 50 + "</p>"
+    } for i in range(args.messages)]
+
+    common = dict(host='127.0.0.1', port=args.port, use_tls=False, username='', password='',
+                  sender='bench@example.com')
+
+    try:
+        per_message = SMTPDelivery(rate_limit=0, max_messages_per_connection=1, **common)
+        pooled = SMTPDelivery(rate_limit=args.rate_limit, **common)
+
+        for name, delivery in (("connection per message", per_message), ("pooled connection", pooled)):
+            elapsed, failed = run(delivery, messages)
+            print(f"{name:>24}: {args.messages} messages in {elapsed:.2f}s "
+                  f"= {args.messages / elapsed:.1f} msg/s ({failed} failed)")
+    finally:
+        controller.stop()
+
+    print(f"Sink received {handler.received} messages")
+
+if __name__ == '__main__':
+    main()
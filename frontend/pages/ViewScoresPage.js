@@ -3,7 +3,9 @@ Vue.component('view-scores-page', {
   data() {
     return {
       scores: [],
+      nextCursor: null,
       isLoading: true,
+      isLoadingMore: false,
       error: null
     };
   },
@@ -32,19 +34,29 @@ Vue.component('view-scores-page', {
           :scores="scores" 
           :is-admin="userInfo.is_admin"
         ></score-display>
+        
+        <div v-if="nextCursor" class="text-center mt-3">
+          <button class="btn btn-outline-primary" @click="loadMoreScores" :disabled="isLoadingMore">
+            <span v-if="isLoadingMore" class="spinner-border spinner-border-sm me-2"></span>
+            Load more
+          </button>
+        </div>
       </div>
     </div>
   `,
   methods: {
+    scoresEndpoint() {
+      return this.userInfo.is_admin ? '/api/admin/scores' : '/api/users/scores';
+    },
+    
     fetchScores() {
       this.isLoading = true;
       this.error = null;
       
-      const endpoint = this.userInfo.is_admin ? '/api/admin/scores' : '/api/users/scores';
-      
-      api.get(endpoint)
+      api.get(this.scoresEndpoint())
         .then(response => {
           this.scores = response.data;
+          this.nextCursor = response.headers['x-next-cursor'] || null;
           this.isLoading = false;
         })
         .catch(error => {
@@ -58,6 +70,22 @@ Vue.component('view-scores-page', {
         });
     },
     
+    loadMoreScores() {
+      if (!this.nextCursor) return;
+      this.isLoadingMore = true;
+      
+      api.get(this.scoresEndpoint(), { cursor: this.nextCursor })
+        .then(response => {
+          this.scores = this.scores.concat(response.data);
+          this.nextCursor = response.headers['x-next-cursor'] || null;
+          this.isLoadingMore = false;
+        })
+        .catch(error => {
+          console.error('Error fetching more scores:', error);
+          this.isLoadingMore = false;
+        });
+    },
+    
     goToDashboard() {
       if (this.userInfo.is_admin) {
         this.$emit('page-change', 'admin-dashboard-page');
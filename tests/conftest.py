@@ -0,0 +1,29 @@
+"""
+The app is imported once for the whole test run, against a throwaway SQLite
+database and the in-memory cache of a single process.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_db_dir = tempfile.mkdtemp(prefix='quizmaster-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.sqlite3')}"
+os.environ['CACHE_TYPE'] = 'memory'
+os.environ['CACHE_SINGLE_PROCESS'] = '1'
+os.environ['BLOB_STORE_DIR'] = os.path.join(_db_dir, 'blobs')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+@pytest.fixture
+def login():
+    """Log a user in and return the Authorization header of its token"""
+    from app import app
+
+    def login(username, password):
+        response = app.test_client().post('/api/users/login', json={'username': username, 'password': password})
+        return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    return login
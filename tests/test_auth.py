@@ -0,0 +1,34 @@
+"""
+Regression checks for role changes of users holding tokens
+"""
+from app import app
+from backend.extensions import db, cache
+from backend.cache import MemoryStore
+from backend.models import User
+
+def test_demoted_admin_stays_demoted_when_the_role_change_is_evicted(login):
+    client = app.test_client()
+    with app.app_context():
+        user = User(username='deputy', email='deputy@example.com', is_admin=True)
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    try:
+        admin = login('admin', 'adminpassword')
+        deputy = login('deputy', 'pw')
+        assert client.get('/api/admin/scores', headers=deputy).status_code == 200
+
+        response = client.put(f"/api/users/{user_id}/role", json={'is_admin': False}, headers=admin)
+        assert response.status_code == 200
+        assert client.get('/api/admin/scores', headers=deputy).status_code == 403
+
+        # The recorded role change is gone, the token still claims admin
+        cache.local.clear()
+        cache.remote = MemoryStore()
+        assert client.get('/api/admin/scores', headers=deputy).status_code == 403
+    finally:
+        with app.app_context():
+            db.session.query(User).filter(User.id == user_id).delete()
+            db.session.commit()
@@ -0,0 +1,68 @@
+"""
+Checks of the in-memory cache tier and of consistent entries
+"""
+import time
+
+from backend.cache import Cache, MemoryStore
+
+def test_memory_store_prunes_tags_of_expired_and_evicted_entries():
+    store = MemoryStore(max_entries=2)
+    store.set('a', b'1', ttl=60, tags=['quiz:1'])
+    store.set('b', b'2', ttl=60, tags=['quiz:2'])
+    store.set('c', b'3', ttl=60, tags=['quiz:3'])
+
+    # 'a' was evicted and left the tag index
+    assert store.get('a') is None
+    assert 'quiz:1' not in store._tags
+
+    store.set('b', b'2', ttl=0.01, tags=['quiz:2'])
+    time.sleep(0.02)
+    store._sweep(time.time())
+    assert len(store) == 1
+    assert 'quiz:2' not in store._tags
+
+    store.invalidate_tags('quiz:3')
+    assert len(store) == 0
+    assert not store._tags
+
+def test_consistent_entries_need_a_shared_tier():
+    cache = Cache()
+    cache.configure({'CACHE_TYPE': 'memory'})
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return b'key'
+
+    # Another worker would never see an invalidation, so nothing is kept
+    assert cache.get_or_set('quiz:1:answer_key', loader, consistent=True) == b'key'
+    assert cache.get_or_set('quiz:1:answer_key', loader, consistent=True) == b'key'
+    assert len(loads) == 2
+    assert cache.get_or_set('subjects:all', loader) == b'key'
+    assert cache.get_or_set('subjects:all', loader) == b'key'
+    assert len(loads) == 3
+
+    cache.configure({'CACHE_TYPE': 'memory', 'CACHE_SINGLE_PROCESS': True})
+    cache.get_or_set('quiz:1:answer_key', loader, consistent=True)
+    cache.get_or_set('quiz:1:answer_key', loader, consistent=True)
+    assert len(loads) == 4
+    # Consistent entries skip the local tier
+    assert cache.local.get('quiz:1:answer_key') is None
+
+def test_invalidation_drops_local_copies_of_shared_values():
+    cache = Cache()
+    cache.configure({'CACHE_TYPE': 'memory', 'CACHE_SINGLE_PROCESS': True})
+    cache.get_or_set('subjects:all', lambda: b'old', tags=['subjects'])
+
+    # The local copy expires; the next read copies the value back from the shared tier
+    cache.local.clear()
+    assert cache.get_or_set('subjects:all', lambda: b'unused', tags=['subjects']) == b'old'
+    assert cache.local.get('subjects:all') == b'old'
+
+    cache.invalidate_tags('subjects')
+    assert cache.get_or_set('subjects:all', lambda: b'new', tags=['subjects']) == b'new'
+
+    # Reads that do not know the tags leave the local tier alone
+    cache.local.clear()
+    assert cache.get('subjects:all') == b'new'
+    assert cache.local.get('subjects:all') is None
@@ -0,0 +1,77 @@
+"""
+Regression checks for quiz submissions and for deletes that cascade from
+subjects and chapters to quizzes
+"""
+from datetime import date
+
+import pytest
+
+from app import app
+from backend.extensions import db, cache
+from backend.cache import MemoryStore
+from backend.models import User, Subject, Chapter, Quiz, Question, Score
+from backend.stats import get_dashboard_stats
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        subject = Subject(name='Math')
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(name='Algebra', subject_id=subject.id)
+        db.session.add(chapter)
+        db.session.flush()
+        quiz = Quiz(title='Linear equations', chapter_id=chapter.id, date_of_quiz=date.today(), time_duration=10)
+        db.session.add(quiz)
+        db.session.flush()
+        question = Question(quiz_id=quiz.id, question_statement='1 + 1', option1='2', option2='3',
+                            option3='4', option4='5', correct_option=1)
+        db.session.add(question)
+        for name in ('first', 'second'):
+            user = User(username=name, email=f"{name}@example.com")
+            user.set_password('pw')
+            db.session.add(user)
+        db.session.commit()
+        ids = {"subject": subject.id, "chapter": chapter.id, "quiz": quiz.id, "question": question.id}
+
+    yield app.test_client(), ids
+
+    with app.app_context():
+        for model in (Score, Question, Quiz, Chapter, Subject):
+            db.session.query(model).delete()
+        db.session.query(User).filter(User.is_admin == False).delete()
+        db.session.commit()
+    cache.local.clear()
+    cache.remote = MemoryStore()
+
+@pytest.mark.parametrize('delete_path', ['/api/chapters/{chapter}', '/api/subjects/{subject}'])
+def test_submit_after_cascading_delete(client, login, delete_path):
+    client, ids = client
+    admin = login('admin', 'adminpassword')
+    answers = {'answers': {str(ids['question']): 1}, 'time_taken': 5}
+
+    # The first submission caches the answer key, the listing caches the score
+    response = client.post(f"/api/quizzes/{ids['quiz']}/submit", json=answers, headers=login('first', 'pw'))
+    assert response.status_code == 201
+    assert len(client.get('/api/admin/scores', headers=admin).get_json()) == 1
+
+    response = client.delete(delete_path.format(**ids), headers=admin)
+    assert response.status_code == 200
+
+    response = client.post(f"/api/quizzes/{ids['quiz']}/submit", json=answers, headers=login('second', 'pw'))
+    assert response.status_code == 404
+
+    assert client.get('/api/admin/scores', headers=admin).get_json() == []
+    with app.app_context():
+        assert db.session.query(Score).count() == 0
+        assert get_dashboard_stats()['total_attempts'] == 0
+
+@pytest.mark.parametrize('answers', [[1], '1', None, 3])
+def test_submit_rejects_answers_that_are_not_an_object(client, login, answers):
+    client, ids = client
+    response = client.post(f"/api/quizzes/{ids['quiz']}/submit", json={'answers': answers, 'time_taken': 3},
+                           headers=login('first', 'pw'))
+    assert response.status_code == 400
+
+    with app.app_context():
+        assert db.session.query(Score).count() == 0
@@ -0,0 +1,33 @@
+"""
+Regression checks for inline images moved to the blob store
+"""
+import base64
+
+import pytest
+
+from app import app
+from backend.blob_store import BlobError, externalize_image, store_blob
+
+PNG = 'data:image/png;base64,' + base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'\x00' * 32).decode()
+
+@pytest.mark.parametrize('mime_type', ['text/html', 'image/svg+xml', 'application/javascript', ''])
+def test_only_raster_images_are_stored(mime_type):
+    script = base64.b64encode(b'<script>alert(document.cookie)</script>').decode()
+    with pytest.raises(BlobError):
+        externalize_image(f"data:{mime_type};base64,{script}")
+
+def test_images_are_served_as_images_only():
+    client = app.test_client()
+    with app.app_context():
+        url = externalize_image(PNG)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+
+    # A blob name with another extension is never served, even if the file exists
+    digest = url.rsplit('/', 1)[1].split('.')[0]
+    assert client.get(f"/api/images/{digest}.html").status_code == 404
+    with pytest.raises(BlobError):
+        store_blob(b'<html></html>', 'text/html')